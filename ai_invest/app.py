@@ -5,17 +5,23 @@ from fpdf import FPDF
 
 @st.dialog("📊 AI 정밀 분석 리포트")
 def show_analysis_dialog(title, summary_text, pub_dt, role="filter"): 
-    with st.spinner("AI가 뉴스를 심층 분석 중입니다..."):
-        enhanced_title = f"(기사작성일: {pub_dt}) {title}"
-        # 여기서 방금 수정한 get_ai_summary가 호출되면서 
-        # Add-on 설정의 키를 찾아 Gemini를 태울 것입니다.
-        analysis = get_ai_summary(enhanced_title, summary_text, role=role)
+    enhanced_title = f"(기사작성일: {pub_dt}) {title}"
+    cache_key = make_llm_cache_key(enhanced_title, summary_text, role=role)
+    reanalyze_key = f"reanalyze_{cache_key[:16]}"
     
     st.markdown(f"### {title}")
     st.caption(f"📅 기사 작성일: {pub_dt}") 
     st.divider()
     
-    st.markdown(analysis)
+    # 💾 같은 기사/모델/지침이면 저장된 분석을 즉시 표시 ('다시 분석'을 누르면 캐시 무시)
+    cached = None if st.session_state.get(reanalyze_key) else get_cached_ai_response(cache_key)
+    if cached:
+        analysis, cached_at = cached
+        st.markdown(analysis)
+    else:
+        # ⚡ 생성되는 대로 바로 표시 (첫 토큰까지만 기다림)
+        analysis = st.write_stream(stream_ai_summary(enhanced_title, summary_text, role=role))
+        save_ai_response(cache_key, analysis)
     st.divider()
     
     with st.expander("기사 원문 요약 보기"):
@@ -35,13 +41,18 @@ def show_analysis_dialog(title, summary_text, pub_dt, role="filter"):
         # URL이 로컬이거나 기타 주소면 로컬로 표시
         display_model = f"🏠 Local ({display_model})"
 
-    analysis_time = get_now_kst().strftime('%H:%M:%S')
+    if cached:
+        analysis_time = datetime.fromtimestamp(cached_at, KST).strftime('%m-%d %H:%M:%S') + " (💾 캐시)"
+    else:
+        analysis_time = get_now_kst().strftime('%H:%M:%S')
     
     st.caption(
         f"🤖 사용 모델: {display_model} | "
         f"🕒 분석 시각: {analysis_time} | "
         f"📊 분석 모드: {'단기 판독' if role == 'filter' else '심층 전략'}"
     )
+    if cached:
+        st.button("🔄 다시 분석", key=reanalyze_key)
 
 def clean_html(raw_html):
     if not raw_html: return "요약 내용 없음"
@@ -55,93 +66,152 @@ def parse_rss_date(date_str):
         return datetime.fromtimestamp(time.mktime(p))
     except: return datetime.now()
 
-def load_pending_files(range_type, target_feed=None):
+@st.cache_data(show_spinner=False, max_entries=32)
+def load_news_view(target_feed, news_version, g_exc_str, by_score=False):
     """
-    단계별 로그를 통해 원인을 파악하는 뉴스 로더
+    뉴스 스트리밍 화면용 캐시 조회 계층.
+    저장소 버전(news_version)이나 제외어가 바뀔 때만 다시 조회하므로 페이지 이동은 즉시 처리됩니다.
     """
+    rows = query_news(source=target_feed)
+    rows = [r for r, ok in zip(rows, filter_many([r['title'] for r in rows], g_exc_str)) if ok]
     news_list = []
-    if not os.path.exists(PENDING_PATH):
-        st.error(f"❌ 경로 미존재: {PENDING_PATH}")
-        return news_list
-        
-    # 🔍 로그 1: 물리적 파일 검색
-    all_files = os.listdir(PENDING_PATH)
-    target_files = [f for f in all_files if f.endswith(".json") or f.endswith(".txt")]
-    print(f"🔍 [STEP 1] 전체 파일: {len(all_files)}개 | 대상 확장자: {len(target_files)}개")
-
-    now_kst = get_now_kst()
-    today_date = now_kst.date()
-    # 시간대 정보 제거(naive) 버전 준비 (비교용)
-    one_week_ago = (now_kst - timedelta(days=7)).replace(tzinfo=None)
-    
-    parse_fail = 0
-    filter_fail = 0
-    
-    # 전역 제외 필터를 루프 밖에서 한 번만 로드
-    config_data = load_data()
-    exc_list = [t.strip().lower() for t in config_data.get('global_exclude', "").split(",") if t.strip()]
+    # 🧩 여러 매체의 같은 스토리는 최신 기사 1건으로 묶어서 표시
+    for row in group_story_clusters(rows):
+        news_list.append({
+            "title": row['title'], "link": row['link'], "published": row['pub_dt'],
+            "source": row['source'], "summary": clean_html(row['summary']),
+            "source_count": row['source_count'], "score": row.get('score')
+        })
+    if by_score:
+        # ⭐ 중요도 높은 순 (미채점은 뒤로, 같은 점수는 최신순 유지)
+        news_list.sort(key=lambda x: -(x["score"] if x["score"] is not None else -1))
+    return news_list
 
-    for filename in target_files:
-        fpath = os.path.join(PENDING_PATH, filename)
-        try:
-            with open(fpath, 'r', encoding='utf-8') as f:
-                if filename.endswith(".json"):
-                    news_data = json.load(f)
-                    title = news_data.get('title', '제목 없음')
-                    pub_str = news_data.get('pub_dt', '')
-                    
-                    # 🎯 날짜 파싱 강화 (pub_dt_str 형식: %Y-%m-%d %H:%M:%S)
-                    try:
-                        pub_dt = datetime.strptime(pub_str, '%Y-%m-%d %H:%M:%S')
-                    except:
-                        # 파싱 실패 시 파일 수정 시간으로 강제 복구
-                        pub_dt = datetime.fromtimestamp(os.path.getmtime(fpath))
-                    
-                    link = news_data.get('link', '')
-                    summary = news_data.get('summary', '')
-                    source = news_data.get('source', '저장된 데이터')
-                else:
-                    lines = f.read().splitlines()
-                    if len(lines) < 3: continue
-                    title = lines[0].replace("제목: ", "")
-                    pub_str = lines[2].replace("날짜: ", "")
-                    pub_dt = parse_rss_date(pub_str)
-                    link = lines[1].replace("링크: ", "")
-                    summary = "\n".join(lines[3:]).replace("요약: ", "")
-                    source = "저장된 데이터"
-
-                # 🔍 로그 2: 필터링 전 데이터 확보 확인
-                # 시간대 정보가 섞여 비교 에러가 나는 것을 방지
-                pub_dt_naive = pub_dt.replace(tzinfo=None) if pub_dt.tzinfo else pub_dt
-                
-                # 필터링 로직
-                if range_type == "오늘" and pub_dt_naive.date() != today_date:
-                    filter_fail += 1
-                    continue
-                if range_type == "일주일" and pub_dt_naive < one_week_ago:
-                    filter_fail += 1
-                    continue
-                
-                # 전역 제외 필터 검사
-                if not check_keyword_filter(title, exc_list):
-                    filter_fail += 1
-                    continue
-                
-                news_list.append({
-                    "title": title, "link": link, "published": pub_str, 
-                    "summary": summary, "pub_dt": pub_dt_naive, "source": source
-                })
+@st.cache_resource
+def get_news_refresh_state():
+    """세션 간 공유되는 '지금 새로고침' 백그라운드 수집 상태"""
+    return {"lock": threading.Lock(), "thread": None, "finished_at": None, "new_saved": 0}
 
-        except Exception as e:
-            parse_fail += 1
-            print(f"❌ [에러] {filename} 로드 실패: {e}")
-            continue
-            
-    # 🔍 로그 3: 최종 결과 집계
-    print(f"✅ [STEP 2] 최종 로드: {len(news_list)}개 | 파싱실패: {parse_fail} | 기간/필터제외: {filter_fail}")
+def start_news_refresh(feeds, g_exc_str):
+    """백그라운드 스레드에서 피드를 즉시 수집합니다. (이미 수집 중이면 False)"""
+    state = get_news_refresh_state()
+    with state["lock"]:
+        if state["thread"] and state["thread"].is_alive():
+            return False
+
+        def _run():
+            try:
+                state["new_saved"] = collect_feeds(feeds, save_news_entry, g_exc_str)
+            except Exception as e:
+                print(f"⚠️ 수동 뉴스 수집 실패: {e}")
+            state["finished_at"] = get_now_kst()
+
+        state["thread"] = threading.Thread(target=_run, name="news-refresh", daemon=True)
+        state["thread"].start()
+    return True
+
+# --- [대시보드 시장 데이터: stale-while-revalidate] ---
+# (스냅샷 파일, 신선도 기준(초), 갱신 함수) - 화면은 항상 마지막 스냅샷으로 즉시 그리고, 오래되면 뒤에서 갱신
+MARKET_SNAPSHOTS = {
+    "krx": ("krx_summary_v2.json", 600, get_krx_summary_raw),
+    "global": ("global_financials.json", 600, get_global_financials_raw),
+    "fed": ("fed_liquidity.json", 3600, get_fed_liquidity_raw),
+}
+
+@st.cache_resource
+def get_market_snapshot_state():
+    """세션 간 공유되는 스냅샷 메모리 사본(mtime 기준)과 백그라운드 갱신 상태"""
+    return {"lock": threading.Lock(), "memo": {}, "threads": {}, "attempted": {}}
+
+def _refresh_market_snapshot(name):
+    """갱신 스레드를 시작합니다. 이미 갱신 중이거나 최근에 시도했다면 건너뜁니다."""
+    state = get_market_snapshot_state()
+    _, ttl, fetch_func = MARKET_SNAPSHOTS[name]
+    with state["lock"]:
+        th = state["threads"].get(name)
+        if th and th.is_alive(): return
+        # 💡 갱신해도 파일이 바뀌지 않는 경우(FRED 변동 없음 등) 매 rerun마다 재시도하지 않도록 TTL 동안 보류
+        if time.time() - state["attempted"].get(name, 0) < ttl: return
+        state["attempted"][name] = time.time()
+
+        def _run():
+            try:
+                fetch_func()
+            except Exception as e:
+                print(f"⚠️ [대시보드] {name} 백그라운드 갱신 실패: {e}")
+
+        state["threads"][name] = threading.Thread(target=_run, name=f"snapshot-{name}", daemon=True)
+        state["threads"][name].start()
+
+def read_market_snapshot(name, default):
+    """
+    마지막 스냅샷을 즉시 반환합니다. (네트워크 대기 없음)
+    JSON은 파일 mtime이 바뀔 때만 다시 읽고, 신선도 기준을 넘었거나 없으면 백그라운드 갱신을 시작합니다.
+    반환: (데이터, 스냅샷 mtime 또는 None)
+    """
+    state = get_market_snapshot_state()
+    file_name, ttl, _ = MARKET_SNAPSHOTS[name]
+    path = os.path.join(BASE_PATH, "cache", file_name)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+
+    if mtime is None or time.time() - mtime >= ttl:
+        _refresh_market_snapshot(name)
+    if mtime is None:
+        return default, None
+
+    memo = state["memo"].get(name)
+    if memo and memo[0] == mtime:
+        return memo[1], mtime
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        state["memo"][name] = (mtime, snapshot)
+        return snapshot, mtime
+    except Exception:
+        # 쓰는 중이거나 손상된 경우 이전 사본 유지
+        return (memo[1], memo[0]) if memo else (default, None)
+
+def format_data_age(mtime):
+    """스냅샷 mtime을 '3분 전' 형태로 표시합니다."""
+    if mtime is None: return "수집 대기"
+    sec = max(0, int(time.time() - mtime))
+    if sec < 60: return "방금"
+    if sec < 3600: return f"{sec // 60}분 전"
+    if sec < 86400: return f"{sec // 3600}시간 전"
+    return f"{sec // 86400}일 전"
+
+@st.fragment(run_every=3)
+def render_report_job(r_type):
+    """보고서 작업 진행 상황을 3초마다 다시 그립니다. (이 영역만 갱신되므로 페이지 전체는 대기하지 않음)"""
+    job = get_latest_report_job(r_type)
+    if not job: return
     
-    news_list.sort(key=lambda x: x['pub_dt'], reverse=True)
-    return news_list
+    if job["status"] in ("queued", "running"):
+        elapsed = int(time.time() - (job["started_at"] or job["requested_at"]))
+        wait_label = "대기" if job["status"] == "queued" else "진행"
+        st.info(f"⏳ 작업 #{job['id']} | {job['stage'] or ''} ({wait_label} {elapsed}초) - 창을 닫거나 새로고침해도 계속 생성됩니다.")
+        if job["partial"]:
+            with st.container(border=True, height=400):
+                st.markdown(job["partial"])
+    elif st.session_state.report_jobs.get(r_type) == job["id"]:
+        # 이 세션에서 요청한 작업이 끝나면 결과를 본문에 올리고 화면 전체를 갱신
+        del st.session_state.report_jobs[r_type]
+        if job["status"] == "done" and job["result_path"]:
+            try:
+                with open(job["result_path"], "r", encoding="utf-8") as f:
+                    st.session_state.last_report_content = f.read()
+                st.session_state.report_chat_history = []
+            except Exception as e:
+                st.error(f"❌ 완성된 보고서를 읽지 못했습니다: {e}")
+                return
+            st.rerun()
+        else:
+            st.error(f"🚨 작업 #{job['id']} 보고서 생성 실패: {job['error']}")
+    elif job["status"] == "failed" and time.time() - (job["finished_at"] or 0) < 600:
+        st.error(f"🚨 최근 작업 #{job['id']} 보고서 생성 실패: {(job['error'] or '')[:200]}")
 
 def save_data(data):
     """변경된 설정 데이터를 JSON 파일로 안전하게 저장합니다."""
@@ -196,8 +266,8 @@ if 'page_number' not in st.session_state: st.session_state.page_number = 1
 
 # --- 4. 최상단 대메뉴 ---
 st.title("🤖 AI Analyst System")
-m_cols = st.columns(3)
-menu_items = [("📡 뉴스 스트리밍", "뉴스"), ("🏛️ AI 투자 보고서", "AI"), ("⚙️ 설정", "설정")]
+m_cols = st.columns(4)
+menu_items = [("📡 뉴스 스트리밍", "뉴스"), ("🏛️ AI 투자 보고서", "AI"), ("🔎 검색", "검색"), ("⚙️ 설정", "설정")]
 
 for i, (label, m_key) in enumerate(menu_items):
     if m_cols[i].button(label, width='stretch', type="primary" if st.session_state.active_menu == m_key else "secondary"):
@@ -244,9 +314,18 @@ if st.session_state.active_menu == "설정":
         f_name = st.text_input("모델명", value=f_default_name, key="f_name_input", disabled=f_disabled)
         f_prompt = st.text_area("기본 요약 지침", value=f_cfg.get("prompt"), height=100, key="f_prompt_input")
         
+        # ⭐ 수집기가 신규 기사를 배치로 채점 (보고서/뉴스 목록의 중요도 정렬에 사용)
+        f_scoring = st.toggle("신규 기사 중요도 자동 채점 (백그라운드)", value=data.get("news_scoring", False), key="f_scoring")
+        try:
+            with open(SCORE_STATS_PATH, "r", encoding="utf-8") as f:
+                s_stats = json.load(f)
+            st.caption(f"⭐ 누적 {s_stats.get('scored', 0)}건 채점 | 평균 {s_stats.get('per_min', 0)}건/분 | 실패 배치 {s_stats.get('failed_batches', 0)}개 | 갱신 {s_stats.get('updated_at', '-')}")
+        except: pass
+        
         if st.button("💾 판독 모델 설정 저장", width='stretch'):
             if "filter_model" not in data: data["filter_model"] = {}
             data["filter_model"].update({"url": f_url, "name": f_name, "prompt": f_prompt})
+            data["news_scoring"] = f_scoring
             save_data(data); st.success("✅ 판독 모델 설정 저장 완료!")
 
     with tab_a:
@@ -278,10 +357,12 @@ if st.session_state.active_menu == "설정":
 
         a_url = st.text_input("API 서버 주소 (URL)", value=a_default_url, help="예: http://192.168.1.105:11434/v1", key="a_url_input", disabled=a_disabled)
         a_name = st.text_input("모델명", value=a_default_name, key="a_name_input", disabled=a_disabled)
+        a_ctx = st.number_input("컨텍스트 한도 (토큰)", 4096, 1_000_000, value=int(a_cfg.get("context_tokens", 16384)), step=1024,
+                                help="보고서 입력(뉴스/과거 리포트)을 이 한도에 맞춰 압축합니다. 출력용 4096 토큰은 별도로 남겨둡니다.", key="a_ctx_input")
         
         if st.button("💾 분석 모델 설정 저장", width='stretch'):
             if "analyst_model" not in data: data["analyst_model"] = {}
-            data["analyst_model"].update({"url": a_url, "name": a_name})
+            data["analyst_model"].update({"url": a_url, "name": a_name, "context_tokens": int(a_ctx)})
             save_data(data); st.success("✅ 분석 모델 설정 저장 완료!")
 
     with tab_g:
@@ -331,7 +412,7 @@ if st.session_state.active_menu == "뉴스":
         st.session_state.show_rss_sidebar = False # 기본으로 닫아두어 광폭 화면 확보
 
     # 🎯 2. 최상단 컨트롤 바
-    t_col1, t_col2 = st.columns([0.8, 0.2])
+    t_col1, t_col_r, t_col2 = st.columns([0.6, 0.2, 0.2])
 
     try:
         if st.session_state.current_feed_idx == "all":
@@ -355,12 +436,12 @@ if st.session_state.active_menu == "뉴스":
     
     # 🎯 [NEW] 5단 탭 구성 종합 대시보드
     try:
-        # 1. 데이터 통합 로드
-        krx_data = get_krx_summary_raw()
-        global_data = get_global_financials_raw()
+        # 1. 데이터 통합 로드 - 마지막 스냅샷으로 즉시 그리고, 오래된 항목은 백그라운드에서 갱신
+        krx_data, krx_mtime = read_market_snapshot("krx", {})
+        global_data, global_mtime = read_market_snapshot("global", {})
         
         # FRED 데이터는 리스트로 오므로 딕셔너리로 변환
-        fed_list = get_fed_liquidity_raw()
+        fed_list, fed_mtime = read_market_snapshot("fed", [])
         fed_data = {item['name']: item for item in fed_list}
         
         # 모든 데이터를 하나의 딕셔너리로 병합
@@ -368,6 +449,12 @@ if st.session_state.active_menu == "뉴스":
         
         # 2. 탭 UI 구성
         st.markdown("##### 📊 주요 시장 지표 요약")
+        snap_state = get_market_snapshot_state()
+        is_updating = any(th.is_alive() for th in list(snap_state["threads"].values()))
+        st.caption(
+            f"🕒 데이터 기준: KRX {format_data_age(krx_mtime)} · 글로벌 {format_data_age(global_mtime)} · FRED {format_data_age(fed_mtime)}"
+            + (" (백그라운드 갱신 중)" if is_updating else "")
+        )
         t1, t2, t3, t4, t5 = st.tabs([
             "🏛️ 주요 지수", "🌍 환율/원자재", "🏦 금리", "🏦 연준 유동성", "🛒 물가/고용"
         ])
@@ -398,6 +485,15 @@ if st.session_state.active_menu == "뉴스":
     except Exception as e:
         st.error(f"대시보드 로드 중 오류 발생: {e}")
 
+    # 🔄 지금 새로고침: 백그라운드 수집만 시작하고 화면은 저장소 데이터로 바로 그립니다.
+    refresh_state = get_news_refresh_state()
+    is_refreshing = bool(refresh_state["thread"] and refresh_state["thread"].is_alive())
+    if t_col_r.button("⏳ 수집 중..." if is_refreshing else "🔄 지금 새로고침", width='stretch', disabled=is_refreshing):
+        start_news_refresh(data.get('feeds', []), data.get("global_exclude", ""))
+        st.toast("백그라운드에서 뉴스를 수집합니다. 잠시 후 목록이 갱신됩니다.")
+    elif refresh_state["finished_at"] and not is_refreshing:
+        t_col_r.caption(f"마지막 수집 {refresh_state['finished_at'].strftime('%H:%M:%S')} (+{refresh_state['new_saved']})")
+
     # 버튼을 우측 끝에 배치하여 사이드바 열기 유도
     btn_text = "📂 RSS 닫기" if st.session_state.show_rss_sidebar else "📂 RSS 관리"
     if t_col2.button(btn_text, width='stretch', type="secondary"):
@@ -412,22 +508,13 @@ if st.session_state.active_menu == "뉴스":
         col_main, col_side = st.columns([0.999, 0.001])
 
     with col_main:
-        full_list = []
-        target = data.get('feeds', []) if st.session_state.current_feed_idx == "all" else [data['feeds'][st.session_state.current_feed_idx]]
-        
-        for f_info in target:
-            try:
-                parsed = feedparser.parse(f_info['url'])
-                for e in parsed.entries:
-                    # 제목 필터 (전역 제외어만 적용)
-                    g_exc = [k.strip().lower() for k in data.get("global_exclude", "").split(",") if k.strip()]
-
-                    if check_keyword_filter(e.title, g_exc):
-                        e['source'] = f_info['name']
-                        full_list.append(e)
-            except: continue
-            
-        full_list.sort(key=lambda x: x.get('published_parsed', 0), reverse=True)
+        target_feed = None if st.session_state.current_feed_idx == "all" else data['feeds'][st.session_state.current_feed_idx]['name']
+        try:
+            by_score = st.toggle("⭐ 중요도순 정렬", key="news_sort_by_score")
+            full_list = load_news_view(target_feed, get_news_version(), data.get("global_exclude", ""), by_score)
+        except Exception as e:
+            st.error(f"❌ 뉴스 저장소 로드 실패: {e}")
+            full_list = []
         
         if full_list:
             items_per_page = 10
@@ -436,10 +523,12 @@ if st.session_state.active_menu == "뉴스":
             
             for entry in full_list[start_idx : start_idx + items_per_page]:
                 with st.container(border=True):
-                    st.caption(f"📍 {entry.get('source')} | {entry.get('published', '')}")
+                    same_story = f" | 🧩 {entry['source_count']}개 매체 보도" if entry.get('source_count', 1) > 1 else ""
+                    importance = f" | ⭐ {entry['score']}/5" if entry.get('score') is not None and entry['score'] >= 0 else ""
+                    st.caption(f"📍 {entry.get('source')} | {entry.get('published', '')}{same_story}{importance}")
                     st.markdown(f"#### {entry.get('title')}")
                     
-                    cleaned_summary = clean_html(entry.get('summary', ''))
+                    cleaned_summary = entry.get('summary', '')
                     st.write(cleaned_summary[:200] + "...")
                     
                     btn_c1, btn_c2 = st.columns([0.2, 0.8])
@@ -570,17 +659,71 @@ if st.session_state.active_menu == "뉴스":
             # 🎯 사이드바가 숨겨졌을 때는 아주 얇은 공간만 유지하거나 비워둡니다.
             st.empty()
 
+# [2-1. 뉴스 / 보고서 전문 검색]
+elif st.session_state.active_menu == "검색":
+    st.subheader("🔎 뉴스 · 보고서 검색")
+
+    s_col1, s_col2 = st.columns([0.75, 0.25])
+    search_q = s_col1.text_input("검색어", key="search_query", placeholder="예: 환율 연준 금리", label_visibility="collapsed")
+    kind_label = s_col2.selectbox("검색 범위", ["전체", "뉴스", "보고서"], key="search_kind", label_visibility="collapsed")
+
+    # 검색 조건이 바뀌면 첫 페이지부터
+    if st.session_state.get("search_cond") != (search_q, kind_label):
+        st.session_state.search_cond = (search_q, kind_label)
+        st.session_state.search_page = 1
+
+    if search_q.strip():
+        started = time.time()
+        hits, total = search_documents(
+            search_q, kind={"뉴스": "news", "보고서": "report"}.get(kind_label), page=st.session_state.search_page
+        )
+        total_pages = max(1, math.ceil(total / SEARCH_PAGE_SIZE))
+        st.caption(f"총 {total:,}건 · {st.session_state.search_page}/{total_pages} 페이지 · {(time.time() - started) * 1000:.0f}ms")
+
+        for hit in hits:
+            with st.container(border=True):
+                icon = "📰" if hit["kind"] == "news" else "📑"
+                st.caption(f"{icon} {hit.get('source') or ''} | {hit.get('ts') or ''}")
+                st.markdown(f"#### {hit['title']}")
+                if hit["snippet"]:
+                    st.markdown(hit["snippet"])
+                if hit["kind"] == "news":
+                    if hit.get("link"):
+                        st.link_button("🌐 원문", hit["link"])
+                elif st.button("📖 보고서 열기", key=f"search_open_{hit['ref']}"):
+                    try:
+                        with open(os.path.join(REPORT_DIR, hit["ref"]), "r", encoding="utf-8") as f:
+                            st.session_state.last_report_content = f.read()
+                        st.session_state.active_menu = "AI"
+                        st.rerun()
+                    except FileNotFoundError:
+                        st.warning("⚠️ 보고서 파일을 찾을 수 없습니다. (삭제됨)")
+
+        if total_pages > 1:
+            nav_l, nav_c, nav_r = st.columns([0.2, 0.6, 0.2])
+            if nav_l.button("< 이전", key="search_prev", width='stretch', disabled=st.session_state.search_page <= 1):
+                st.session_state.search_page -= 1
+                st.rerun()
+            if nav_r.button("다음 >", key="search_next", width='stretch', disabled=st.session_state.search_page >= total_pages):
+                st.session_state.search_page += 1
+                st.rerun()
+        if not hits:
+            st.warning("🔎 검색 결과가 없습니다.")
+    else:
+        st.info("💡 기사 제목/요약과 저장된 보고서 본문을 함께 검색합니다. 여러 단어는 모두 포함된 결과만 표시됩니다.")
+
 # [3. AI 투자 보고서]
 elif st.session_state.active_menu == "AI":
     st.subheader("📑 AI 투자 사령부 보고서")
     
     # 1. 기초 설정 (기존 경로 및 세션 유지)    
-    DIR_MAP = {'daily': '01_daily', 'weekly': '02_weekly', 'monthly': '03_monthly'}
     
     if "report_chat_history" not in st.session_state:
         st.session_state.report_chat_history = []
     if "last_report_content" not in st.session_state:
         st.session_state.last_report_content = ""
+    if "report_jobs" not in st.session_state:
+        st.session_state.report_jobs = {}  # {r_type: 이 세션에서 요청한 작업 id}
 
     # 🎯 탭 구성: 일간, 주간, 월간
     tabs = st.tabs(["📅 일간 보고서", "🗓️ 주간 보고서", "📊 월간 보고서"])
@@ -591,56 +734,53 @@ elif st.session_state.active_menu == "AI":
     for i, tab in enumerate(tabs):
         r_type = r_types[i]
         r_days = r_days_map[r_type]
-        
-        # 사령관님 폴더 매칭
-        target_dir = os.path.join(REPORT_DIR, DIR_MAP.get(r_type, "05_etc"))
-        os.makedirs(target_dir, exist_ok=True)
 
         with tab:
             st.markdown(f"#### 🏛️ {r_type.upper()} 분석 컨트롤")
             
-            # 📁 과거 기록 스캔 (latest.txt 제외)
-            r_files = sorted([f for f in os.listdir(target_dir) if f.endswith(".txt") and f != "latest.txt"], reverse=True)
+            # 📁 과거 기록 목록 (매니페스트 조회 - 파일을 열지 않고 메타데이터 표시)
+            r_entries = list_reports(r_type)
             
             c1, c2 = st.columns([0.8, 0.2])
-            selected_f = c1.selectbox(f"기록실 ({r_type})", r_files, key=f"sel_{r_type}", label_visibility="collapsed")
+            selected = c1.selectbox(
+                f"기록실 ({r_type})", r_entries, key=f"sel_{r_type}", label_visibility="collapsed",
+                format_func=lambda e: f"{e['created_at']} · {os.path.basename(e['path'])} · {e['tokens']:,}토큰 · {e['size'] / 1024:,.1f}KB"
+            )
+            if selected and selected.get("abstract"):
+                st.caption(f"📝 {selected['abstract']}")
             
-            if c2.button("📖 로드", key=f"load_{r_type}", width='stretch', disabled=not r_files):
-                with open(os.path.join(target_dir, selected_f), "r", encoding="utf-8") as f:
-                    st.session_state.last_report_content = f.read()
-                st.rerun()
+            if c2.button("📖 로드", key=f"load_{r_type}", width='stretch', disabled=not r_entries):
+                try:
+                    with open(get_report_path(selected), "r", encoding="utf-8") as f:
+                        st.session_state.last_report_content = f.read()
+                    st.rerun()
+                except FileNotFoundError:
+                    st.warning("⚠️ 보고서 파일을 찾을 수 없습니다. (삭제됨 - 목록은 다음 갱신 때 정리됩니다)")
 
             st.divider()
 
-            # 🚀 보고서 생성 버튼
+            # 🚀 보고서 생성 버튼 -> 작업 큐에 등록만 하고, 생성은 수집기(scraper.py) 프로세스가 담당
             display_days = 1 if r_type == "daily" else r_days
-            if st.button(f"🚀 새 {r_type.upper()} 보고서 생성 ({display_days}일 분석)", type="primary", width='stretch', key=f"gen_{r_type}"):
-                st.info(f"🔍 시스템 경로 확인 중...")
-                abs_path = os.path.abspath(PENDING_PATH)
-                st.write(f"📍 현재 PENDING_PATH (절대경로): `{abs_path}`")
+            latest_job = get_latest_report_job(r_type)
+            in_flight = bool(latest_job and latest_job["status"] in ("queued", "running"))
+            btn_label = f"⏳ {r_type.upper()} 보고서 생성 진행 중..." if in_flight else f"🚀 새 {r_type.upper()} 보고서 생성 ({display_days}일 분석)"
+            if st.button(btn_label, type="primary", width='stretch', key=f"gen_{r_type}", disabled=in_flight):
+                st.info(f"🔍 뉴스 저장소 확인 중...")
+                st.write(f"📍 현재 뉴스 저장소: `{os.path.abspath(DB_PATH)}`")
                 
-                if os.path.exists(abs_path):
-                    all_files = os.listdir(abs_path)
-                    st.write(f"📁 폴더 내 전체 파일 개수: {len(all_files)}개")
-                else:
-                    st.error(f"❌ 경로가 존재하지 않습니다: {abs_path}")
-                st.session_state.last_report_content = ""
-                st.session_state.report_chat_history = []
+                try:
+                    st.write(f"📁 저장된 기사 개수: {count_news()}개")
+                except Exception as e:
+                    st.error(f"❌ 뉴스 저장소를 열 수 없습니다: {e}")
                 
-                with st.spinner(f"AI 애널리스트가 {r_days}일치 데이터를 통합 분석 중..."):
-                    # 🎯 common.py의 통합 함수 사용
-                    input_content, label = prepare_report_data(r_type, data)
-                    
-                    if not input_content:
-                        st.error("분석할 데이터가 부족합니다.")
-                        st.stop()
+                job_id, created = enqueue_report_job(r_type)
+                if job_id is None:
+                    st.error("❌ 보고서 작업을 등록하지 못했습니다.")
+                else:
+                    st.session_state.report_jobs[r_type] = job_id
+                    st.toast(f"보고서 작업 #{job_id} {'등록' if created else '(이미 진행 중인 작업에 합류)'} - 창을 닫아도 계속 생성됩니다.")
 
-                    # 🎯 common.py의 통합 함수 사용
-                    report = generate_invest_report(r_type, input_content, data)
-                    
-                    save_report_to_file(report, r_type)
-                    st.session_state.last_report_content = report
-                    st.rerun()
+            render_report_job(r_type)
 
     # 3. 결과 출력 및 대화창 (하단 공통)
     if st.session_state.last_report_content:
@@ -664,14 +804,18 @@ elif st.session_state.active_menu == "AI":
             current_time_info = f"{now.strftime('%Y-%m-%d %H:%M:%S')} ({days[now.weekday()]}요일)"
             
             # 2. 페르소나 및 시간 정보가 포함된 시스템 컨텍스트
+            # 💡 페르소나 -> 보고서 본문(같은 보고서면 동일) -> 현재 시각 순서: 후속 질문이 접두부 캐시를 재사용
             chat_context = (
                 f"당신은 전문 금융 애널리스트입니다.\n"
-                f"🕒 [현재 시각]: {current_time_info}\n"                
+                f"질문에 답할 때 반드시 현재 시각(휴장 여부 등)을 고려하여 답변하세요.\n\n"
                 f"📝 [보고서 본문]:\n{st.session_state.last_report_content}\n\n"
-                f"질문에 답할 때 반드시 현재 시각(휴장 여부 등)을 고려하여 답변하세요."
+                f"🕒 [현재 시각]: {current_time_info}"
             )
             
-            response = get_ai_summary(title="질의", content=chat_input, system_instruction=chat_context, role="analyst")
+            with st.chat_message("user"):
+                st.markdown(chat_input)
+            with st.chat_message("assistant"):
+                response = st.write_stream(stream_ai_summary(title="질의", content=chat_input, system_instruction=chat_context, role="analyst"))
             st.session_state.report_chat_history.append({"role": "assistant", "content": response})
             st.rerun()
 # 🎯 1. 세션에서 보고서 본문 가져오기
@@ -5,7 +5,15 @@ import re
 import requests
 import time
 import math
+import random
 import io
+import hashlib
+import functools
+import bisect
+import sqlite3
+import threading
+import concurrent.futures
+import numpy as np
 import pandas as pd
 import feedparser
 from datetime import datetime, timedelta, date, timezone
@@ -16,10 +24,14 @@ try:
 except ImportError:
     yf = None
 
-from prompts import REPORT_PROMPTS
+from prompts import REPORT_PROMPTS, REPORT_DIGEST_PROMPT
 
 KST = timezone(timedelta(hours=9))
 
+def make_tmp_path(path):
+    """원자적 교체용 임시 파일 경로 (프로세스 + 스레드별로 달라 동시에 써도 서로의 임시 파일을 덮지 않음)"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
 def get_now_kst():
     """현재 한국 시간을 반환합니다."""
     return datetime.now(KST)
@@ -30,6 +42,7 @@ BASE_PATH = "/share/ai_analyst"
 CONFIG_PATH = os.path.join(BASE_PATH, "rss_config.json")
 PENDING_PATH = os.path.join(BASE_PATH, "pending")
 REPORT_DIR = os.path.join(BASE_PATH, "reports")
+DB_PATH = os.path.join(BASE_PATH, "ai_analyst.db")  # 뉴스 저장소 (SQLite, WAL)
 
 def load_addon_config():
     if os.path.exists(OPTIONS_PATH):
@@ -64,32 +77,818 @@ def safe_float(v):
         return float(clean_v) if clean_v else 0.0
     except: return 0.0
 
+def run_parallel(tasks, max_workers=6, timeout=20, label="병렬"):
+    """
+    서로 독립적인 호출들을 워커 풀에서 동시에 실행합니다.
+    tasks: {이름: 인자 없는 함수}. 실패/시간 초과한 호출은 결과에서 빠지고 나머지는 그대로 반환됩니다.
+    반환: (results {이름: 반환값}, timings {이름: 소요초})
+    """
+    results, timings, failed = {}, {}, []
+    if not tasks: return results, timings
+    started = time.time()
+
+    def _timed(name, fn):
+        t0 = time.time()
+        try:
+            return fn()
+        finally:
+            timings[name] = time.time() - t0
+
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tasks))), thread_name_prefix=label)
+    futures = {pool.submit(_timed, name, fn): name for name, fn in tasks.items()}
+    # 워커 수보다 호출이 많으면 여러 차례에 나눠 실행되므로 그만큼 대기 시간 확보
+    waves = math.ceil(len(tasks) / max(1, max_workers))
+    try:
+        for fut in concurrent.futures.as_completed(futures, timeout=timeout * waves):
+            name = futures[fut]
+            try:
+                results[name] = fut.result()
+            except Exception as e:
+                failed.append(f"{name}({e})")
+    except concurrent.futures.TimeoutError:
+        failed += [f"{futures[f]}(시간 초과)" for f in futures if not f.done()]
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    timing_str = ", ".join(f"{k} {v:.1f}s" for k, v in sorted(timings.items(), key=lambda x: -x[1]))
+    print(f"⏱️ [{label}] {len(results)}/{len(tasks)}개 완료, {time.time() - started:.1f}초 | {timing_str}")
+    if failed:
+        print(f"⚠️ [{label}] 실패: {', '.join(failed)}")
+    return results, timings
+
+def _keyword_trie_regex(keywords):
+    """키워드들을 접두사 공유 트리 형태의 정규식으로 변환합니다. (예: 코인, 코스닥 -> 코(?:인|스닥))"""
+    trie = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        # 짧은 키워드가 여기서 끝나면 더 긴 키워드는 '포함 여부' 판정에 불필요
+        if "" in node: return ""
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+
+    return build(trie)
+
+@functools.lru_cache(maxsize=16)
+def _compile_exclude_matcher(keywords):
+    return re.compile(_keyword_trie_regex(keywords)) if keywords else None
+
+def get_exclude_matcher(exc):
+    """
+    제외어 매처를 반환합니다. exc는 쉼표 구분 문자열(global_exclude) 또는 키워드 리스트.
+    같은 제외어 설정에 대해서는 한 번만 컴파일되어 수집기와 앱에서 재사용됩니다.
+    """
+    if isinstance(exc, str):
+        exc = exc.split(",")
+    keywords = tuple(sorted({k.strip().lower() for k in (exc or []) if k and k.strip()}))
+    return _compile_exclude_matcher(keywords)
+
+def filter_many(titles, exc):
+    """제목 목록을 한 번에 판정합니다. 통과(제외어 미포함)면 True인 리스트 반환"""
+    matcher = get_exclude_matcher(exc)
+    if matcher is None:
+        return [bool(t) for t in titles]
+    return [bool(t) and matcher.search(t.lower()) is None for t in titles]
+
 def check_keyword_filter(text, exc_list):
     """
     통합 필터링 로직: 제외어(Exclude) 포함 시 탈락
     scraper.py와 app.py에서 공통으로 사용
     """
-    if not text: return False
-    text = text.lower()
-    
-    exc_list = exc_list or []
-
-    # 1. 제외어(Exclude) 체크
-    if any(x in text for x in exc_list if x):
-        return False
-            
-    return True
+    return filter_many([text], exc_list)[0]
 
 def check_news_filter(title, g_exc):
     """전역 제외 필터만 처리"""
-    if not title: return False
-    title = title.lower()
-    
-    # 1. 제외 필터링 (Global)
-    exc_list = [k.strip().lower() for k in g_exc.split(",") if k.strip()]
-    if any(x in title for x in exc_list): return False
-    
-    return True
+    return filter_many([title], g_exc)[0]
+
+# --- [공용 HTTP 클라이언트] ---
+# 호스트(스킴+도메인)별 Session을 재사용해 연결(TCP/TLS)을 유지합니다. (LLM, FRED, RSS 공용)
+HTTP_RETRY_STATUS = {429, 500, 502, 503, 504}
+HTTP_POOL_SIZE = 16
+_http_sessions = {}
+_http_stats = {}
+_http_lock = threading.Lock()
+
+def _http_host(url):
+    m = re.match(r"^(https?://[^/?#]+)", url)
+    return m.group(1).lower() if m else url
+
+def get_http_session(url):
+    """URL의 호스트 전용 Session을 반환합니다. (프로세스 전체 공유, 커넥션 풀 포함)"""
+    host = _http_host(url)
+    with _http_lock:
+        sess = _http_sessions.get(host)
+        if sess is None:
+            sess = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE)
+            sess.mount("http://", adapter)
+            sess.mount("https://", adapter)
+            _http_sessions[host] = sess
+            _http_stats[host] = {"requests": 0, "retries": 0, "errors": 0}
+    return sess
+
+def _count_http(host, field):
+    with _http_lock:
+        _http_stats.setdefault(host, {"requests": 0, "retries": 0, "errors": 0})[field] += 1
+
+def http_request(method, url, timeout=(5, 30), retries=2, backoff=1.0, **kwargs):
+    """
+    공용 Session으로 요청합니다. timeout은 (연결, 읽기) 초.
+    429/5xx 응답과 연결 실패는 지수 백오프 + 지터로 재시도하고(Retry-After 우선),
+    읽기 타임아웃은 이미 서버가 처리 중일 수 있으므로 재시도하지 않습니다.
+    """
+    host = _http_host(url)
+    sess = get_http_session(url)
+    for attempt in range(retries + 1):
+        _count_http(host, "requests")
+        try:
+            res = sess.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.ConnectionError:
+            if attempt >= retries:
+                _count_http(host, "errors")
+                raise
+        else:
+            if res.status_code not in HTTP_RETRY_STATUS or attempt >= retries:
+                if res.status_code >= 400: _count_http(host, "errors")
+                return res
+            retry_after = res.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                time.sleep(min(int(retry_after), 30))
+                _count_http(host, "retries")
+                continue
+        _count_http(host, "retries")
+        time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+def get_http_stats():
+    """호스트별 요청/재시도/오류 횟수 사본을 반환합니다."""
+    with _http_lock:
+        return {host: dict(v) for host, v in _http_stats.items()}
+
+# --- [뉴스 수집 엔진] ---
+FEED_USER_AGENT = "Mozilla/5.0 (compatible; AI-Invest-Lite/4.1; +https://github.com/plplaaa2/ai_invest)"
+FEED_STATE_PATH = os.path.join(BASE_PATH, "cache", "feed_http_state.json")
+
+def load_feed_http_state():
+    """피드별 ETag / Last-Modified 상태를 로드합니다. {url: {"etag": .., "modified": ..}}"""
+    if os.path.exists(FEED_STATE_PATH):
+        try:
+            with open(FEED_STATE_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except: pass
+    return {}
+
+def save_feed_http_state(state):
+    """피드 상태를 임시 파일에 쓴 뒤 교체합니다 (수집기와 앱이 동시에 써도 파일이 깨지지 않음)"""
+    try:
+        os.makedirs(os.path.dirname(FEED_STATE_PATH), exist_ok=True)
+        tmp_path = make_tmp_path(FEED_STATE_PATH)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, FEED_STATE_PATH)
+    except Exception as e:
+        print(f"⚠️ 피드 상태 저장 실패: {e}")
+
+def fetch_feed(feed, timeout=15, validators=None):
+    """
+    단일 RSS 피드를 조건부 GET으로 내려받아 파싱합니다.
+    (parsed, 소요초, 새 검증자) 반환 - 변경이 없으면(304) parsed는 None
+    """
+    started = time.time()
+    validators = validators or {}
+    req_headers = {"User-Agent": FEED_USER_AGENT}
+    if validators.get("etag"): req_headers["If-None-Match"] = validators["etag"]
+    if validators.get("modified"): req_headers["If-Modified-Since"] = validators["modified"]
+
+    res = http_request("GET", feed['url'], timeout=(5, timeout), retries=1, headers=req_headers)
+    if res.status_code == 304:
+        return None, time.time() - started, validators
+    res.raise_for_status()
+
+    new_validators = {"etag": res.headers.get("ETag", ""), "modified": res.headers.get("Last-Modified", "")}
+    # 💡 인코딩 판별을 위해 응답 헤더도 feedparser에 넘겨줍니다.
+    parsed = feedparser.parse(res.content, response_headers={"content-type": res.headers.get("content-type", "")})
+    return parsed, time.time() - started, new_validators
+
+def collect_feeds(feeds, save_func, g_exc_str="", max_workers=8, timeout=15, max_entries=50):
+    """
+    피드를 워커 풀에서 병렬로 내려받고, 필터링/저장은 호출 스레드에서만 수행합니다 (단일 writer).
+    한 사이클의 소요 시간은 피드 합계가 아니라 가장 느린 피드로 결정됩니다.
+    (대기 한도: timeout*2 x 워커 차례 수 - 뒤 차례에 시작하는 피드도 같은 여유를 가짐)
+    """
+    if not feeds: return 0
+    started = time.time()
+    new_saved = 0
+    unchanged = 0
+    http_state = load_feed_http_state()
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(feeds))), thread_name_prefix="feed")
+    futures = {pool.submit(fetch_feed, f, timeout, http_state.get(f['url'])): f for f in feeds}
+    # 워커 수보다 피드가 많으면 여러 차례에 나눠 실행되므로 그만큼 대기 시간 확보 (run_parallel과 동일)
+    waves = math.ceil(len(feeds) / max(1, max_workers))
+    try:
+        for fut in concurrent.futures.as_completed(futures, timeout=timeout * 2 * waves):
+            feed = futures[fut]
+            name = feed.get('name')
+            try:
+                parsed, elapsed, validators = fut.result()
+            except Exception as e:
+                print(f"   └─ ❌ {name} 오류: {e}")
+                continue
+
+            # 🎯 304: 파싱/필터링/저장 단계를 통째로 건너뜀
+            if parsed is None:
+                unchanged += 1
+                print(f"   └─ {name}: {elapsed:.1f}초 | 변경 없음 (304)")
+                continue
+
+            feed_new = 0
+            entries = parsed.entries[:max_entries]
+            passed = filter_many([e.get('title', '') for e in entries], g_exc_str)
+            for entry, ok in zip(entries, passed):
+                if ok and save_func(entry, name):
+                    feed_new += 1
+            new_saved += feed_new
+
+            # 🎯 저장까지 끝난 뒤에 검증자 갱신 (검증자를 주지 않는 서버는 상태에서 제외)
+            if validators.get("etag") or validators.get("modified"):
+                http_state[feed['url']] = validators
+            else:
+                http_state.pop(feed['url'], None)
+            print(f"   └─ {name}: {elapsed:.1f}초 | {feed_new}개 신규 저장")
+    except concurrent.futures.TimeoutError:
+        late = [futures[f].get('name') for f in futures if not f.done()]
+        print(f"   └─ ⏱️ 응답 지연으로 이번 주기 제외: {', '.join(late)}")
+    finally:
+        save_feed_http_state(http_state)
+        # 지연된 피드를 기다리지 않고 바로 다음 단계로 진행
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    print(f"⏱️ 피드 {len(feeds)}개 수집 소요: {time.time() - started:.1f}초 (변경 없음: {unchanged}개)")
+    return new_saved
+
+# --- [뉴스 저장소 (SQLite)] ---
+# 기사 1건 = 파일 1개 방식 대신 단일 인덱스 저장소를 사용합니다. (SD카드 환경의 소형 파일 I/O 제거)
+_db_local = threading.local()
+
+def _init_db(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS news (
+            key        TEXT PRIMARY KEY,   -- 날짜(YYYYMMDD) + 제목 MD5 12자리
+            pub_dt     TEXT NOT NULL,      -- KST '%Y-%m-%d %H:%M:%S'
+            source     TEXT,
+            title      TEXT NOT NULL,
+            title_hash TEXT NOT NULL,
+            summary    TEXT,
+            link       TEXT,
+            saved_at   REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_news_pub_dt ON news(pub_dt);
+        CREATE INDEX IF NOT EXISTS idx_news_source ON news(source, pub_dt);
+        CREATE INDEX IF NOT EXISTS idx_news_saved_at ON news(saved_at);
+
+        -- 중복 판별 전용 인덱스: 기사 본문이 정리(purge)된 뒤에도 TTL 동안 재수집을 막습니다.
+        CREATE TABLE IF NOT EXISTS news_seen (
+            key     TEXT PRIMARY KEY,
+            seen_at REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_news_seen_at ON news_seen(seen_at);
+
+        -- SimHash 밴드(LSH) 인덱스: 같은 밴드 값을 공유하는 기사만 유사도 비교 후보가 됩니다.
+        CREATE TABLE IF NOT EXISTS news_bands (
+            band_key INTEGER NOT NULL,     -- 밴드 번호 * 256 + 밴드 값
+            key      TEXT NOT NULL,
+            PRIMARY KEY (band_key, key)
+        ) WITHOUT ROWID;
+
+        -- AI 응답 캐시: (모델 엔드포인트, 모델명, 온도, 지침 해시, 입력 해시) -> 응답 본문
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key        TEXT PRIMARY KEY,
+            response   TEXT NOT NULL,
+            size       INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at);
+
+        -- 보고서 생성 작업 큐: 앱이 등록하고 수집기(scraper.py) 프로세스가 순서대로 처리합니다.
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            id           INTEGER PRIMARY KEY AUTOINCREMENT,
+            r_type       TEXT NOT NULL,              -- daily / weekly / monthly
+            status       TEXT NOT NULL,              -- queued / running / done / failed
+            origin       TEXT,                       -- manual / auto
+            stage        TEXT,                       -- 진행 단계 표시용
+            partial      TEXT,                       -- 생성 중인 본문 (진행 상황 표시용)
+            result_path  TEXT,
+            error        TEXT,
+            requested_at REAL NOT NULL,
+            started_at   REAL,
+            finished_at  REAL,
+            updated_at   REAL
+        );
+        -- 같은 주기의 대기/실행 중 작업은 1개만 허용 (중복 요청은 기존 작업에 합류)
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_report_jobs_inflight ON report_jobs(r_type) WHERE status IN ('queued', 'running');
+        CREATE INDEX IF NOT EXISTS idx_report_jobs_type ON report_jobs(r_type, id);
+
+        -- 전문 검색 문서 (표시용 원문). 색인 토큰은 같은 rowid의 search_fts에 저장됩니다.
+        CREATE TABLE IF NOT EXISTS search_docs (
+            id         INTEGER PRIMARY KEY,
+            kind       TEXT NOT NULL,              -- news / report
+            ref        TEXT NOT NULL,              -- 기사 key 또는 보고서 상대경로
+            title      TEXT,
+            source     TEXT,
+            link       TEXT,
+            ts         TEXT,                       -- 발행/생성 시각 (KST)
+            body       TEXT,
+            indexed_at REAL NOT NULL,
+            UNIQUE (kind, ref)
+        );
+        CREATE INDEX IF NOT EXISTS idx_search_docs_indexed ON search_docs(kind, indexed_at);
+    """)
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(title_terms, body_terms, tokenize='unicode61')")
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ 전문 검색 색인 생성 실패 (SQLite FTS5 미지원): {e}")
+    # 구버전 저장소 컬럼 보정 (스토리 클러스터)
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(news)")}
+    for col, col_type in [("simhash", "INTEGER"), ("cluster_id", "TEXT"), ("score", "INTEGER"), ("scored_at", "REAL"),
+                          ("score_attempts", "INTEGER")]:
+        if col not in cols:
+            conn.execute(f"ALTER TABLE news ADD COLUMN {col} {col_type}")
+            if col == "score_attempts":
+                # 이전 버전이 '점수 없음'으로 저장한 -1은 재시도 대상으로 되돌림
+                with conn:
+                    conn.execute("UPDATE news SET score = NULL, score_attempts = 1 WHERE score = -1")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_news_cluster ON news(cluster_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_news_unscored ON news(saved_at) WHERE score IS NULL")
+
+def get_db():
+    """스레드별 SQLite 연결을 반환합니다. (WAL 모드 - 수집기 쓰기 중에도 앱 읽기 가능)"""
+    conn = getattr(_db_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _init_db(conn)
+        _db_local.conn = conn
+    return conn
+
+def make_news_key(title, dt_obj):
+    """중복 판별 키 (날짜 + 제목 MD5 해시)와 제목 해시를 반환합니다."""
+    title_hash = hashlib.md5(title.encode()).hexdigest()[:12]
+    return f"{dt_obj.strftime('%Y%m%d')}_{title_hash}", title_hash
+
+def news_entry_to_record(entry, feed_name):
+    """feedparser 엔트리를 저장소 레코드로 변환합니다. (발행 시각은 KST로 통일)"""
+    title = entry.get('title', '').strip()
+    if entry.get('published_parsed'):
+        # UTC 기반 구조체 시간을 KST datetime 객체로 변환
+        dt_obj = datetime.fromtimestamp(time.mktime(entry.published_parsed), tz=timezone.utc).astimezone(KST)
+    else:
+        # 시간 정보가 없는 경우 현재 KST 시각 사용
+        dt_obj = get_now_kst()
+
+    key, title_hash = make_news_key(title, dt_obj)
+    return {
+        "key": key,
+        "title": title,
+        "title_hash": title_hash,
+        "pub_dt": dt_obj.strftime('%Y-%m-%d %H:%M:%S'),
+        "source": feed_name,
+        "summary": entry.get('summary', '내용 없음'),
+        "link": entry.get('link', '')
+    }
+
+# --- [유사 기사(스토리) 클러스터링: SimHash + 밴드 LSH] ---
+SIMHASH_BANDS = 8            # 64비트를 8비트씩 8개 밴드로 분할
+SIMHASH_MAX_DISTANCE = 7     # 해밍 거리 7 이하 = 같은 스토리 (밴드 8개이므로 후보 누락 없음)
+CLUSTER_WINDOW_DAYS = 3      # 이 기간 안의 기사끼리만 묶음
+_TITLE_NOISE_RE = re.compile(r"\[[^\]]*\]|\([^)]*\)|【[^】]*】|[^\w]")
+
+def title_simhash(title, n=2):
+    """말머리([속보], (종합) 등)와 문장부호를 뺀 제목의 문자 n-gram(기본 2-gram) SimHash (64비트)"""
+    text = _TITLE_NOISE_RE.sub("", (title or "").lower())
+    grams = [text[i:i + n] for i in range(len(text) - n + 1)] or ([text] if text else [])
+    weights = [0] * 64
+    for g in grams:
+        h = int.from_bytes(hashlib.blake2b(g.encode(), digest_size=8).digest(), "big")
+        for i in range(64):
+            weights[i] += 1 if (h >> i) & 1 else -1
+    value = sum(1 << i for i in range(64) if weights[i] > 0)
+    # SQLite INTEGER(부호 있는 64비트)에 맞게 변환
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def _simhash_band_keys(simhash):
+    u = simhash & 0xFFFFFFFFFFFFFFFF
+    return [b * 256 + ((u >> (8 * b)) & 0xFF) for b in range(SIMHASH_BANDS)]
+
+def find_story_cluster(conn, simhash, pub_dt_str):
+    """밴드가 겹치는 최근 기사 중 해밍 거리가 가장 가까운 기사의 cluster_id를 반환합니다."""
+    try:
+        since = (datetime.strptime(pub_dt_str, '%Y-%m-%d %H:%M:%S') - timedelta(days=CLUSTER_WINDOW_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+    except:
+        since = "0000"
+    band_keys = _simhash_band_keys(simhash)
+    rows = conn.execute(
+        f"SELECT DISTINCT n.simhash, n.cluster_id FROM news_bands b JOIN news n ON n.key = b.key "
+        f"WHERE b.band_key IN ({','.join('?' * len(band_keys))}) AND n.pub_dt >= ?",
+        (*band_keys, since)
+    ).fetchall()
+
+    best_id, best_dist = None, SIMHASH_MAX_DISTANCE + 1
+    for other, cluster_id in rows:
+        dist = bin((simhash ^ other) & 0xFFFFFFFFFFFFFFFF).count("1")
+        if dist < best_dist:
+            best_id, best_dist = cluster_id, dist
+    return best_id
+
+def _assign_story_cluster(conn, key, title, pub_dt_str):
+    simhash = title_simhash(title)
+    cluster_id = find_story_cluster(conn, simhash, pub_dt_str) or key
+    conn.execute("UPDATE news SET simhash = ?, cluster_id = ? WHERE key = ?", (simhash, cluster_id, key))
+    conn.executemany("INSERT OR IGNORE INTO news_bands (band_key, key) VALUES (?, ?)",
+                     [(bk, key) for bk in _simhash_band_keys(simhash)])
+
+def backfill_story_clusters():
+    """클러스터 정보가 없는 기존 기사에 SimHash/클러스터를 부여합니다. (발행 순서대로)"""
+    conn = get_db()
+    rows = conn.execute("SELECT key, title, pub_dt FROM news WHERE simhash IS NULL ORDER BY pub_dt").fetchall()
+    with conn:
+        for key, title, pub_dt_str in rows:
+            _assign_story_cluster(conn, key, title, pub_dt_str)
+    return len(rows)
+
+def group_story_clusters(rows):
+    """
+    최신순 기사 목록을 스토리 단위로 묶습니다.
+    각 클러스터의 첫(가장 최신) 기사가 대표가 되며 source_count(보도 매체 수)가 추가됩니다.
+    """
+    groups = {}
+    for row in rows:
+        gid = row.get("cluster_id") or row.get("title_hash") or row.get("key")
+        if gid in groups:
+            rep = groups[gid]
+            rep["_sources"].add(row.get("source"))
+            rep["cluster_size"] += 1
+            # 스토리 중요도는 묶인 기사 중 최고 점수
+            if row.get("score") is not None and row["score"] > (rep["score"] if rep.get("score") is not None else -2):
+                rep["score"] = row["score"]
+        else:
+            groups[gid] = {**row, "_sources": {row.get("source")}, "cluster_size": 1}
+    result = []
+    for rep in groups.values():
+        rep["source_count"] = len(rep.pop("_sources"))
+        result.append(rep)
+    return result
+
+def store_news(record):
+    """기사 1건을 저장합니다. 새로 저장되면 True, 중복 인덱스에 이미 있는 키면 False"""
+    saved_at = record.get("saved_at", time.time())
+    conn = get_db()
+    with conn:
+        # 🎯 중복 인덱스에 먼저 기록 - 이미 본 키면 기사 테이블은 건드리지 않음
+        if conn.execute("INSERT OR IGNORE INTO news_seen (key, seen_at) VALUES (?, ?)", (record["key"], saved_at)).rowcount == 0:
+            return False
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO news (key, pub_dt, source, title, title_hash, summary, link, saved_at) "
+            "VALUES (:key, :pub_dt, :source, :title, :title_hash, :summary, :link, :saved_at)",
+            {**record, "saved_at": saved_at}
+        )
+        # 🎯 수집 시점에 스토리 클러스터 부여 (여러 매체의 같은 기사 묶음)
+        if cur.rowcount == 1:
+            _assign_story_cluster(conn, record["key"], record["title"], record["pub_dt"])
+            index_news_search(conn, record)  # 🔎 전문 검색 색인 (같은 트랜잭션)
+    return cur.rowcount == 1
+
+def is_news_seen(key):
+    """중복 인덱스 조회 (기본키 조회 1회 - 전체 스캔 없음)"""
+    return get_db().execute("SELECT 1 FROM news_seen WHERE key = ?", (key,)).fetchone() is not None
+
+def init_news_seen_index():
+    """중복 인덱스가 비어 있으면 기존 기사 키로 1회 채웁니다. (저장소 도입 직후 업그레이드용)"""
+    conn = get_db()
+    if conn.execute("SELECT 1 FROM news_seen LIMIT 1").fetchone() is None:
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO news_seen (key, seen_at) SELECT key, saved_at FROM news")
+    return conn.execute("SELECT COUNT(*) FROM news_seen").fetchone()[0]
+
+def expire_news_seen(ttl_sec):
+    """TTL이 지난 중복 키를 삭제합니다. (seen_at 인덱스 범위 삭제)"""
+    conn = get_db()
+    with conn:
+        return conn.execute("DELETE FROM news_seen WHERE seen_at < ?", (time.time() - ttl_sec,)).rowcount
+
+def query_news(limit=None, since=None, source=None):
+    """
+    최신순 기사 목록을 반환합니다.
+    - since: 이 시각(datetime 또는 'YYYY-MM-DD HH:MM:SS') 이후 발행분만
+    - source: 특정 피드 이름의 기사만
+    """
+    sql = "SELECT key, pub_dt, source, title, title_hash, summary, link, saved_at, cluster_id, score FROM news"
+    where, params = [], []
+    if since is not None:
+        where.append("pub_dt >= ?")
+        params.append(since.strftime('%Y-%m-%d %H:%M:%S') if hasattr(since, 'strftime') else str(since))
+    if source is not None:
+        where.append("source = ?")
+        params.append(source)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY pub_dt DESC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return [dict(r) for r in get_db().execute(sql, params)]
+
+def save_news_entry(entry, feed_name):
+    """collect_feeds용 기본 저장 함수 (제목 없는 항목 제외)"""
+    record = news_entry_to_record(entry, feed_name)
+    return bool(record["title"]) and store_news(record)
+
+def get_news_version():
+    """저장소 변경 감지용 버전 (기사 수, 마지막 저장 시각, 마지막 채점 시각) - 화면 캐시 키로 사용"""
+    row = get_db().execute("SELECT COUNT(*), MAX(saved_at), MAX(scored_at) FROM news").fetchone()
+    return (row[0], row[1] or 0, row[2] or 0)
+
+# --- [전문 검색 색인 (SQLite FTS5)] ---
+# 기사 제목/요약과 보고서 본문을 한 색인에 넣어, 파일을 훑지 않고 순위별 검색 결과를 돌려줍니다.
+# FTS5 기본 토크나이저는 조사가 붙은 한글 어절("환율이", "환율을")을 하나의 단어로 보므로,
+# 한글은 저장/검색 양쪽에서 2글자 단위(bigram)로 미리 쪼개 넣습니다. ("원달러환율" -> 원달 달러 러환 환율)
+SEARCH_NEWS_RETENTION_DAYS = 180   # 기사 본문 정리(purge_news)와 별개로 검색 색인에 남겨둘 기간
+SEARCH_PAGE_SIZE = 10
+_SEARCH_TOKEN_RE = re.compile(r"[가-힣]+|[^\W_가-힣]+")
+_search_index_checked = False
+
+def search_terms(text):
+    """검색 색인용 토큰 문자열 (한글 2-gram + 소문자 영문/숫자 단어)"""
+    out = []
+    for tok in _SEARCH_TOKEN_RE.findall(text or ""):
+        if "가" <= tok[0] <= "힣":
+            out.extend([tok] if len(tok) == 1 else [tok[i:i + 2] for i in range(len(tok) - 1)])
+        else:
+            out.append(tok.lower())
+    return " ".join(out)
+
+def build_search_query(query):
+    """
+    사용자 검색어를 FTS5 MATCH 식으로 변환합니다. 단어끼리는 AND, 한글 어절은 2-gram 구문(연속) 일치,
+    한 글자 한글과 영문/숫자는 접두어 일치. 검색할 단어가 없으면 None
+    """
+    parts = []
+    for tok in _SEARCH_TOKEN_RE.findall(query or ""):
+        if "가" <= tok[0] <= "힣" and len(tok) > 1:
+            parts.append('"' + " ".join(tok[i:i + 2] for i in range(len(tok) - 1)) + '"')
+        else:
+            parts.append(f'"{tok.lower()}"*')
+    return " ".join(parts) or None
+
+def _index_search_doc(conn, kind, ref, title, body, ts, source=None, link=None):
+    """검색 색인 1건 추가/교체 (호출 측 트랜잭션 안에서 실행)"""
+    old = conn.execute("SELECT id FROM search_docs WHERE kind = ? AND ref = ?", (kind, ref)).fetchone()
+    if old:
+        conn.execute("DELETE FROM search_fts WHERE rowid = ?", (old[0],))
+        conn.execute("DELETE FROM search_docs WHERE id = ?", (old[0],))
+    cur = conn.execute(
+        "INSERT INTO search_docs (kind, ref, title, source, link, ts, body, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (kind, ref, title, source, link, ts, body, time.time())
+    )
+    conn.execute("INSERT INTO search_fts (rowid, title_terms, body_terms) VALUES (?, ?, ?)",
+                 (cur.lastrowid, search_terms(title), search_terms(body)))
+
+def _clean_news_summary(summary):
+    text = re.sub(r"<[^>]+>|\s+", " ", summary or "").strip()
+    return "" if text == "내용 없음" else text
+
+def index_news_search(conn, record):
+    """store_news 트랜잭션 안에서 새 기사를 색인합니다. (FTS5가 없는 환경이면 조용히 건너뜀)"""
+    try:
+        _index_search_doc(conn, "news", record["key"], record["title"], _clean_news_summary(record.get("summary")),
+                          record["pub_dt"], record.get("source"), record.get("link"))
+    except sqlite3.OperationalError:
+        pass
+
+def index_report_search(rel_path, content, meta=None):
+    """보고서 1건을 색인합니다. meta: 매니페스트 항목 (유형/생성 시각)"""
+    meta = meta or {}
+    r_type = meta.get("type", "report")
+    created_at = meta.get("created_at", "")
+    conn = get_db()
+    try:
+        with conn:
+            _index_search_doc(conn, "report", rel_path, f"{r_type.upper()} 보고서 {created_at}".strip(),
+                              content, created_at, r_type, rel_path)
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ [검색] 보고서 색인 실패: {e}")
+
+def remove_search_docs(kind, refs):
+    """색인에서 문서를 제거합니다. (보고서 파일 삭제 시)"""
+    if not refs: return 0
+    conn = get_db()
+    removed = 0
+    try:
+        with conn:
+            for ref in refs:
+                row = conn.execute("SELECT id FROM search_docs WHERE kind = ? AND ref = ?", (kind, ref)).fetchone()
+                if row:
+                    conn.execute("DELETE FROM search_fts WHERE rowid = ?", (row[0],))
+                    conn.execute("DELETE FROM search_docs WHERE id = ?", (row[0],))
+                    removed += 1
+    except sqlite3.OperationalError:
+        pass
+    return removed
+
+def purge_search_index(retention_days=SEARCH_NEWS_RETENTION_DAYS):
+    """보관 기간이 지난 기사 색인을 삭제합니다. (보고서 색인은 파일 삭제와 함께 정리됨)"""
+    threshold = time.time() - retention_days * 86400
+    conn = get_db()
+    try:
+        with conn:
+            conn.execute("DELETE FROM search_fts WHERE rowid IN (SELECT id FROM search_docs WHERE kind = 'news' AND indexed_at < ?)", (threshold,))
+            return conn.execute("DELETE FROM search_docs WHERE kind = 'news' AND indexed_at < ?", (threshold,)).rowcount
+    except sqlite3.OperationalError:
+        return 0
+
+def ensure_search_index():
+    """색인이 비어 있으면 저장된 기사/보고서로 1회 채웁니다. (기능 도입 직후 또는 DB 재생성 시)"""
+    global _search_index_checked
+    if _search_index_checked: return
+    _search_index_checked = True
+    conn = get_db()
+    try:
+        has_news = conn.execute("SELECT 1 FROM search_docs WHERE kind = 'news' LIMIT 1").fetchone()
+        has_report = conn.execute("SELECT 1 FROM search_docs WHERE kind = 'report' LIMIT 1").fetchone()
+        conn.execute("SELECT 1 FROM search_fts LIMIT 1")
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ [검색] 전문 검색 색인을 사용할 수 없습니다 (SQLite FTS5 미지원?): {e}")
+        return
+
+    news_count = report_count = 0
+    if not has_news:
+        rows = conn.execute("SELECT key, pub_dt, source, title, summary, link FROM news").fetchall()
+        with conn:
+            for row in rows:
+                index_news_search(conn, dict(row))
+        news_count = len(rows)
+    if not has_report:
+        for entry in list_reports():
+            try:
+                with open(get_report_path(entry), "r", encoding="utf-8") as f:
+                    index_report_search(entry["path"], f.read(), entry)
+                report_count += 1
+            except Exception as e:
+                print(f"⚠️ [검색] {entry['path']} 색인 실패: {e}")
+    if news_count or report_count:
+        print(f"🔎 [검색] 초기 색인 완료: 기사 {news_count}건, 보고서 {report_count}건")
+
+def make_search_snippet(text, query, width=160):
+    """검색어가 처음 나오는 위치 주변을 잘라 **강조** 표시한 미리보기"""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    words = [w for w in re.findall(r"\S+", query or "") if w]
+    hits = [(m.start(), m.end()) for w in words for m in [re.search(re.escape(w), text, re.I)] if m]
+    start = max(0, min(h[0] for h in hits) - width // 3) if hits else 0
+    snippet = text[start:start + width]
+    for w in sorted(set(words), key=len, reverse=True):
+        snippet = re.sub(f"({re.escape(w)})", r"**\1**", snippet, flags=re.I)
+    return ("…" if start > 0 else "") + snippet + ("…" if start + width < len(text) else "")
+
+def search_documents(query, kind=None, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    기사/보고서 전문 검색. 관련도(BM25, 제목 가중) 순 -> 최신순으로 정렬해 page 단위로 반환합니다.
+    반환: (결과 목록, 전체 건수). 각 결과는 kind/ref/title/source/link/ts/snippet 포함
+    """
+    ensure_search_index()
+    match = build_search_query(query)
+    if not match:
+        return [], 0
+    where, params = "search_fts MATCH ?", [match]
+    if kind:
+        where += " AND d.kind = ?"
+        params.append(kind)
+    conn = get_db()
+    try:
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM search_fts JOIN search_docs d ON d.id = search_fts.rowid WHERE {where}", params
+        ).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT d.kind, d.ref, d.title, d.source, d.link, d.ts, d.body, bm25(search_fts, 4.0, 1.0) AS rank "
+            f"FROM search_fts JOIN search_docs d ON d.id = search_fts.rowid WHERE {where} "
+            f"ORDER BY rank, d.ts DESC LIMIT ? OFFSET ?",
+            params + [int(page_size), (max(1, int(page)) - 1) * int(page_size)]
+        ).fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ [검색] 검색 실패 ({match}): {e}")
+        return [], 0
+    results = []
+    for row in rows:
+        item = dict(row)
+        item["snippet"] = make_search_snippet(item.pop("body"), query)
+        results.append(item)
+    return results, total
+
+# --- [기사 중요도 배치 채점] ---
+# 판독(filter) 모델로 기사 여러 건을 한 프롬프트에 묶어 0~5점을 매깁니다.
+# 응답에서 점수를 찾지 못한 기사는 미채점(NULL)으로 두고 시도 횟수만 올려 SCORE_MAX_ATTEMPTS회까지 재시도합니다.
+SCORE_BATCH_SIZE = 10
+SCORE_MAX_ATTEMPTS = 3
+SCORE_STATS_PATH = os.path.join(BASE_PATH, "cache", "score_stats.json")
+
+def fetch_unscored_news(limit=50):
+    """
+    아직 채점되지 않은 기사를 오래된 저장순으로 반환합니다.
+    (수집 속도가 채점보다 빨라도 밀린 기사부터 소화 - 보관 기간이 지나면 purge_news가 정리)
+    """
+    rows = get_db().execute(
+        "SELECT key, title, summary FROM news WHERE score IS NULL AND COALESCE(score_attempts, 0) < ? "
+        "ORDER BY saved_at LIMIT ?", (SCORE_MAX_ATTEMPTS, int(limit))
+    )
+    return [dict(r) for r in rows]
+
+def save_news_scores(scores):
+    """{key: 점수}를 저장합니다. 점수가 None인 기사는 미채점으로 두고 시도 횟수만 올립니다."""
+    if not scores: return
+    now_ts = time.time()
+    conn = get_db()
+    with conn:
+        conn.executemany("UPDATE news SET score = ?, scored_at = ? WHERE key = ?",
+                         [(int(v), now_ts, k) for k, v in scores.items() if v is not None])
+        conn.executemany("UPDATE news SET score_attempts = COALESCE(score_attempts, 0) + 1 WHERE key = ?",
+                         [(k,) for k, v in scores.items() if v is None])
+
+def score_news_batch(rows, custom_config=None):
+    """
+    기사 묶음을 한 번의 판독 모델 호출로 채점합니다.
+    {key: 점수} 반환 (응답에서 점수를 못 찾은 기사는 None) - 호출 자체가 실패하면 None (다음 주기에 재시도)
+    """
+    cfg = _resolve_model_cfg("filter", custom_config)
+    lines = []
+    for i, row in enumerate(rows, 1):
+        summary = re.sub(r"<[^>]+>|\s+", " ", row.get("summary") or "").strip()[:150]
+        lines.append(f"{i}. {row['title']}" + (f" — {summary}" if summary and summary != "내용 없음" else ""))
+    instruction = (
+        f"{cfg.get('prompt', '')}\n\n"
+        "아래 번호가 매겨진 뉴스 각각에 대해 거시경제/유동성 관점의 중요도를 0~5 정수로 평가하세요.\n"
+        "설명 없이 한 줄에 하나씩 '번호: 점수' 형식으로만 답하세요. (예: 1: 3)"
+    )
+    response = get_ai_summary(f"뉴스 {len(rows)}건 중요도 채점", "\n".join(lines),
+                              system_instruction=instruction, role="filter", custom_config=custom_config)
+    if not response or "❌ [ERROR]" in response:
+        return None
+    found = {}
+    for num, score in re.findall(r"(?m)^\W*(\d+)[\s*]*[:：.)\-][\s*]*([0-5])\b", response):
+        idx = int(num) - 1
+        if 0 <= idx < len(rows) and rows[idx]["key"] not in found:
+            found[rows[idx]["key"]] = int(score)
+    return {row["key"]: found.get(row["key"]) for row in rows}
+
+def count_news():
+    return get_db().execute("SELECT COUNT(*) FROM news").fetchone()[0]
+
+def purge_news(retention_days, max_rows=600):
+    """보관 기간이 지났거나 최대 개수를 넘는 오래된 기사를 삭제합니다. 삭제 건수 반환"""
+    threshold = time.time() - retention_days * 86400
+    conn = get_db()
+    with conn:
+        deleted = conn.execute("DELETE FROM news WHERE saved_at < ?", (threshold,)).rowcount
+        deleted += conn.execute(
+            "DELETE FROM news WHERE key NOT IN (SELECT key FROM news ORDER BY saved_at DESC LIMIT ?)", (max_rows,)
+        ).rowcount
+        if deleted:
+            conn.execute("DELETE FROM news_bands WHERE key NOT IN (SELECT key FROM news)")
+    return deleted
+
+def migrate_pending_files():
+    """(1회성) PENDING_PATH의 기사별 JSON 파일을 저장소로 옮기고 원본 파일을 삭제합니다."""
+    if not os.path.isdir(PENDING_PATH): return 0
+    files = [f for f in os.listdir(PENDING_PATH) if f.endswith(".json")]
+    if not files: return 0
+
+    print(f"📦 기존 뉴스 파일 {len(files)}개를 저장소로 이전합니다...")
+    migrated = 0
+    for f_name in files:
+        fp = os.path.join(PENDING_PATH, f_name)
+        try:
+            with open(fp, "r", encoding="utf-8") as f:
+                news_data = json.load(f)
+            title = news_data.get("title", "").strip()
+            if title:
+                try: dt_obj = datetime.strptime(news_data.get("pub_dt", ""), '%Y-%m-%d %H:%M:%S')
+                except: dt_obj = datetime.fromtimestamp(os.path.getmtime(fp), tz=KST)
+                key, title_hash = make_news_key(title, dt_obj)
+                store_news({
+                    "key": key, "title": title, "title_hash": title_hash,
+                    "pub_dt": dt_obj.strftime('%Y-%m-%d %H:%M:%S'), "source": news_data.get("source", "저장된 데이터"),
+                    "summary": news_data.get("summary", ""), "link": news_data.get("link", ""),
+                    "saved_at": os.path.getmtime(fp)
+                })
+                migrated += 1
+            os.remove(fp)
+        except Exception as e:
+            print(f"⚠️ {f_name} 이전 실패: {e}")
+    print(f"✅ 뉴스 저장소 이전 완료: {migrated}개")
+    return migrated
 
 def save_to_influx(symbol, data, current_time):
     point = Point("financial_metrics").tag("symbol", symbol)
@@ -103,16 +902,10 @@ def save_to_influx(symbol, data, current_time):
             print(f"⚠️ InfluxDB 쓰기 에러 ({symbol}): {e}")
     return False
     
-def save_report_to_file(content, section_name):
-    # 1. 경로 설정 및 폴더 세분화
-    base_dir = REPORT_DIR
-    dir_map = {
-        'daily': '01_daily', 'weekly': '02_weekly', 
-        'monthly': '03_monthly', 'yearly': '04_yearly'
-    }
-    # section_name이 맵에 없으면 기본 폴더 사용
-    subdir = dir_map.get(section_name.lower(), "05_etc")
-    report_dir = os.path.join(base_dir, subdir)
+def save_report_to_file(content, section_name, config_data=None):
+    # 1. 경로 설정 및 폴더 세분화 (section_name이 맵에 없으면 기본 폴더 사용)
+    subdir = get_report_subdir(section_name)
+    report_dir = os.path.join(REPORT_DIR, subdir)
     os.makedirs(report_dir, exist_ok=True)
     
     # 2. 파일명 생성 및 저장 (기록용)
@@ -128,44 +921,306 @@ def save_report_to_file(content, section_name):
     with open(latest_path, "w", encoding="utf-8") as f:
         f.write(content)
 
-    # 4. 🧹 계층형 자동 정제 (Purge) 로직
-    # 규칙: Daily(7일), Weekly(30일), Monthly(365일) 보관
-    purge_rules = {'01_daily': 9, '02_weekly': 35, '03_monthly': 370}
-    if subdir in purge_rules:
-        limit_days = purge_rules[subdir]
-        threshold = time.time() - (limit_days * 86400)
-        for f in os.listdir(report_dir):
-            if f == "latest.txt": continue # 최신 맥락은 보호
-            f_p = os.path.join(report_dir, f)
-            if os.path.isfile(f_p) and os.path.getmtime(f_p) < threshold:
-                os.remove(f_p)
+    # 🗂️ 매니페스트 색인 (방금 쓴 본문으로 바로 기록 - 파일 재열람 없음)
+    try:
+        register_report(filepath, content)
+    except Exception as e:
+        print(f"⚠️ [매니페스트] 색인 실패 (다음 조회 시 재조정): {e}")
+
+    # 📝 상위 주기 입력용 요약본은 백그라운드에서 생성 (저장 응답을 기다리게 하지 않음)
+    if section_name.lower() in DIGEST_SECTIONS and content and "❌ [ERROR]" not in content:
+        start_report_digest(filepath, config_data)
+
+    # 4. 🧹 계층형 자동 정제 (Purge): Daily(9일), Weekly(35일), Monthly(370일) 보관 - latest.txt는 보호
+    if subdir in REPORT_RETENTION_DAYS:
+        try:
+            purge_reports(subdir)
+        except Exception as e:
+            print(f"⚠️ [보고서] 정리 실패: {e}")
                 
     return filepath
     
+# --- [보고서 요약본(digest) 사이드카] ---
+# 저장된 보고서마다 '<파일명>.digest.json'을 한 번 만들어 두고, 주간/월간 보고서는 원문 대신 요약본을 입력으로 씁니다.
+DIGEST_SECTIONS = ("daily", "weekly")   # 상위 주기의 입력으로 쓰이는 보고서만 요약
+
+def get_digest_path(report_path):
+    return re.sub(r"\.txt$", "", report_path) + ".digest.json"
+
+def render_digest(digest):
+    """JSON 요약본을 프롬프트용 짧은 텍스트로 변환합니다."""
+    def as_list(v):
+        return [str(x) for x in v if x] if isinstance(v, list) else ([str(v)] if v else [])
+    lines = []
+    if as_list(digest.get("themes")): lines.append("핵심 테마: " + " / ".join(as_list(digest["themes"])))
+    if digest.get("market_view"): lines.append(f"시장 판단: {digest['market_view']}")
+    if as_list(digest.get("key_figures")): lines.append("주요 수치: " + ", ".join(as_list(digest["key_figures"])))
+    if isinstance(digest.get("scores"), dict) and digest["scores"]:
+        lines.append("점수: " + ", ".join(f"{k} {v}" for k, v in digest["scores"].items()))
+    if as_list(digest.get("strategy")): lines.append("전략: " + " / ".join(as_list(digest["strategy"])))
+    if as_list(digest.get("risks")): lines.append("리스크: " + " / ".join(as_list(digest["risks"])))
+    return "\n".join(lines)
+
+def generate_report_digest(report_path, config_data=None):
+    """보고서 1건의 요약본을 생성해 사이드카 파일로 저장합니다. 성공 시 요약 텍스트 반환"""
+    name = os.path.basename(report_path)
+    try:
+        with open(report_path, "r", encoding="utf-8") as f:
+            content = f.read()
+    except Exception as e:
+        print(f"⚠️ [요약본] {name} 읽기 실패: {e}")
+        return None
+
+    resp = get_ai_summary(title=name, content=content, system_instruction=REPORT_DIGEST_PROMPT,
+                          role="analyst", custom_config=config_data)
+    if not resp or "❌ [ERROR]" in resp:
+        print(f"⚠️ [요약본] {name} 생성 실패 (원문으로 대체 사용)")
+        return None
+
+    digest = None
+    try:
+        m = re.search(r"\{.*\}", resp, re.S)
+        digest = json.loads(m.group(0)) if m else None
+    except: pass
+    # JSON 형식을 지키지 않은 응답도 충분히 짧으면 요약 텍스트로 활용
+    text = render_digest(digest) if isinstance(digest, dict) else resp.strip()
+    src_tokens, dig_tokens = estimate_tokens(content), estimate_tokens(text)
+    if not text or dig_tokens > src_tokens // 2:
+        print(f"⚠️ [요약본] {name} 요약 결과가 비었거나 너무 깁니다. (원문으로 대체 사용)")
+        return None
+
+    sidecar = {
+        "source": name, "created_at": get_now_kst().strftime('%Y-%m-%d %H:%M:%S'),
+        "digest": digest if isinstance(digest, dict) else None, "text": text,
+        "source_tokens": src_tokens, "digest_tokens": dig_tokens
+    }
+    path = get_digest_path(report_path)
+    tmp_path = make_tmp_path(path)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    print(f"📝 [요약본] {name}: {src_tokens:,} -> {dig_tokens:,} 토큰")
+    return text
+
+def start_report_digest(report_path, config_data=None):
+    """요약본 생성을 데몬 스레드로 시작합니다."""
+    threading.Thread(target=generate_report_digest, args=(report_path, config_data),
+                     name="report-digest", daemon=True).start()
+
+def load_report_digest(report_path):
+    """사이드카 요약 텍스트를 반환합니다. 없거나 원문보다 오래됐으면 None"""
+    path = get_digest_path(report_path)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(report_path): return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("text") or None
+    except:
+        return None
+
+# --- [보고서 매니페스트 (REPORT_DIR/manifest.json)] ---
+# 보고서 파일마다 유형/생성 시각/크기/토큰 추정치/해시/초록을 기록해 두고, 목록·최근 N건·보관 기한 정리를 파일을 열지 않고 처리합니다.
+# 폴더 수정시각(파일 추가/삭제 시 바뀜)을 함께 저장해, 손으로 지운 파일이나 외부에서 넣은 파일은 해당 폴더만 다시 훑어 맞춥니다.
+REPORT_MANIFEST_PATH = os.path.join(REPORT_DIR, "manifest.json")
+REPORT_MANIFEST_VERSION = 1
+REPORT_SUBDIRS = {'daily': '01_daily', 'weekly': '02_weekly', 'monthly': '03_monthly', 'yearly': '04_yearly'}
+REPORT_RETENTION_DAYS = {'01_daily': 9, '02_weekly': 35, '03_monthly': 370}
+REPORT_ABSTRACT_CHARS = 200
+_manifest_lock = threading.Lock()
+_manifest_cache = {"sig": None, "data": None}
+
+def get_report_subdir(section_name):
+    return REPORT_SUBDIRS.get(str(section_name).lower(), "05_etc")
+
+def _report_dir_mtimes():
+    mtimes = {}
+    for subdir in list(REPORT_SUBDIRS.values()) + ["05_etc"]:
+        try:
+            mtimes[subdir] = os.stat(os.path.join(REPORT_DIR, subdir)).st_mtime_ns
+        except OSError:
+            pass
+    return mtimes
+
+def make_report_abstract(content, limit=REPORT_ABSTRACT_CHARS):
+    """제목/구분선/표를 건너뛰고 본문 첫 문장들로 짧은 초록을 만듭니다."""
+    parts = []
+    for line in (content or "").splitlines():
+        line = re.sub(r"[*_`>#]+", "", line).strip(" -•|\t")
+        if len(line) < 15 or set(line) <= set("=-─━ "): continue
+        parts.append(line)
+        if sum(len(p) for p in parts) >= limit: break
+    text = " ".join(parts)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def index_report_file(rel_path, content=None):
+    """보고서 파일 1건의 매니페스트 항목을 만듭니다. content가 없으면 파일을 읽습니다."""
+    full_path = os.path.join(REPORT_DIR, rel_path)
+    if content is None:
+        with open(full_path, "r", encoding="utf-8") as f:
+            content = f.read()
+    subdir, name = rel_path.split("/", 1)
+    r_type = next((k for k, v in REPORT_SUBDIRS.items() if v == subdir), None)
+    if r_type is None:
+        m = re.match(r"\d{4}-\d{2}-\d{2}_\d{4}_(.+)\.txt$", name)
+        r_type = m.group(1) if m else "etc"
+    st_info = os.stat(full_path)
+    try:
+        created_at = datetime.strptime(name[:15], "%Y-%m-%d_%H%M").strftime("%Y-%m-%d %H:%M")
+    except ValueError:
+        created_at = datetime.fromtimestamp(st_info.st_mtime, KST).strftime("%Y-%m-%d %H:%M")
+    return {
+        "type": r_type, "created_at": created_at, "mtime": st_info.st_mtime,
+        "size": st_info.st_size, "tokens": estimate_tokens(content),
+        "sha256": hashlib.sha256(content.encode("utf-8")).hexdigest()[:16],
+        "abstract": make_report_abstract(content),
+    }
+
+def _reconcile_report_dir(manifest, subdir, known=None):
+    """폴더 하나를 훑어 사라진 파일은 빼고 새 파일은 색인합니다. known: {상대경로: 이미 만든 항목}"""
+    reports = manifest["reports"]
+    prefix = f"{subdir}/"
+    try:
+        names = {f for f in os.listdir(os.path.join(REPORT_DIR, subdir)) if f.endswith(".txt") and f != "latest.txt"}
+    except OSError:
+        names = set()
+    removed = [p for p in reports if p.startswith(prefix) and p[len(prefix):] not in names]
+    for p in removed:
+        del reports[p]
+    remove_search_docs("report", removed)
+    added = 0
+    for name in names:
+        rel_path = prefix + name
+        if known and rel_path in known:
+            reports[rel_path] = known[rel_path]
+        elif rel_path not in reports:
+            try:
+                with open(os.path.join(REPORT_DIR, rel_path), "r", encoding="utf-8") as f:
+                    content = f.read()
+                reports[rel_path] = index_report_file(rel_path, content)
+                index_report_search(rel_path, content, reports[rel_path])
+                added += 1
+            except Exception as e:
+                print(f"⚠️ [매니페스트] {rel_path} 색인 실패: {e}")
+    return len(removed), added
+
+def _save_report_manifest(manifest):
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    tmp_path = make_tmp_path(REPORT_MANIFEST_PATH)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, REPORT_MANIFEST_PATH)
+
+def load_report_manifest(known=None):
+    """
+    최신 상태의 매니페스트를 반환합니다. {"reports": {상대경로: 항목}, "dirs": {폴더: 수정시각}}
+    폴더 수정시각이 기록과 다른 폴더만 다시 훑으며, 바뀐 것이 없으면 메모리 캐시를 그대로 씁니다.
+    known: 호출 측이 이미 만든 항목 {상대경로: 항목} (해당 파일은 다시 읽지 않음)
+    """
+    dir_mtimes = _report_dir_mtimes()
+    try:
+        manifest_mtime = os.path.getmtime(REPORT_MANIFEST_PATH)
+    except OSError:
+        manifest_mtime = 0
+    sig = (manifest_mtime, tuple(sorted(dir_mtimes.items())))
+    if _manifest_cache["sig"] == sig:
+        return _manifest_cache["data"]
+
+    with _manifest_lock:
+        manifest = None
+        try:
+            with open(REPORT_MANIFEST_PATH, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except: pass
+        if not manifest or manifest.get("version") != REPORT_MANIFEST_VERSION:
+            manifest = {"version": REPORT_MANIFEST_VERSION, "dirs": {}, "reports": {}}
+
+        stale = [d for d in set(dir_mtimes) | set(manifest["dirs"]) if manifest["dirs"].get(d) != dir_mtimes.get(d)]
+        if stale:
+            removed = added = 0
+            for subdir in stale:
+                r, a = _reconcile_report_dir(manifest, subdir, known)
+                removed, added = removed + r, added + a
+            manifest["dirs"] = dir_mtimes
+            try:
+                _save_report_manifest(manifest)
+                manifest_mtime = os.path.getmtime(REPORT_MANIFEST_PATH)
+            except Exception as e:
+                print(f"⚠️ [매니페스트] 저장 실패: {e}")
+            if removed or added:
+                print(f"🗂️ [매니페스트] 재조정: {added}건 색인, {removed}건 제거 ({', '.join(sorted(stale))})")
+        _manifest_cache.update(sig=(manifest_mtime, tuple(sorted(dir_mtimes.items()))), data=manifest)
+    return manifest
+
+def register_report(filepath, content):
+    """save_report_to_file 직후 호출: 방금 쓴 보고서를 (다시 읽지 않고) 색인합니다."""
+    rel_path = os.path.relpath(filepath, REPORT_DIR).replace(os.sep, "/")
+    entry = index_report_file(rel_path, content)
+    index_report_search(rel_path, content, entry)
+    manifest = load_report_manifest(known={rel_path: entry})
+    if manifest["reports"].get(rel_path) != entry:  # 같은 파일명을 덮어쓴 경우 (폴더 수정시각 변화 없음)
+        with _manifest_lock:
+            manifest["reports"][rel_path] = entry
+            _save_report_manifest(manifest)
+            _manifest_cache["sig"] = None
+
+def list_reports(r_type=None, limit=None):
+    """매니페스트 기준 보고서 목록 (최신순). 각 항목에 상대경로 "path" 포함"""
+    reports = load_report_manifest()["reports"]
+    items = [dict(meta, path=p) for p, meta in reports.items() if r_type is None or meta["type"] == r_type]
+    items.sort(key=lambda x: os.path.basename(x["path"]), reverse=True)
+    return items[:limit] if limit else items
+
+def get_report_path(entry):
+    return os.path.join(REPORT_DIR, entry["path"])
+
+def purge_reports(subdir=None):
+    """보관 기한(REPORT_RETENTION_DAYS)이 지난 보고서와 요약본을 매니페스트 조회만으로 골라 삭제합니다."""
+    now_ts = time.time()
+    manifest = load_report_manifest()
+    expired = [p for p, meta in manifest["reports"].items()
+               if p.split("/", 1)[0] in REPORT_RETENTION_DAYS and (subdir is None or p.startswith(f"{subdir}/"))
+               and meta["mtime"] < now_ts - REPORT_RETENTION_DAYS[p.split("/", 1)[0]] * 86400]
+    for rel_path in expired:
+        full_path = os.path.join(REPORT_DIR, rel_path)
+        for path in (full_path, get_digest_path(full_path)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ [매니페스트] {path} 삭제 실패: {e}")
+    if expired:
+        load_report_manifest()  # 폴더 수정시각이 바뀌었으므로 재조정 (삭제분 제거)
+        print(f"🧹 [보고서] 보관 기한이 지난 보고서 {len(expired)}건 정리")
+    return len(expired)
+
 def load_historical_contexts():
     """파일이 없어도 에러 없이 작동하며, AI에게 현재 상황을 설명합니다."""
-    base_dir = REPORT_DIR
-    dir_map = {
-        'YEARLY_STRATEGY': '04_yearly/latest.txt',
-        'MONTHLY_THEME': '03_monthly/latest.txt',
-        'WEEKLY_MOMENTUM': '02_weekly/latest.txt',
-        'DAILY_LOG': '01_daily/latest.txt'
+    label_map = {
+        'YEARLY_STRATEGY': 'yearly',
+        'MONTHLY_THEME': 'monthly',
+        'WEEKLY_MOMENTUM': 'weekly',
+        'DAILY_LOG': 'daily'
     }
     
     context_text = "### [ 역사적 맥락 참조 데이터 ]\n"
     
-    for label, rel_path in dir_map.items():
-        full_path = os.path.join(base_dir, rel_path)
-        
-        # 🛡️ 파일이 실제로 존재하는지 체크
-        if os.path.exists(full_path):
-            with open(full_path, "r", encoding="utf-8") as f:
+    for label, r_type in label_map.items():
+        # 🗂️ 매니페스트에서 해당 주기의 가장 최근 보고서를 찾음 (폴더 스캔 없음)
+        # 매니페스트에 없으면 latest.txt 사용 (연간 전략처럼 사용자가 직접 넣어두는 파일은 날짜별 파일이 없음)
+        latest = list_reports(r_type, 1)
+        path = get_report_path(latest[0]) if latest else os.path.join(REPORT_DIR, get_report_subdir(r_type), "latest.txt")
+        content = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
                 content = f.read()
-                # 데이터가 너무 짧으면 기록이 없는 것으로 간주
-                if len(content.strip()) > 10:
-                    context_text += f"\n<{label}>\n{content[:1000]}\n"
-                else:
-                    context_text += f"\n<{label}>: 해당 주기의 분석 데이터가 아직 비어 있습니다.\n"
+        except: pass
+        
+        if content is not None:
+            # 데이터가 너무 짧으면 기록이 없는 것으로 간주
+            if len(content.strip()) > 10:
+                context_text += f"\n<{label}>\n{content[:1000]}\n"
+            else:
+                context_text += f"\n<{label}>: 해당 주기의 분석 데이터가 아직 비어 있습니다.\n"
         else:
             # 💡 파일이 없을 때 AI에게 줄 메시지
             # AI가 "과거 데이터가 없으니 오늘 수치에 더 집중해서 분석해라"라고 판단하게 유도합니다.
@@ -173,6 +1228,148 @@ def load_historical_contexts():
             
     return context_text
     
+# --- [로컬 시계열 저장소 (.npz)] ---
+# 일별 시계열을 심볼별 .npz(날짜 + 수치 행렬)로 보관하고, 부족한 구간만 추가로 내려받습니다.
+TS_STORE_DIR = os.path.join(BASE_PATH, "cache", "timeseries")
+
+def load_ts_store(name):
+    """저장된 일별 시계열을 DataFrame(index=날짜)으로 반환합니다. 없으면 None"""
+    path = os.path.join(TS_STORE_DIR, f"{name}.npz")
+    if not os.path.exists(path): return None
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            return pd.DataFrame(z["values"], index=pd.DatetimeIndex(z["dates"]), columns=[str(c) for c in z["columns"]])
+    except Exception as e:
+        print(f"⚠️ 시계열 저장소 로드 실패 ({name}): {e}")
+        return None
+
+def save_ts_store(name, df):
+    """일별 시계열을 임시 파일에 쓴 뒤 교체합니다."""
+    os.makedirs(TS_STORE_DIR, exist_ok=True)
+    path = os.path.join(TS_STORE_DIR, f"{name}.npz")
+    tmp_path = make_tmp_path(path)
+    with open(tmp_path, "wb") as f:
+        np.savez(f, dates=df.index.values.astype("datetime64[D]"),
+                 columns=np.array([str(c) for c in df.columns]), values=df.to_numpy(dtype=float))
+    os.replace(tmp_path, path)
+
+def merge_ts_store(name, new_df):
+    """새로 받은 구간으로 겹치는 날짜를 덮어쓰고(장중 갱신 반영) 저장합니다."""
+    new_df = new_df.apply(pd.to_numeric, errors="coerce").astype(float)
+    new_df.index = pd.DatetimeIndex(new_df.index).normalize()
+    hist = load_ts_store(name)
+    if hist is not None and not new_df.empty:
+        merged = pd.concat([hist[~hist.index.isin(new_df.index)], new_df]).sort_index()
+    else:
+        merged = new_df if hist is None else hist
+    if not merged.empty:
+        save_ts_store(name, merged)
+    return merged
+
+# --- [기간별 변동 계산 (벡터화)] ---
+# 보고서 유형별 (확보 기간(달력일), 비교 시점(뒤에서 n번째 유효값), 표시명)
+MARKET_HORIZONS = {
+    "daily": (7, -2, "일간(1D)"),       # 1주일 확보, 전일 대비
+    "weekly": (14, -6, "주간(1W)"),     # 2주일 확보, 1주 전 대비 (약 5거래일)
+    "monthly": (60, -21, "월간(1M)"),   # 2달 확보, 1달 전 대비 (약 20거래일)
+}
+_horizon_cache = {}
+
+def _right_align_valid(values):
+    """각 열의 유효값(NaN 제외)을 순서를 유지한 채 아래쪽으로 몰아 정렬합니다. (안정 정렬)"""
+    order = np.argsort(~np.isnan(values), axis=0, kind="stable")
+    return np.take_along_axis(values, order, axis=0)
+
+def compute_horizon_stats(panel, anchor, pad_days=0):
+    """
+    (날짜 x 티커) 패널 하나로 모든 보고서 기간의 현재값/비교값/등락률/범위/시계열을 한 번에 계산합니다.
+    anchor 기준 (기간 + pad_days)일 구간을 사용하며, 반환값은 {r_type: {티커: 통계 dict}} 입니다.
+    """
+    stats = {}
+    for r_type, (days, comp_idx, _) in MARKET_HORIZONS.items():
+        window = panel[panel.index >= pd.Timestamp(anchor) - pd.Timedelta(days=days + pad_days)]
+        values = window.to_numpy(dtype=float)
+        stats[r_type] = {}
+        if values.shape[0] == 0: continue
+
+        aligned = _right_align_valid(values)
+        rows, n_cols = aligned.shape
+        counts = (~np.isnan(values)).sum(axis=0)
+        cols = np.arange(n_cols)
+        curr = aligned[-1]
+        # 🎯 유효값이 비교 시점보다 적으면 구간의 첫 유효값과 비교 (기존 동작 유지)
+        prev_pos = np.where(counts >= abs(comp_idx), rows + comp_idx, rows - counts)
+        prev = aligned[np.clip(prev_pos, 0, rows - 1), cols]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = (curr - prev) / prev * 100
+            low = np.nanmin(np.where(counts > 0, values, 0.0), axis=0)
+            high = np.nanmax(np.where(counts > 0, values, 0.0), axis=0)
+        tail = aligned[-days:]
+
+        for i, sym in enumerate(window.columns):
+            if counts[i] < 2: continue
+            ts = tail[:, i]
+            stats[r_type][sym] = {
+                "curr": float(curr[i]), "prev": float(prev[i]), "diff": float(curr[i] - prev[i]),
+                "pct": float(pct[i]), "low": float(low[i]), "high": float(high[i]),
+                "ts": ts[~np.isnan(ts)].tolist(),
+            }
+    return stats
+
+def get_horizon_stats(key, store_names, build_panel, anchor, pad_days=0):
+    """
+    compute_horizon_stats 결과를 저장소 파일 수정시각 기준으로 메모이즈합니다.
+    저장소가 갱신되지 않았다면 일간/주간/월간 보고서가 같은 계산 결과를 재사용합니다.
+    """
+    sig = []
+    for name in store_names:
+        path = os.path.join(TS_STORE_DIR, f"{name}.npz")
+        sig.append(os.path.getmtime(path) if os.path.exists(path) else 0)
+    cache_key = (tuple(store_names), tuple(sig), str(anchor), pad_days)
+    cached = _horizon_cache.get(key)
+    if cached and cached[0] == cache_key:
+        return cached[1]
+    stats = compute_horizon_stats(build_panel(), anchor, pad_days)
+    _horizon_cache[key] = (cache_key, stats)
+    return stats
+
+# --- [KRX 지수 히스토리] ---
+KRX_INDEX_CODES = {"KOSPI": "1001", "KOSDAQ": "2001"}
+
+def get_krx_target_date(now=None):
+    """한국 장 시간(09:00) 전이면 어제 날짜를 기준일로 사용합니다."""
+    now = now or get_now_kst()
+    day = (now - timedelta(days=1)).date() if now.hour < 9 else now.date()
+    try:
+        # 📅 주말/휴장일이면 직전 거래일 (캘린더 조회만, 네트워크 호출 없음)
+        day = trading_day_offset("KRX", day, 0)
+    except Exception as e:
+        print(f"⚠️ [캘린더] KRX 기준일 계산 실패: {e}")
+    return day.strftime("%Y%m%d")
+
+def update_krx_index_history(name, backfill_days=120):
+    """저장된 마지막 거래일부터 기준일까지만 내려받아 지수 히스토리에 병합합니다."""
+    from pykrx import stock
+    now = get_now_kst()
+    hist = load_ts_store(f"krx_{name}")
+    if hist is not None and not hist.empty:
+        # 마지막 저장일도 다시 받아 장중 값을 종가로 갱신
+        start_dt = hist.index[-1].strftime("%Y%m%d")
+    else:
+        start_dt = (now - timedelta(days=backfill_days)).strftime("%Y%m%d")
+    df = stock.get_index_ohlcv(start_dt, get_krx_target_date(now), KRX_INDEX_CODES[name])
+    return merge_ts_store(f"krx_{name}", df)
+
+def get_krx_index_history(name, days=None):
+    """로컬 지수 히스토리에서 최근 days(달력일) 구간을 잘라 반환합니다. (저장분이 없을 때만 네트워크 조회)"""
+    hist = load_ts_store(f"krx_{name}")
+    if hist is None or hist.empty:
+        hist = update_krx_index_history(name)
+    if days:
+        start = pd.Timestamp(get_krx_target_date()) - pd.Timedelta(days=days)
+        hist = hist[hist.index >= start]
+    return hist
+
 def get_krx_summary_raw(ignore_cache=False):
     """KOSPI/KOSDAQ 지수 및 KOSPI 3대 주체(개인/외인/기관) 종합 분석"""
     results = {}
@@ -191,24 +1388,23 @@ def get_krx_summary_raw(ignore_cache=False):
     try:
         from pykrx import stock
         from pykrx import bond
-        now = get_now_kst()
-        
-        # 🎯 한국 장 시간(09:00) 전이면 어제 날짜를 기준일로 설정
-        if now.hour < 9:
-            target_date = (now - timedelta(days=1)).strftime("%Y%m%d")
-        else:
-            target_date = now.strftime("%Y%m%d")
-            
-        # 휴일 등을 고려하여 넉넉하게 14일 전부터 조회
-        start_dt = (now - timedelta(days=14)).strftime("%Y%m%d")
         
-        # 1. 지수 데이터 (KOSPI/KOSDAQ)
-        for code, name in [("1001", "KOSPI"), ("2001", "KOSDAQ")]:
-            df = stock.get_index_ohlcv(start_dt, target_date, code)
-            if not df.empty:
+        # 1. 지수 데이터 (KOSPI/KOSDAQ) - 로컬 히스토리에 부족한 거래일만 받아 병합 (두 지수 동시)
+        index_dfs, _ = run_parallel(
+            {name: (lambda n=name: update_krx_index_history(n)) for name in KRX_INDEX_CODES},
+            timeout=20, label="KRX 지수"
+        )
+        for name in KRX_INDEX_CODES:
+            df = index_dfs.get(name)
+            if df is not None and not df.empty:
                 last = df.iloc[-1]
                 price = float(last['종가'])
-                pct = float(last['등락률']) if '등락률' in df.columns else 0.0
+                if '등락률' in df.columns and pd.notna(last['등락률']):
+                    pct = float(last['등락률'])
+                elif len(df) >= 2:
+                    pct = (price / float(df.iloc[-2]['종가']) - 1) * 100
+                else:
+                    pct = 0.0
                 
                 # 등락폭 계산 (종가와 등락률 역산)
                 prev = price / (1 + (pct / 100))
@@ -224,15 +1420,26 @@ def get_krx_summary_raw(ignore_cache=False):
                     "delta_str": f"{diff:+.2f} ({pct:+.2f}%)"
                 }
 
-        # 2. KOSPI/KOSDAQ 주체별 거래대금 및 Top 10 종목
+        # 2. KOSPI/KOSDAQ 주체별 거래대금, Top 10 종목, 공매도, 채권 금리 - 독립 호출 동시 실행
         if "KOSPI" in results:
-            actual_date = df.index[-1].strftime("%Y%m%d") # 실제 데이터 날짜
+            actual_date = index_dfs["KOSPI"].index[-1].strftime("%Y%m%d") # 실제 데이터 날짜
             
+            tasks = {}
+            for mkt in ["KOSPI", "KOSDAQ"]:
+                tasks[f"{mkt}_Value"] = lambda m=mkt: stock.get_market_trading_value_by_date(actual_date, actual_date, m)
+                for kor, eng in [("개인", "Top_Individual"), ("외국인", "Top_Foreigner"), ("기관합계", "Top_Institution")]:
+                    tasks[f"{mkt}_{eng}"] = lambda m=mkt, k=kor: stock.get_market_net_purchases_of_equities(actual_date, actual_date, m, k)
+                tasks[f"{mkt}_Short"] = lambda m=mkt: stock.get_shorting_investor_volume_by_date(actual_date, actual_date, m)
+            tasks["Bond"] = lambda: bond.get_otc_treasury_yields(actual_date)
+            
+            raw, _ = run_parallel(tasks, max_workers=6, timeout=20, label="KRX 수급")
+            
+            # 🧩 부분 결과 조립: 실패한 호출은 건너뛰고 나머지는 그대로 사용
             for mkt in ["KOSPI", "KOSDAQ"]:
                 try:
                     # (A) 거래대금 합계
-                    df_inv = stock.get_market_trading_value_by_date(actual_date, actual_date, mkt)
-                    if not df_inv.empty:
+                    df_inv = raw.get(f"{mkt}_Value")
+                    if df_inv is not None and not df_inv.empty:
                         row = df_inv.iloc[-1]
                         for kor, eng in [('개인', 'Individual'), ('외국인합계', 'Foreigner'), ('기관합계', 'Institution')]:
                             val_bill = float(row[kor]) / 100_000_000
@@ -240,25 +1447,29 @@ def get_krx_summary_raw(ignore_cache=False):
                                 "value": val_bill,
                                 "val_str": f"{val_bill/10000:,.2f}조" if abs(val_bill) >= 10000 else f"{val_bill:,.0f}억"
                             }
+                except: pass
 
-                    # (B) 주체별 순매수 Top 10 종목
-                    for kor, eng in [("개인", "Top_Individual"), ("외국인", "Top_Foreigner"), ("기관합계", "Top_Institution")]:
-                        df_top = stock.get_market_net_purchases_of_equities(actual_date, actual_date, mkt, kor)
-                        if not df_top.empty:
+                # (B) 주체별 순매수 Top 10 종목
+                for eng in ["Top_Individual", "Top_Foreigner", "Top_Institution"]:
+                    try:
+                        df_top = raw.get(f"{mkt}_{eng}")
+                        if df_top is not None and not df_top.empty:
                             items = [f"{r['종목명']}({float(r['종목별순매수금액'])/100_000_000:,.0f}억)" for _, r in df_top.head(10).iterrows()]
                             results[f"{mkt}_{eng}"] = ", ".join(items)
+                    except: pass
 
-                    # (C) 공매도 거래량
-                    df_short = stock.get_shorting_investor_volume_by_date(actual_date, actual_date, mkt)
-                    if not df_short.empty:
+                # (C) 공매도 거래량
+                try:
+                    df_short = raw.get(f"{mkt}_Short")
+                    if df_short is not None and not df_short.empty:
                         s_row = df_short.iloc[-1]
                         results[f'{mkt}_Short'] = {"total": f"{s_row['합계']:,.0f}주", "for": f"{s_row['외국인']:,.0f}주"}
                 except: pass
 
             # (D) 채권 금리
             try:
-                df_bond = bond.get_otc_treasury_yields(actual_date)
-                if not df_bond.empty:
+                df_bond = raw.get("Bond")
+                if df_bond is not None and not df_bond.empty:
                     for label, key in [("KR_3Y", "국고채 3년"), ("KR_10Y", "국고채 10년")]:
                         if key in df_bond.index:
                             val = float(df_bond.loc[key, "수익률"])
@@ -269,9 +1480,10 @@ def get_krx_summary_raw(ignore_cache=False):
                             }
             except: pass
 
-        # 캐시 저장 후 반환
-        with open(cache_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False)
+        # 캐시 저장 후 반환 (전부 실패한 경우 기존 캐시 보존)
+        if results:
+            with open(cache_path, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False)
         return results
 
     except Exception as e:
@@ -280,46 +1492,30 @@ def get_krx_summary_raw(ignore_cache=False):
     
 def get_krx_market_data(r_type="daily"):
     """(통합) 지수, 수급, 금리 요약 보고서 (기간별 맞춤)"""
-    # 🎯 보고서 유형별 기간 설정
-    if r_type == 'daily':
-        fetch_days = 7      # 데이터 확보: 1주일
-        comp_idx = -2       # 변화 기준: 전일 대비 (Daily Change)
-        period_name = "일간(1D)"
-    elif r_type == 'weekly':
-        fetch_days = 14     # 데이터 확보: 2주일
-        comp_idx = -6       # 변화 기준: 1주 전 대비 (Weekly Change, approx 5 trading days)
-        period_name = "주간(1W)"
-    else: # monthly
-        fetch_days = 60     # 데이터 확보: 2달
-        comp_idx = -21      # 변화 기준: 1달 전 대비 (Monthly Change, approx 20 trading days)
-        period_name = "월간(1M)"
+    r_type = r_type if r_type in MARKET_HORIZONS else "monthly"
+    period_name = MARKET_HORIZONS[r_type][2]
 
     data = get_krx_summary_raw() # 최신 수급/금리용 (Snapshot)
-    summary = f"### [ KRX 시장 지표 ({period_name} 변동) ]\n"
+    try:
+        comp_date = get_horizon_compare_date("KRX", r_type, datetime.strptime(get_krx_target_date(), "%Y%m%d").date())
+        summary = f"### [ KRX 시장 지표 ({period_name} 변동, {comp_date.strftime('%m-%d')} 종가 대비) ]\n"
+    except:
+        summary = f"### [ KRX 시장 지표 ({period_name} 변동) ]\n"
 
     try:
-        from pykrx import stock
-        now = get_now_kst()
-        target_date = now.strftime("%Y%m%d")
-        if now.hour < 9: target_date = (now - timedelta(days=1)).strftime("%Y%m%d")
-        start_dt = (now - timedelta(days=fetch_days)).strftime("%Y%m%d")
-
-        for code, name in [("1001", "KOSPI"), ("2001", "KOSDAQ")]:
-            df = stock.get_index_ohlcv(start_dt, target_date, code)
-            if not df.empty and len(df) >= 2:
-                curr = float(df.iloc[-1]['종가'])
-                prev_idx = comp_idx if len(df) >= abs(comp_idx) else 0
-                prev = float(df.iloc[prev_idx]['종가'])
-                
-                diff = curr - prev
-                pct = (diff / prev) * 100
-                
-                # 시계열 수치 추출 (최대 fetch_days 개)
-                ts_values = [f"{float(val):,.2f}" for val in df['종가'].tolist()]
-                ts_str = " -> ".join(ts_values)
-                
-                summary += f"- {name}: {curr:,.2f} ({pct:+.2f}% / {period_name} 변동)\n"
-                summary += f"  └ 시계열(과거->현재): {ts_str}\n"
+        # 🎯 로컬 지수 히스토리(get_krx_summary_raw가 이미 최신화)로 전 기간 변동을 한 번에 계산
+        max_days = max(h[0] for h in MARKET_HORIZONS.values())
+        stats = get_horizon_stats(
+            "krx", [f"krx_{name}" for name in KRX_INDEX_CODES],
+            lambda: pd.concat({name: get_krx_index_history(name, max_days)['종가'] for name in KRX_INDEX_CODES}, axis=1),
+            anchor=get_krx_target_date()
+        )[r_type]
+        for name in KRX_INDEX_CODES:
+            st = stats.get(name)
+            if not st: continue
+            ts_str = " -> ".join(f"{v:,.2f}" for v in st["ts"])
+            summary += f"- {name}: {st['curr']:,.2f} ({st['pct']:+.2f}% / {period_name} 변동)\n"
+            summary += f"  └ 시계열(과거->현재): {ts_str}\n"
     except Exception as e:
         summary += f"⚠️ 지수 데이터 시계열 계산 중 오류: {e}\n"
 
@@ -365,6 +1561,10 @@ def load_data():
         "report_auto_gen": True, 
         "report_gen_time": "08:00", 
         "report_days": 3,
+        "feed_workers": 8,       # 동시 수집 피드 수
+        "feed_timeout": 15,      # 피드별 타임아웃 (초)
+        "news_scoring": False,   # 신규 기사 백그라운드 중요도 채점 (판독 모델 호출 비용이 있으므로 선택 사항)
+        "score_workers": 2,      # 채점 동시 호출 수
         
         # 🎯 뉴스 판독 모델 설정 (Filter)
         "filter_model": {
@@ -383,7 +1583,8 @@ def load_data():
             "url": "http://192.168.1.105:11434/v1",
             "key": "",
             "temperature": 0.3,  # 💡 보고서는 약간의 통찰력이 필요하므로 0.3~0.5 권장
-            "prompt": "당신은 전문 투자 전략가입니다. 뉴스를 분석하여 투자 전략을 제시하세요."
+            "prompt": "당신은 전문 투자 전략가입니다. 뉴스를 분석하여 투자 전략을 제시하세요.",
+            "context_tokens": 16384  # 💡 모델 컨텍스트 한도 (보고서 입력을 이 안으로 압축)
         }
     }
     
@@ -418,24 +1619,95 @@ def load_data():
 data = load_data()
 
 
+# --- [yfinance 가격 히스토리 캐시] ---
+# 보고서(get_global_market_data)와 대시보드(get_global_financials_raw)가 같은 티커별 종가 히스토리를 공유합니다.
+PRICE_BACKFILL_DAYS = 100    # 처음 보는 티커의 초기 적재 기간 (월간 보고서 60일 + 여유)
+PRICE_REFRESH_SEC = 600      # 같은 티커는 10분 안에 다시 내려받지 않음
+PRICE_STATE_PATH = os.path.join(TS_STORE_DIR, "yf_checked.json")
+_price_lock = threading.Lock()
+
+def _price_store_name(sym):
+    return "yf_" + re.sub(r"[^A-Za-z0-9]", "_", sym)
+
+def _yf_download_close(symbols, start, end):
+    """yf.download 결과에서 종가만 티커별 컬럼 DataFrame으로 꺼냅니다."""
+    df = yf.download(symbols, start=start, end=end, progress=False)['Close']
+    if isinstance(df, pd.Series):
+        df = df.to_frame(name=symbols[0])
+    return df
+
+def update_price_history(symbols, force=False):
+    """
+    티커별 저장소의 마지막 날짜 이후 봉만 배치 요청으로 받아 병합합니다.
+    (신규 티커 초기 적재 1회 + 기존 티커 증분 1회, 최대 2번의 yf.download)
+    """
+    if not yf or not symbols: return
+    with _price_lock:
+        try:
+            with open(PRICE_STATE_PATH, "r", encoding="utf-8") as f:
+                checked = json.load(f)
+        except:
+            checked = {}
+
+        now_ts = time.time()
+        end_dt = get_now_kst()
+        backfill, incremental = [], {}
+        for sym in dict.fromkeys(symbols):
+            if not force and now_ts - checked.get(sym, 0) < PRICE_REFRESH_SEC:
+                continue
+            hist = load_ts_store(_price_store_name(sym))
+            if hist is None or hist.empty:
+                backfill.append(sym)
+            else:
+                # 마지막 저장일부터 다시 받아 미확정 봉을 갱신
+                incremental[sym] = hist.index[-1]
+
+        batches = []
+        if backfill:
+            batches.append((backfill, (end_dt - timedelta(days=PRICE_BACKFILL_DAYS)).strftime('%Y-%m-%d')))
+        if incremental:
+            batches.append((list(incremental), min(incremental.values()).strftime('%Y-%m-%d')))
+
+        for syms, start in batches:
+            try:
+                df = _yf_download_close(syms, start, end_dt.strftime('%Y-%m-%d'))
+                for sym in syms:
+                    if sym in df.columns:
+                        merge_ts_store(_price_store_name(sym), df[[sym]].dropna().rename(columns={sym: "Close"}))
+                    checked[sym] = now_ts
+                print(f"📈 [가격 캐시] {len(syms)}개 티커 갱신 (시작일 {start})")
+            except Exception as e:
+                print(f"⚠️ [가격 캐시] 다운로드 실패: {e}")
+
+        try:
+            os.makedirs(TS_STORE_DIR, exist_ok=True)
+            with open(PRICE_STATE_PATH, "w", encoding="utf-8") as f:
+                json.dump(checked, f)
+        except: pass
+
+def get_price_panel(symbols, days=None):
+    """저장된 종가 히스토리로 (날짜 x 티커) 패널을 만듭니다. 네트워크 호출 없음"""
+    cols = {}
+    for sym in symbols:
+        hist = load_ts_store(_price_store_name(sym))
+        if hist is not None and "Close" in hist.columns:
+            cols[sym] = hist["Close"]
+    if not cols:
+        return pd.DataFrame(columns=list(symbols))
+    panel = pd.concat(cols, axis=1).sort_index()
+    # 기존 동작과 동일하게 당일(KST) 미확정 봉은 제외
+    today = pd.Timestamp(get_now_kst().date())
+    panel = panel[panel.index < today]
+    if days:
+        panel = panel[panel.index >= today - pd.Timedelta(days=days)]
+    return panel
+
 def get_global_market_data(r_type="daily"):
     """yfinance를 통해 글로벌 시장 데이터를 수집합니다."""
     if not yf: return "⚠️ yfinance 모듈이 설치되지 않았습니다."
 
-    end_dt = get_now_kst()
-    
-    # 🎯 보고서 유형별 기간 및 비교 시점 설정
-    if r_type == 'daily': 
-        days = 7
-        comp_idx = -2 # 전일 대비
-    elif r_type == 'weekly': 
-        days = 14
-        comp_idx = -6 # 1주 전 대비 (약 5거래일)
-    else: 
-        days = 60
-        comp_idx = -21 # 1달 전 대비 (약 20거래일)
-    
-    start_dt = end_dt - timedelta(days=days + 5) # 여유 있게 조회
+    r_type = r_type if r_type in MARKET_HORIZONS else "monthly"
+    days = MARKET_HORIZONS[r_type][0]
     
     tickers = {
         "🇺🇸 미국 3대 지수 & VIX": {
@@ -459,65 +1731,340 @@ def get_global_market_data(r_type="daily"):
     report = f"### [ 🌍 글로벌 시장 데이터 ({r_type.upper()} 기준 변동) ]\n"
     
     try:
-        df = yf.download(all_symbols, start=start_dt.strftime('%Y-%m-%d'), end=end_dt.strftime('%Y-%m-%d'), progress=False)['Close']
+        # 🎯 공유 가격 캐시에서 증분 갱신 후, 전 기간 변동을 한 번에 계산 (여유 5일)
+        update_price_history(all_symbols)
+        max_days = max(h[0] for h in MARKET_HORIZONS.values())
+        stats = get_horizon_stats(
+            "global", [_price_store_name(s) for s in all_symbols],
+            lambda: get_price_panel(all_symbols, max_days + 5),
+            anchor=get_now_kst().date(), pad_days=5
+        )[r_type]
         for cat_name, items in tickers.items():
             report += f"#### {cat_name}\n"
             for sym, name in items.items():
-                try:
-                    if sym in df.columns:
-                        series = df[sym].dropna()
-                        if len(series) < 2: continue
-                        
-                        curr = float(series.iloc[-1])
-                        target_idx = comp_idx if len(series) >= abs(comp_idx) else 0
-                        prev = float(series.iloc[target_idx])
-                        
-                        chg_pct = ((curr - prev) / prev) * 100
-                        
-                        # 시계열 수치 추출 (최대 days 개)
-                        ts_values = [f"{float(val):,.2f}" for val in series.tolist()[-days:]]
-                        ts_str = " -> ".join(ts_values)
-                        
-                        report += f"- **{name}**: {curr:,.2f} ({chg_pct:+.2f}%, {days}일 범위: {series.min():,.2f}~{series.max():,.2f})\n"
-                        report += f"  └ 시계열(과거->현재): {ts_str}\n"
-                except: continue
+                st = stats.get(sym)
+                if not st: continue
+                ts_str = " -> ".join(f"{v:,.2f}" for v in st["ts"])
+                report += f"- **{name}**: {st['curr']:,.2f} ({st['pct']:+.2f}%, {days}일 범위: {st['low']:,.2f}~{st['high']:,.2f})\n"
+                report += f"  └ 시계열(과거->현재): {ts_str}\n"
             report += "\n"
         return report
     except Exception as e:
         return f"⚠️ 글로벌 데이터 수집 실패: {e}"
 
-def is_kr_market_open():
-    now = get_now_kst()
-    if now.weekday() >= 5: return False # 토/일 제외
-    
-    # 09:00 ~ 15:30 (15시 30분)
-    current_minutes = now.hour * 60 + now.minute
-    if not (540 <= current_minutes <= 930): return False
-    
+# --- [거래 캘린더 (KRX / NYSE)] ---
+# 연도별 세션(개장/마감 시각)을 규칙으로 한 번 계산해 디스크에 저장하고, 개장 여부는 메모리 조회로만 판별합니다.
+CALENDAR_PATH = os.path.join(BASE_PATH, "cache", "trading_calendar.json")
+CALENDAR_VERSION = 1
+MARKET_CLOSE_GRACE_MIN = 30      # 장 마감 직후 확정 종가까지 수집하기 위한 여유(분)
+KRX_SESSION = ("09:00", "15:30")
+KRX_FIRST_DAY_OPEN = "10:00"     # 연초 개장일은 1시간 늦게 시작
+NYSE_SESSION = ("09:30", "16:00")  # 미 동부 현지 시각 (썸머타임은 날짜별로 반영)
+NYSE_HALF_DAY_CLOSE = "13:00"
+
+# 음력 공휴일의 양력 날짜 (규칙으로 계산할 수 없어 표로 관리). 설날/추석은 당일 기준 전후 1일 포함
+KRX_LUNAR_HOLIDAYS = {
+    2024: {"설날": "2024-02-10", "부처님오신날": "2024-05-15", "추석": "2024-09-17"},
+    2025: {"설날": "2025-01-29", "부처님오신날": "2025-05-05", "추석": "2025-10-06"},
+    2026: {"설날": "2026-02-17", "부처님오신날": "2026-05-24", "추석": "2026-09-25"},
+    2027: {"설날": "2027-02-07", "부처님오신날": "2027-05-13", "추석": "2027-09-15"},
+    2028: {"설날": "2028-01-27", "부처님오신날": "2028-05-02", "추석": "2028-10-03"},
+    2029: {"설날": "2029-02-13", "부처님오신날": "2029-05-20", "추석": "2029-09-22"},
+    2030: {"설날": "2030-02-03", "부처님오신날": "2030-05-09", "추석": "2030-09-12"},
+}
+# 선거일 / 임시공휴일 등 비정기 휴장일 (지난 날짜는 verify_krx_calendar가 pykrx 개장일 목록으로도 보정)
+KRX_SPECIAL_CLOSURES = {
+    "2024-04-10": "국회의원 선거일",
+    "2024-10-01": "임시공휴일(국군의 날)",
+    "2025-01-27": "임시공휴일",
+    "2025-06-03": "대통령 선거일",
+    "2026-06-03": "전국동시지방선거일",
+    "2028-04-12": "국회의원 선거일",
+}
+_calendar_lock = threading.Lock()
+_calendar_cache = {}
+
+def _nth_weekday(year, month, weekday, n):
+    """해당 월의 n번째 요일 (n=-1 이면 마지막). weekday: 월=0 ... 일=6"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = (date(year, month, 28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _easter(year):
+    """부활절 (그레고리력, Anonymous 알고리즘)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+def _us_eastern_offset(day):
+    """미 동부 UTC 오프셋 (3월 둘째 일요일 ~ 11월 첫째 일요일은 썸머타임 -4시간)"""
+    dst = _nth_weekday(day.year, 3, 6, 2) <= day < _nth_weekday(day.year, 11, 6, 1)
+    return timedelta(hours=-4 if dst else -5)
+
+def _krx_holidays(year):
+    """KRX 휴장일 {date: 이름} (법정 공휴일 + 대체공휴일 + 근로자의 날 + 연말 휴장일)"""
+    hol = {
+        date(year, 1, 1): "신정", date(year, 3, 1): "삼일절", date(year, 5, 5): "어린이날",
+        date(year, 6, 6): "현충일", date(year, 8, 15): "광복절", date(year, 10, 3): "개천절",
+        date(year, 10, 9): "한글날", date(year, 12, 25): "크리스마스",
+    }
+    lunar = KRX_LUNAR_HOLIDAYS.get(year, {})
+    if not lunar:
+        print(f"⚠️ [캘린더] {year}년 음력 공휴일 표가 없어 설날/추석/부처님오신날이 빠집니다 (지난 날짜는 pykrx로 보정)")
+    # (연휴 날짜 목록, 이름, 대체공휴일 발생 조건)
+    groups = []
+    for name, day_str in lunar.items():
+        day = date.fromisoformat(day_str)
+        days = [day - timedelta(days=1), day, day + timedelta(days=1)] if name in ("설날", "추석") else [day]
+        for d in days:
+            hol.setdefault(d, name)
+        groups.append((days, name, "overlap_sun" if len(days) > 1 else ("weekend" if year >= 2023 else None)))
+    groups.append(([date(year, 5, 5)], "어린이날", "overlap_weekend"))
+    for m, d in [(3, 1), (8, 15), (10, 3), (10, 9)]:
+        groups.append(([date(year, m, d)], hol[date(year, m, d)], "weekend" if year >= 2021 else None))
+    groups.append(([date(year, 12, 25)], "크리스마스", "weekend" if year >= 2023 else None))
+
+    # 🎯 대체공휴일: 설날/추석은 일요일·다른 공휴일과 겹칠 때, 어린이날은 주말·다른 공휴일과 겹칠 때,
+    #    국경일/부처님오신날/크리스마스는 주말과 겹칠 때 그 다음 첫 평일 비공휴일
+    public = {}
+    for days, name, _ in groups:
+        for d in days:
+            public.setdefault(d, []).append(name)
+    for days, name, rule in sorted(groups, key=lambda g: g[0][0]):
+        if not rule: continue
+        overlap = any(len(public[d]) > 1 for d in days)
+        if rule == "overlap_sun":
+            triggered = overlap or any(d.weekday() == 6 for d in days)
+        elif rule == "overlap_weekend":
+            triggered = overlap or days[0].weekday() >= 5
+        else:
+            triggered = days[0].weekday() >= 5
+        if not triggered: continue
+        sub = days[-1] + timedelta(days=1)
+        while sub.weekday() >= 5 or sub in hol:
+            sub += timedelta(days=1)
+        hol[sub] = f"대체공휴일({name})"
+
+    hol.setdefault(date(year, 5, 1), "근로자의 날")
+    for day_str, name in KRX_SPECIAL_CLOSURES.items():
+        if day_str.startswith(str(year)):
+            hol.setdefault(date.fromisoformat(day_str), name)
+    # 연말 휴장일: 12/31 (주말/공휴일이면 직전 영업일)
+    last = date(year, 12, 31)
+    while last.weekday() >= 5 or last in hol:
+        last -= timedelta(days=1)
+    hol[last] = "연말 휴장일"
+    return hol
+
+def _nyse_holidays(year):
+    """NYSE 휴장일 {date: 이름} 과 조기 폐장일(13:00) 집합"""
+    def observed(d):
+        return d - timedelta(days=1) if d.weekday() == 5 else (d + timedelta(days=1) if d.weekday() == 6 else d)
+
+    hol = {}
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:  # 토요일이면 전년도 금요일로 대체하지 않음 (NYSE 규정)
+        hol[observed(new_year)] = "New Year's Day"
+    hol[_nth_weekday(year, 1, 0, 3)] = "Martin Luther King Jr. Day"
+    hol[_nth_weekday(year, 2, 0, 3)] = "Washington's Birthday"
+    hol[_easter(year) - timedelta(days=2)] = "Good Friday"
+    hol[_nth_weekday(year, 5, 0, -1)] = "Memorial Day"
+    if year >= 2022:
+        hol[observed(date(year, 6, 19))] = "Juneteenth"
+    hol[observed(date(year, 7, 4))] = "Independence Day"
+    hol[_nth_weekday(year, 9, 0, 1)] = "Labor Day"
+    thanksgiving = _nth_weekday(year, 11, 3, 4)
+    hol[thanksgiving] = "Thanksgiving Day"
+    hol[observed(date(year, 12, 25))] = "Christmas Day"
+
+    half_days = {d for d in (date(year, 7, 3), thanksgiving + timedelta(days=1), date(year, 12, 24))
+                 if d.weekday() < 5 and d not in hol}
+    return hol, half_days
+
+def _session_ts(day, hhmm, tz):
+    h, m = map(int, hhmm.split(":"))
+    return int(datetime(day.year, day.month, day.day, h, m, tzinfo=tz).timestamp())
+
+def _market_session(market, day, first_day=False, half_day=False):
+    """[개장 ts, 마감 ts]"""
+    if market == "KRX":
+        return [_session_ts(day, KRX_FIRST_DAY_OPEN if first_day else KRX_SESSION[0], KST),
+                _session_ts(day, KRX_SESSION[1], KST)]
+    tz = timezone(_us_eastern_offset(day))
+    return [_session_ts(day, NYSE_SESSION[0], tz),
+            _session_ts(day, NYSE_HALF_DAY_CLOSE if half_day else NYSE_SESSION[1], tz)]
+
+def build_trading_calendar(market, year):
+    """규칙으로 1년치 세션을 계산합니다 (네트워크 호출 없음). {"sessions": {날짜: [개장 ts, 마감 ts]}, "holidays": .., "half_days": ..}"""
+    if market == "KRX":
+        holidays, half_days = _krx_holidays(year), set()
+    else:
+        holidays, half_days = _nyse_holidays(year)
+    sessions = {}
+    day = date(year, 1, 1)
+    while day.year == year:
+        if day.weekday() < 5 and day not in holidays:
+            sessions[day.isoformat()] = _market_session(market, day, first_day=not sessions, half_day=day in half_days)
+        day += timedelta(days=1)
+    return {
+        "sessions": sessions,
+        "holidays": {d.isoformat(): name for d, name in sorted(holidays.items()) if d.year == year and d.weekday() < 5},
+        "half_days": sorted(d.isoformat() for d in half_days),
+        "built_at": get_now_kst().isoformat(timespec="seconds"),
+    }
+
+def _load_calendar_file():
     try:
-        from pykrx import stock
-        today_str = now.strftime("%Y%m%d")
-        b_days = stock.get_business_days_dates(today_str, today_str)
-        if len(b_days) == 0: return False
+        with open(CALENDAR_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == CALENDAR_VERSION:
+            return data
     except: pass
-    return True
+    return {"version": CALENDAR_VERSION}
+
+def _save_calendar_file(data):
+    try:
+        os.makedirs(os.path.dirname(CALENDAR_PATH), exist_ok=True)
+        tmp_path = make_tmp_path(CALENDAR_PATH)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, CALENDAR_PATH)
+    except Exception as e:
+        print(f"⚠️ [캘린더] 저장 실패: {e}")
+
+def get_trading_calendar(market, years):
+    """
+    market("KRX"/"NYSE")의 연도별 캘린더를 메모리에 적재해 반환합니다.
+    디스크에 없는 연도만 계산해 저장하며, 다른 프로세스가 파일을 갱신하면 다시 읽습니다.
+    반환: {"sessions": {날짜: (개장 ts, 마감 ts)}, "days": 정렬된 세션일 목록, ...}
+    """
+    try:
+        mtime = os.path.getmtime(CALENDAR_PATH)
+    except OSError:
+        mtime = 0
+    cached = _calendar_cache.get(market)
+    if cached and cached["mtime"] == mtime and cached["years"].issuperset(years):
+        return cached
+
+    with _calendar_lock:
+        data = _load_calendar_file()
+        market_data = data.setdefault(market, {})
+        want = set(years) | (cached["years"] if cached else set())
+        missing = [y for y in want if str(y) not in market_data]
+        for y in missing:
+            market_data[str(y)] = build_trading_calendar(market, y)
+        if missing:
+            _save_calendar_file(data)
+            print(f"📅 [캘린더] {market} {', '.join(map(str, sorted(missing)))}년 세션 생성")
+            try:
+                mtime = os.path.getmtime(CALENDAR_PATH)
+            except OSError:
+                pass
+
+        sessions = {}
+        for y in want:
+            sessions.update({d: tuple(v) for d, v in market_data[str(y)]["sessions"].items()})
+        days = sorted(sessions)
+        cached = {"years": want, "mtime": mtime, "sessions": sessions, "days": days,
+                  "pos": {d: i for i, d in enumerate(days)}}
+        _calendar_cache[market] = cached
+    return cached
+
+def _market_local_date(market, now):
+    if market == "KRX":
+        return now.astimezone(KST).date()
+    utc_now = now.astimezone(timezone.utc)
+    return (utc_now + _us_eastern_offset((utc_now - timedelta(hours=5)).date())).date()
+
+def get_market_session(market, day):
+    """해당 날짜(거래소 현지 기준)의 (개장 ts, 마감 ts). 휴장일이면 None"""
+    return get_trading_calendar(market, [day.year])["sessions"].get(day.isoformat())
+
+def is_market_open(market, now=None, grace_min=MARKET_CLOSE_GRACE_MIN):
+    """거래소 개장 여부 (마감 후 grace_min분까지 포함). 캘린더 조회만 하므로 네트워크 호출이 없습니다."""
+    now = now or get_now_kst()
+    session = get_market_session(market, _market_local_date(market, now))
+    ts = now.timestamp()
+    return bool(session) and session[0] <= ts <= session[1] + grace_min * 60
+
+def is_kr_market_open():
+    return is_market_open("KRX")
 
 def is_us_market_open():
-    now = get_now_kst()
-    current_minutes = now.hour * 60 + now.minute
-    # 넓은 썸머타임/표준시 구간 포괄: 22:30 ~ 06:00
-    is_open_time = (current_minutes >= 1350) or (current_minutes <= 360) 
-    if not is_open_time: return False
-    
-    if now.weekday() == 6: return False # 일요일 전체 휴장 (KST)
-    if now.weekday() == 0 and current_minutes <= 360: return False # 월요일 새벽 (미국 일요일)
-    if now.weekday() == 5 and current_minutes >= 1350: return False # 토요일 밤 (미국 토/일)
-    return True
+    return is_market_open("NYSE")
+
+def trading_day_offset(market, day, n):
+    """
+    day 기준 n번째 거래일을 반환합니다. n=0 은 day 당일(휴장이면 직전 거래일), 음수는 과거.
+    예) trading_day_offset("KRX", 오늘, -5) -> 5거래일 전
+    """
+    span = abs(n) // 240 + 1
+    cal = get_trading_calendar(market, range(day.year - span, day.year + span + 1))
+    key = day.isoformat()
+    pos = cal["pos"].get(key)
+    if pos is None:
+        pos = bisect.bisect_right(cal["days"], key) - 1
+    return date.fromisoformat(cal["days"][max(0, min(len(cal["days"]) - 1, pos + n))])
+
+def get_horizon_compare_date(market, r_type, anchor):
+    """MARKET_HORIZONS의 비교 시점(comp_idx, 뒤에서 n번째 유효값)에 해당하는 거래일"""
+    comp_idx = MARKET_HORIZONS.get(r_type, MARKET_HORIZONS["monthly"])[1]
+    return trading_day_offset(market, anchor, comp_idx + 1)
+
+def verify_krx_calendar(force=False):
+    """
+    올해 지난 날짜를 pykrx 개장일 목록과 대조해 규칙에 없는 휴장(선거일/임시공휴일 등)을 보정합니다.
+    네트워크 호출이 있으므로 수집기에서 하루 1회만 실행합니다. 보정한 날짜 수 반환
+    """
+    today = get_now_kst().date()
+    get_trading_calendar("KRX", [today.year])
+    data = _load_calendar_file()
+    year_cal = data.get("KRX", {}).get(str(today.year))
+    if not year_cal or (not force and year_cal.get("verified_at") == today.isoformat()):
+        return 0
+    try:
+        from pykrx import stock
+        b_days = stock.get_previous_business_days(fromdate=f"{today.year}0101", todate=today.strftime("%Y%m%d"))
+        actual = {pd.Timestamp(d).date() for d in b_days}
+    except Exception as e:
+        print(f"⚠️ [캘린더] KRX 개장일 확인 실패: {e}")
+        return 0
+    if not actual:
+        return 0
+
+    fixed = 0
+    with _calendar_lock:
+        data = _load_calendar_file()
+        year_cal = data["KRX"][str(today.year)]
+        day = date(today.year, 1, 1)
+        while day <= max(actual):
+            key = day.isoformat()
+            if day.weekday() < 5 and (day in actual) != (key in year_cal["sessions"]):
+                if day in actual:
+                    year_cal["sessions"][key] = _market_session("KRX", day, first_day=day == min(actual))
+                    year_cal["holidays"].pop(key, None)
+                else:
+                    year_cal["sessions"].pop(key, None)
+                    year_cal["holidays"][key] = "휴장(KRX 개장일 목록)"
+                fixed += 1
+            day += timedelta(days=1)
+        year_cal["sessions"] = dict(sorted(year_cal["sessions"].items()))
+        year_cal["verified_at"] = today.isoformat()
+        _save_calendar_file(data)
+    if fixed:
+        print(f"📅 [캘린더] KRX {today.year}년 휴장일 {fixed}건 보정 (pykrx 개장일 기준)")
+    return fixed
 
 def get_global_financials_raw(ignore_cache=False, fetch_type="all"):
     """대시보드용 글로벌 지수, 환율, 원자재, 금리 데이터를 통합 수집합니다."""
-    print(f"🔍 [DEBUG] get_global_financials_raw 진입 (fetch_type: {fetch_type})")
-    
     cache_dir = os.path.join(BASE_PATH, "cache")
     os.makedirs(cache_dir, exist_ok=True)
     cache_path = os.path.join(cache_dir, "global_financials.json")
@@ -528,7 +2075,6 @@ def get_global_financials_raw(ignore_cache=False, fetch_type="all"):
             with open(cache_path, "r", encoding="utf-8") as f:
                 results = json.load(f)
             if not ignore_cache and time.time() - os.path.getmtime(cache_path) < 600:
-                print("🔍 [DEBUG] get_global_financials_raw 캐시 사용")
                 return results
         except: pass
 
@@ -545,10 +2091,8 @@ def get_global_financials_raw(ignore_cache=False, fetch_type="all"):
         })
     
     try:
-        print("🔍 [DEBUG] get_global_financials_raw yfinance 데이터 다운로드 시작")
-        end_dt = get_now_kst()
-        start_dt = end_dt - timedelta(days=7)
-        df = yf.download(list(tickers.values()), start=start_dt.strftime('%Y-%m-%d'), end=end_dt.strftime('%Y-%m-%d'), progress=False)['Close']
+        update_price_history(list(tickers.values()), force=ignore_cache)
+        df = get_price_panel(list(tickers.values()), 7)
 
         for name, sym in tickers.items():
             if sym in df.columns:
@@ -574,101 +2118,149 @@ def get_global_financials_raw(ignore_cache=False, fetch_type="all"):
             except: pass
         with open(cache_path, "w", encoding="utf-8") as f:
             json.dump(results, f, ensure_ascii=False)
-        print("🔍 [DEBUG] get_global_financials_raw 캐시 저장 완료")
+        print(f"🌐 [글로벌 지표] {len(tickers)}개 종목 시세 갱신 완료 ({fetch_type})")
     except Exception as e:
         print(f"⚠️ get_global_financials_raw 다운로드 중 오류: {e}")
         pass
         
     return results
 
-def get_fed_liquidity_raw():
+# --- [FRED 시계열 저장소] ---
+# (Series ID, 이름, 단위변환계수, 단위문자열, 발표주기)
+FRED_INDICATORS = [
+    ("RRPONTSYD", "RRP", 1.0, "B$", "daily"),
+    ("WRESBAL", "Reserves", 0.001, "B$", "weekly"), # 백만 단위 -> B(Billion) 단위 변환
+    ("WTREGEN", "TGA", 0.001, "B$", "weekly"),
+    ("M2SL", "M2", 1.0, "B$", "monthly"),
+    ("CPIAUCSL", "CPI", 1.0, "Idx", "monthly"),      # 소비자물가지수
+    ("UNRATE", "Unemployment", 1.0, "%", "monthly"), # 실업률
+    ("FEDFUNDS", "FedRate", 1.0, "%", "monthly"),    # 기준금리
+    ("BAMLH0A0HYM2", "HighYield", 1.0, "%", "daily"), # 하이일드 스프레드
+    ("T10YIE", "ExpInf", 1.0, "%", "daily"),       # 기대인플레이션 (10년)
+    ("GDPNOW", "GDPNow", 1.0, "%", "weekly")        # 애틀란타 연은 GDP Now (수시 갱신)
+]
+# 발표주기별 (갱신 간격 초, 증분 조회 시 되짚는 일수 - 수정치 반영용)
+FRED_REFRESH_POLICY = {
+    "daily": (3600, 14),
+    "weekly": (6 * 3600, 35),
+    "monthly": (24 * 3600, 120),
+}
+FRED_BACKFILL_DAYS = 800     # 1년 전 대비 계산(약 252 거래일)에 충분한 초기 적재 기간
+FRED_STATE_PATH = os.path.join(TS_STORE_DIR, "fred_checked.json")
+_fred_lock = threading.Lock()
+
+def _fetch_fred_series(code, start_date):
+    """FRED CSV에서 start_date 이후 관측치만 내려받습니다. (API 키 불필요)"""
+    res = http_request("GET", "https://fred.stlouisfed.org/graph/fredgraph.csv",
+                       params={"id": code, "cosd": start_date}, timeout=(5, 15))
+    res.raise_for_status()
+    return pd.read_csv(io.StringIO(res.text), index_col=0, parse_dates=True)
+
+def update_fred_series(force=False):
+    """갱신 주기가 지난 시리즈만 동시에, 최근 구간만 받아 로컬 저장소에 병합합니다. 갱신된 개수 반환"""
+    with _fred_lock:  # 같은 프로세스의 동시 갱신이 상태 파일/저장소를 번갈아 덮어쓰지 않도록
+        try:
+            with open(FRED_STATE_PATH, "r", encoding="utf-8") as f:
+                checked = json.load(f)
+        except:
+            checked = {}
+
+        now_ts = time.time()
+        today = get_now_kst().date()
+        tasks = {}
+        for code, _, _, _, freq in FRED_INDICATORS:
+            refresh_sec, overlap_days = FRED_REFRESH_POLICY[freq]
+            if not force and now_ts - checked.get(code, 0) < refresh_sec:
+                continue
+            hist = load_ts_store(f"fred_{code}")
+            if hist is None or hist.empty:
+                start_date = today - timedelta(days=FRED_BACKFILL_DAYS)
+            else:
+                start_date = hist.index[-1].date() - timedelta(days=overlap_days)
+            tasks[code] = (lambda c=code, d=start_date.strftime("%Y-%m-%d"): _fetch_fred_series(c, d))
+
+        if not tasks: return 0
+        fetched, _ = run_parallel(tasks, max_workers=5, timeout=20, label="FRED")
+        # 병합/저장은 호출 스레드에서만 수행
+        for code, df in fetched.items():
+            try:
+                if not df.empty:
+                    merge_ts_store(f"fred_{code}", df.iloc[:, [0]].set_axis([code], axis=1))
+                checked[code] = now_ts
+            except Exception as e:
+                print(f"⚠️ FRED {code} 병합 실패: {e}")
+
+        try:
+            os.makedirs(TS_STORE_DIR, exist_ok=True)
+            with open(FRED_STATE_PATH, "w", encoding="utf-8") as f:
+                json.dump(checked, f)
+        except: pass
+        return len(fetched)
+
+def get_fed_liquidity_raw(force=False):
     """FRED 데이터 원본 리스트를 반환합니다. (Dashboard용)"""
-    print("🔍 [DEBUG] get_fed_liquidity_raw 진입")
-    # 🎯 [NEW] 캐싱 설정 (24시간 - 하루 1회)
     cache_dir = os.path.join(BASE_PATH, "cache")
     os.makedirs(cache_dir, exist_ok=True)
-    print("🔍 [DEBUG] get_fed_liquidity_raw 캐시 경로:", cache_dir)
     cache_path = os.path.join(cache_dir, "fed_liquidity.json")
     
-    if os.path.exists(cache_path):
+    # 🎯 발표주기별로 갱신이 필요한 시리즈만 조회 - 변경이 없으면 기존 스냅샷 그대로 사용
+    updated = update_fred_series(force)
+    if not updated and os.path.exists(cache_path):
         try:
-            if time.time() - os.path.getmtime(cache_path) < 3600: # 1시간 주기로 갱신 변경
-                with open(cache_path, "r", encoding="utf-8") as f:
-                    return json.load(f)
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
         except: pass
 
     results = []
-    
-    # (Series ID, 이름, 단위변환계수, 단위문자열)
-    indicators = [
-        ("RRPONTSYD", "RRP", 1.0, "B$"),
-        ("WRESBAL", "Reserves", 0.001, "B$"), # 백만 단위 -> B(Billion) 단위 변환
-        ("WTREGEN", "TGA", 0.001, "B$"),
-        ("M2SL", "M2", 1.0, "B$"),
-        ("CPIAUCSL", "CPI", 1.0, "Idx"),      # 소비자물가지수
-        ("UNRATE", "Unemployment", 1.0, "%"), # 실업률
-        ("FEDFUNDS", "FedRate", 1.0, "%"),    # 기준금리
-        ("BAMLH0A0HYM2", "HighYield", 1.0, "%"), # 하이일드 스프레드
-        ("T10YIE", "ExpInf", 1.0, "%"),       # 기대인플레이션 (10년)
-        ("GDPNOW", "GDPNow", 1.0, "%")        # 애틀란타 연은 GDP Now
-    ]
-    
-    base_url = "https://fred.stlouisfed.org/graph/fredgraph.csv?id={}"
-    try:
-        print("🔍 [DEBUG] get_fed_liquidity_raw FRED 데이터 다운로드 시작")
-        for code, name, scale, unit in indicators:
-            try:
-                # FRED는 별도 API 키 없이 CSV 직접 다운로드 가능
-                res = requests.get(base_url.format(code), timeout=5)
-                if res.status_code == 200:
-                    # 데이터프레임 변환
-                    df = pd.read_csv(io.StringIO(res.text), index_col=0, parse_dates=True)
-                    if not df.empty:
-                        series = df.iloc[:, 0].dropna()
-                        if series.empty: continue
-                        
-                        curr_val = float(series.iloc[-1]) * scale
-                        curr_date = series.index[-1].strftime("%Y-%m-%d")
-                        
-                        # 🎯 1년 전 데이터 계산 (약 252 거래일 or 12개월)
-                        idx_1y = -252 if len(series) > 252 else (-12 if len(series) > 12 else 0)
-                        val_1y = float(series.iloc[idx_1y]) * scale
-                        diff_1y = curr_val - val_1y
-                        pct_1y = (diff_1y / val_1y) * 100 if val_1y != 0 else 0.0
-                        
-                        # 전조(Previous) 대비 증감
-                        diff_str = "-"
-                        if len(series) > 1:
-                            prev_val = float(series.iloc[-2]) * scale
-                            diff = curr_val - prev_val
-                            diff_str = f"{diff:+.1f}"
-                        
-                        # 두달치(최대 60일) 데이터를 추출하여 5일 간격으로 샘플링
-                        sixty_days_ago = series.index[-1] - pd.Timedelta(days=60)
-                        recent_series = series.loc[series.index >= sixty_days_ago]
-                        ts_values = [f"{float(v * scale):.2f}" for v in recent_series.iloc[::5]]
-
-                        # 단위에 따른 포맷팅 미세 조정
-                        fmt = ",.2f" if unit in ["%", "Idx", "B$"] else ",.1f"
-                        results.append({
-                            "name": name, "value": curr_val, "diff": diff, 
-                            "diff_str": diff_str, "date": curr_date,
-                            "val_str": f"{curr_val:{fmt}}{unit}",
-                            "delta_str": f"{diff_str} (직전)",
-                            "diff_1y": diff_1y,
-                            "pct_1y": pct_1y,
-                            "ts_values": ts_values
-                        })
-                print(f"🔍 [DEBUG] get_fed_liquidity_raw {name} 로드 완료")
-            except Exception as e:
-                continue
-                
-        # 캐시 저장
-        if results:
+    for code, name, scale, unit, _ in FRED_INDICATORS:
+        try:
+            hist = load_ts_store(f"fred_{code}")
+            if hist is None or hist.empty: continue
+            series = hist.iloc[:, 0].dropna()
+            if series.empty: continue
+            
+            curr_val = float(series.iloc[-1]) * scale
+            curr_date = series.index[-1].strftime("%Y-%m-%d")
+            
+            # 🎯 1년 전 데이터: 발표 주기(일/주/월)와 무관하게 마지막 관측일 - 365일에 가장 가까운 관측치
+            target_1y = series.index[-1] - pd.Timedelta(days=365)
+            idx_1y = series.index.get_indexer([target_1y], method="nearest")[0]
+            val_1y = float(series.iloc[idx_1y]) * scale
+            diff_1y = curr_val - val_1y
+            pct_1y = (diff_1y / val_1y) * 100 if val_1y != 0 else 0.0
+            
+            # 전조(Previous) 대비 증감
+            diff, diff_str = 0.0, "-"
+            if len(series) > 1:
+                prev_val = float(series.iloc[-2]) * scale
+                diff = curr_val - prev_val
+                diff_str = f"{diff:+.1f}"
+            
+            # 두달치(최대 60일) 데이터를 추출하여 5일 간격으로 샘플링
+            sixty_days_ago = series.index[-1] - pd.Timedelta(days=60)
+            recent_series = series.loc[series.index >= sixty_days_ago]
+            ts_values = [f"{float(v * scale):.2f}" for v in recent_series.iloc[::5]]
+
+            # 단위에 따른 포맷팅 미세 조정
+            fmt = ",.2f" if unit in ["%", "Idx", "B$"] else ",.1f"
+            results.append({
+                "name": name, "value": curr_val, "diff": diff, 
+                "diff_str": diff_str, "date": curr_date,
+                "val_str": f"{curr_val:{fmt}}{unit}",
+                "delta_str": f"{diff_str} (직전)",
+                "diff_1y": diff_1y,
+                "pct_1y": pct_1y,
+                "ts_values": ts_values
+            })
+        except Exception as e:
+            print(f"⚠️ FRED {name} 계산 실패: {e}")
+            
+    # 캐시 저장
+    if results:
+        try:
             with open(cache_path, "w", encoding="utf-8") as f:
                 json.dump(results, f, ensure_ascii=False)
-        print("🔍 [DEBUG] get_fed_liquidity_raw 캐시 저장")
-    except: pass
+        except: pass
     
     return results
 
@@ -684,37 +2276,177 @@ def get_fed_liquidity_data():
     except Exception as e:
         return f"⚠️ 연준 데이터 수집 중 에러: {e}\n"
 
-def get_past_reports(section, count=1):
-    """특정 섹션의 과거 보고서(날짜별 파일)를 최신순으로 가져옵니다."""
-    base_dir = REPORT_DIR
-    dir_map = {'daily': '01_daily', 'weekly': '02_weekly', 'monthly': '03_monthly'}
-    target_dir = os.path.join(base_dir, dir_map.get(section, "05_etc"))
-    
-    content = ""
-    if os.path.exists(target_dir):
-        # latest.txt 제외하고 날짜 형식 파일만 정렬해서 가져옴
-        files = sorted([f for f in os.listdir(target_dir) if f.endswith(".txt") and f != "latest.txt"], reverse=True)
-        for f_name in files[:count]:
-            try:
-                with open(os.path.join(target_dir, f_name), 'r', encoding='utf-8') as f:
-                    content += f"\n--- [ 과거 리포트: {f_name} ] ---\n{f.read()}\n"
-            except: pass
-    return content
+def get_past_report_docs(section, count=1, prefer_digest=False):
+    """
+    특정 섹션의 과거 보고서를 최신순 [(파일명, 본문)] 목록으로 가져옵니다.
+    prefer_digest=True면 요약본 사이드카를 우선 사용하고, 없을 때만 원문을 읽습니다.
+    """
+    docs = []
+    digest_used = 0
+    # 🗂️ 매니페스트에서 최근 count건만 골라 해당 파일만 읽음
+    for entry in list_reports(section, count):
+        f_name = os.path.basename(entry["path"])
+        f_path = get_report_path(entry)
+        if prefer_digest:
+            digest = load_report_digest(f_path)
+            if digest:
+                docs.append((f"{f_name} (요약본)", digest))
+                digest_used += 1
+                continue
+        try:
+            with open(f_path, 'r', encoding='utf-8') as f:
+                docs.append((f_name, f.read()))
+        except: pass
+    if prefer_digest and docs:
+        print(f"📝 [요약본] {section} 리포트 {len(docs)}건 중 {digest_used}건 요약본 사용")
+    return docs
 
-def get_ai_summary(title, content, system_instruction=None, role="filter", custom_config=None):
-    """뉴스 판독 또는 요약을 위해 AI 모델을 호출합니다. (통합됨)"""
-    now_time = get_now_kst().strftime('%Y-%m-%d %H:%M:%S')
-    
+def get_past_reports(section, count=1, max_tokens=None, prefer_digest=False):
+    """특정 섹션의 과거 보고서(날짜별 파일)를 최신순으로 가져옵니다. max_tokens가 있으면 섹션 단위로 압축"""
+    docs = get_past_report_docs(section, count, prefer_digest)
+    if max_tokens is not None:
+        return pack_report_docs(docs, max_tokens)
+    return "".join(f"\n--- [ 과거 리포트: {name} ] ---\n{text}\n" for name, text in docs)
+
+# --- [보고서 컨텍스트 패커] ---
+# 모델 컨텍스트 한도(analyst_model.context_tokens)에서 출력 예약분을 뺀 만큼만 입력으로 보냅니다.
+REPORT_CONTEXT_TOKENS = 16384
+REPORT_OUTPUT_RESERVE = 4096     # 보고서 생성(출력)용으로 남겨둘 토큰
+REPORT_INPUT_SHARE = 0.6         # 입력 데이터(시장 지표 + 뉴스/하위 리포트) 몫, 나머지는 지침 + 과거 리포트
+MIN_DOC_TOKENS = 300             # 과거 리포트 1건에 최소한 배정할 토큰 (이보다 적으면 오래된 리포트부터 제외)
+_HANGUL_RE = re.compile(r"[가-힣ㄱ-ㅎㅏ-ㅣ]")
+
+def estimate_tokens(text):
+    """토크나이저 없이 쓰는 보수적 토큰 추정치 (한글 1자 ≈ 1토큰, 그 외 약 4자 ≈ 1토큰)"""
+    if not text: return 0
+    hangul = len(_HANGUL_RE.findall(text))
+    return hangul + (len(text) - hangul + 3) // 4
+
+def get_report_budget(config_data=None):
+    """분석 모델의 컨텍스트 한도에서 출력 예약분을 뺀 입력 예산(토큰)"""
+    cfg = (config_data or data).get("analyst_model", {})
+    ctx = int(cfg.get("context_tokens") or REPORT_CONTEXT_TOKENS)
+    return max(1024, ctx - REPORT_OUTPUT_RESERVE)
+
+def trim_lines(lines, max_tokens):
+    """중요도 순으로 정렬된 줄 목록을 예산 안에서 앞에서부터 채웁니다."""
+    kept, used = [], 0
+    for line in lines:
+        t = estimate_tokens(line) + 1
+        if used + t > max_tokens: break
+        kept.append(line)
+        used += t
+    return kept
+
+def trim_report_sections(text, max_tokens):
+    """보고서를 마크다운 제목 단위 섹션으로 나눠, 앞 섹션(요약/핵심)부터 예산 안에서 남깁니다."""
+    if estimate_tokens(text) <= max_tokens: return text
+    sections = [sec for sec in re.split(r"(?m)^(?=#{1,4} )", text) if sec]
+    kept, used = [], 0
+    for sec in sections:
+        t = estimate_tokens(sec)
+        if used + t > max_tokens:
+            if not kept:
+                # 첫 섹션부터 넘치면 글자 단위로 자름
+                kept.append(sec[:int(len(sec) * max_tokens / max(t, 1))])
+            break
+        kept.append(sec)
+        used += t
+    return "".join(kept).rstrip() + "\n(…이하 섹션 생략)"
+
+def pack_report_docs(docs, max_tokens):
+    """
+    최신순 과거 리포트 목록을 예산에 맞춥니다.
+    들어갈 수 있는 개수만큼 최신 리포트부터 균등 배분하고, 다 쓰지 않은 몫은 다음 리포트로 넘깁니다.
+    """
+    if max_tokens <= 0: return ""
+    n_fit = min(len(docs), max(1, max_tokens // MIN_DOC_TOKENS))
+    remaining = max_tokens
+    out = []
+    for i, (name, text) in enumerate(docs[:n_fit]):
+        header = f"\n--- [ 과거 리포트: {name} ] ---\n"
+        # 머리글과 생략 표시분을 빼고 본문 예산 산정 (머리글조차 안 들어가면 중단)
+        doc_budget = max(0, remaining // (n_fit - i) - estimate_tokens(header) - 10)
+        if doc_budget == 0: break
+        body = trim_report_sections(text, doc_budget)
+        remaining -= estimate_tokens(header + body)
+        out.append(f"{header}{body}\n")
+    return "".join(out)
+
+def log_context_breakdown(label, parts, budget):
+    """보고서별 최종 토큰 구성 로그"""
+    detail = ", ".join(f"{k} {v:,}" for k, v in parts.items())
+    print(f"🧮 [컨텍스트] {label} 총 {sum(parts.values()):,}/{budget:,} 토큰 | {detail}")
+
+def _resolve_model_cfg(role="filter", custom_config=None):
     # 설정 로드 (custom_config가 있으면 우선 사용, 아니면 common.data 사용)
     cfg_data = custom_config if custom_config else data
-    cfg = cfg_data.get("filter_model") if role == "filter" else cfg_data.get("analyst_model")
+    return cfg_data.get("filter_model") if role == "filter" else cfg_data.get("analyst_model")
+
+# --- [AI 응답 캐시] ---
+LLM_CACHE_MAX_BYTES = 20 * 1024 * 1024   # 응답 본문 합계 상한 (초과 시 오래된 것부터 삭제)
+LLM_CACHE_TTL_DAYS = 30
+
+def make_llm_cache_key(title, content, system_instruction=None, role="filter", custom_config=None):
+    """
+    같은 모델/설정/지침/입력이면 같은 키가 나오도록 해시합니다.
+    요청 시 사용자 입력 끝에 붙는 '(현재 시각: ...)'은 호출마다 달라지므로, 시각을 붙이기 전의 제목/본문만 해시합니다.
+    """
+    cfg = _resolve_model_cfg(role, custom_config)
+    instruction = system_instruction if system_instruction else cfg.get("prompt", "")
+    parts = [
+        cfg.get("url", "").rstrip('/'), str(cfg.get("name")), str(cfg.get("temperature", 0.3)),
+        hashlib.sha256(instruction.encode()).hexdigest(),
+        hashlib.sha256(f"{title}\n{content}".encode()).hexdigest(),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+def get_cached_ai_response(key):
+    """캐시된 (응답, 생성시각 epoch)을 반환합니다. 없거나 만료됐으면 None"""
+    try:
+        row = get_db().execute(
+            "SELECT response, created_at FROM llm_cache WHERE key = ? AND created_at >= ?",
+            (key, time.time() - LLM_CACHE_TTL_DAYS * 86400)
+        ).fetchone()
+        return (row["response"], row["created_at"]) if row else None
+    except Exception as e:
+        print(f"⚠️ AI 응답 캐시 조회 실패: {e}")
+        return None
+
+def save_ai_response(key, response):
+    """응답을 캐시에 저장하고 기간/용량 기준으로 오래된 항목을 정리합니다. (오류 응답은 저장 안 함)"""
+    if not response or "❌ [ERROR]" in response: return
+    conn = get_db()
+    try:
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO llm_cache (key, response, size, created_at) VALUES (?, ?, ?, ?)",
+                         (key, response, len(response.encode()), time.time()))
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - LLM_CACHE_TTL_DAYS * 86400,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total > LLM_CACHE_MAX_BYTES:
+                # 누적 크기가 상한 안으로 들어올 때까지 오래된 순으로 삭제
+                conn.execute("""
+                    DELETE FROM llm_cache WHERE key IN (
+                        SELECT key FROM (
+                            SELECT key, SUM(size) OVER (ORDER BY created_at DESC) AS running FROM llm_cache
+                        ) WHERE running > ?
+                    )""", (LLM_CACHE_MAX_BYTES,))
+    except Exception as e:
+        print(f"⚠️ AI 응답 캐시 저장 실패: {e}")
+
+def _build_ai_request(title, content, system_instruction=None, role="filter", custom_config=None, stream=False):
+    """모델 설정에 맞는 (url, headers, payload)를 구성합니다. stream=True면 SSE 스트리밍 엔드포인트 사용"""
+    now_time = get_now_kst().strftime('%Y-%m-%d %H:%M:%S')
+    cfg = _resolve_model_cfg(role, custom_config)
     
     base_url = cfg.get("url", "").rstrip('/')
     model_name = cfg.get("name")
     
     # 지침 설정
     user_prompt = system_instruction if system_instruction else cfg.get("prompt", "")
-    final_role = f"현재 시각: {now_time}\n분석 지침: {user_prompt}"
+    # 💡 지침(고정)이 앞, 시각(매번 변함)은 사용자 입력 맨 뒤 - 프롬프트 접두부 캐시(KV 재사용) 유지
+    final_role = f"분석 지침: {user_prompt}"
+    user_text = f"제목: {title}\n본문: {content}\n\n(현재 시각: {now_time})"
 
     # 클라우드(Google 직접 호출) 여부 판별
     is_direct_google = "generativelanguage.googleapis.com" in base_url
@@ -726,10 +2458,11 @@ def get_ai_summary(title, content, system_instruction=None, role="filter", custo
 
     # 호출 방식 분기
     if is_direct_google:
-        url = f"{base_url}/v1beta/models/{model_name}:generateContent?key={api_key}"
+        method = "streamGenerateContent?alt=sse&" if stream else "generateContent?"
+        url = f"{base_url}/v1beta/models/{model_name}:{method}key={api_key}"
         headers = {"Content-Type": "application/json"}
         payload = {
-            "contents": [{"parts": [{"text": f"시스템 지침: {final_role}\n\n사용자 입력:\n제목: {title}\n본문: {content}"}]}],
+            "contents": [{"parts": [{"text": f"시스템 지침: {final_role}\n\n사용자 입력:\n{user_text}"}]}],
             "generationConfig": {"temperature": cfg.get("temperature", 0.3)}
         }
     else:
@@ -738,14 +2471,62 @@ def get_ai_summary(title, content, system_instruction=None, role="filter", custo
         if api_key: headers["Authorization"] = f"Bearer {api_key}"
         payload = {
             "model": model_name,
-            "messages": [{"role": "system", "content": final_role}, {"role": "user", "content": f"제목: {title}\n본문: {content}"}],
+            "messages": [{"role": "system", "content": final_role}, {"role": "user", "content": user_text}],
             "temperature": cfg.get("temperature", 0.3)
         }
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}  # 마지막 조각에 토큰 사용량 포함
+    return url, headers, payload
+
+# --- [프롬프트 캐시 적중 기록] ---
+_llm_usage = {}
+_llm_usage_lock = threading.Lock()
+
+def record_llm_usage(result, model_name, label=""):
+    """
+    응답의 토큰 사용량에서 입력 토큰 / 캐시 적중 토큰을 기록합니다.
+    (OpenAI: usage.prompt_tokens_details.cached_tokens, Gemini: usageMetadata.cachedContentTokenCount,
+     llama.cpp: timings.cache_n)
+    """
+    if not isinstance(result, dict): return
+    usage, meta, timings = result.get("usage") or {}, result.get("usageMetadata") or {}, result.get("timings") or {}
+    if usage:
+        prompt = usage.get("prompt_tokens") or 0
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    elif meta:
+        prompt = meta.get("promptTokenCount") or 0
+        cached = meta.get("cachedContentTokenCount") or 0
+    else:
+        prompt, cached = 0, 0
+    if timings.get("cache_n") is not None:
+        cached = cached or timings["cache_n"]
+        prompt = prompt or (timings["cache_n"] + (timings.get("prompt_n") or 0))
+    if not prompt: return
+
+    with _llm_usage_lock:
+        st = _llm_usage.setdefault(model_name, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        st["calls"] += 1
+        st["prompt_tokens"] += prompt
+        st["cached_tokens"] += cached
+        total_rate = st["cached_tokens"] / st["prompt_tokens"] * 100
+    print(f"🧠 [프롬프트 캐시] {label or model_name}: 입력 {prompt:,} 중 {cached:,} 토큰 적중 ({cached / prompt * 100:.0f}%, 누적 {total_rate:.0f}%)")
+
+def get_llm_usage_stats():
+    """모델별 누적 (호출 수, 입력 토큰, 캐시 적중 토큰) 사본"""
+    with _llm_usage_lock:
+        return {k: dict(v) for k, v in _llm_usage.items()}
+
+def get_ai_summary(title, content, system_instruction=None, role="filter", custom_config=None):
+    """뉴스 판독 또는 요약을 위해 AI 모델을 호출합니다. (통합됨)"""
+    now_time = get_now_kst().strftime('%Y-%m-%d %H:%M:%S')
+    url, headers, payload = _build_ai_request(title, content, system_instruction, role, custom_config)
 
     try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=600)
+        resp = http_request("POST", url, json=payload, headers=headers, timeout=(10, 600))
         resp.raise_for_status()
         result = resp.json()
+        record_llm_usage(result, _resolve_model_cfg(role, custom_config).get("name"), title[:30])
         if "candidates" in result:
             return result['candidates'][0]['content']['parts'][0]['text']
         else:
@@ -754,9 +2535,49 @@ def get_ai_summary(title, content, system_instruction=None, role="filter", custo
         print(f"[{now_time}] AI 분석 에러: {str(e)}")
         return f"❌ [ERROR] AI 분석 중 예외 발생: {str(e)}"
 
+def stream_ai_summary(title, content, system_instruction=None, role="filter", custom_config=None):
+    """
+    get_ai_summary의 스트리밍 버전. 생성되는 텍스트 조각을 순서대로 yield 합니다.
+    (OpenAI 호환 SSE `stream: true` / Gemini `streamGenerateContent?alt=sse`)
+    읽기 타임아웃은 전체 생성 시간이 아니라 조각 사이 간격에 적용됩니다.
+    """
+    now_time = get_now_kst().strftime('%Y-%m-%d %H:%M:%S')
+    url, headers, payload = _build_ai_request(title, content, system_instruction, role, custom_config, stream=True)
+    started = time.time()
+    first_token_at = None
+    last_usage = None
+    try:
+        with http_request("POST", url, json=payload, headers=headers, timeout=(10, 300), stream=True) as resp:
+            resp.raise_for_status()
+            resp.encoding = "utf-8"
+            for line in resp.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"): continue
+                body = line[5:].strip()
+                if body == "[DONE]": break
+                chunk = json.loads(body)
+                if chunk.get("usage") or chunk.get("usageMetadata") or chunk.get("timings"):
+                    last_usage = chunk
+                if "candidates" in chunk:
+                    parts = chunk['candidates'][0].get('content', {}).get('parts', [])
+                    text = "".join(p.get('text', '') for p in parts)
+                else:
+                    choices = chunk.get('choices') or [{}]
+                    text = (choices[0].get('delta') or {}).get('content') or ""
+                if not text: continue
+                if first_token_at is None:
+                    first_token_at = time.time()
+                    print(f"⚡ [스트리밍] 첫 토큰 {first_token_at - started:.1f}초")
+                yield text
+        print(f"✅ [스트리밍] 완료 {time.time() - started:.1f}초")
+        record_llm_usage(last_usage, _resolve_model_cfg(role, custom_config).get("name"), title[:30])
+    except Exception as e:
+        print(f"[{now_time}] AI 분석 에러: {str(e)}")
+        yield f"\n\n❌ [ERROR] AI 분석 중 예외 발생: {str(e)}"
+
 def prepare_report_data(r_type, config_data):
     """보고서 생성을 위한 데이터(KRX 지표 + 뉴스/과거리포트)를 구성합니다."""
     now_kst = get_now_kst()
+    budget = int(get_report_budget(config_data) * REPORT_INPUT_SHARE)
     global_data = get_global_market_data(r_type)
     fed_data = get_fed_liquidity_data() # 연준 지표 추가
     
@@ -769,102 +2590,221 @@ def prepare_report_data(r_type, config_data):
         
         news_count = config_data.get("report_news_count", 100)
         raw_news_list = []
-        seen_keys = set()
         target_date_limit = (now_kst - timedelta(days=3)).date()
         
-        if os.path.exists(PENDING_PATH):
-            files = sorted([f for f in os.listdir(PENDING_PATH) if f.endswith(".json")], reverse=True)
-            for f_name in files:
-                try:
-                    with open(os.path.join(PENDING_PATH, f_name), "r", encoding="utf-8") as file:
-                        news_data = json.load(file)
-                        title = news_data.get("title", "").strip()
-                        pub_dt_str = news_data.get("pub_dt", "")
-                        if not title: continue
-                        try: f_dt = datetime.strptime(pub_dt_str, '%Y-%m-%d %H:%M:%S').date()
-                        except: f_dt = now_kst.date()
-                        if f_dt < target_date_limit: continue
-                        # scraper.py와 동일한 MD5 해시 기반 중복 방지
-                        import hashlib
-                        clean_key = hashlib.md5(title.encode()).hexdigest()[:16]
-                        if clean_key not in seen_keys:
-                            seen_keys.add(clean_key)
-                            summary = news_data.get("summary", "").strip()
-                            if summary and summary != "내용 없음":
-                                raw_news_list.append(f"[{pub_dt_str[5:16]}] {title} — {summary[:200]}")
-                            else:
-                                raw_news_list.append(f"[{pub_dt_str[5:16]}] {title}")
-                        if len(raw_news_list) >= news_count: break
-                except: continue
+        # 🎯 같은 스토리(여러 매체의 유사 제목)는 대표 1건 + 보도 매체 수로 압축
+        rows = query_news(since=target_date_limit.strftime('%Y-%m-%d 00:00:00'))
+        # ⭐ 백그라운드 채점 점수(미채점은 -1 취급) 높은 순 -> 같은 점수는 최신순 (정렬 안정성으로 최신순 유지)
+        stories = sorted(group_story_clusters(rows), key=lambda r: -(r.get("score") if r.get("score") is not None else -1))
+        for row in stories[:news_count]:
+            title = row["title"].strip()
+            if not title: continue
+            pub_dt_str = row["pub_dt"]
+            summary = (row["summary"] or "").strip()
+            line = f"[{pub_dt_str[5:16]}] {title}"
+            if summary and summary != "내용 없음":
+                line += f" — {summary[:200]}"
+            if row["source_count"] > 1:
+                line += f" ({row['source_count']}개 매체 보도)"
+            if row.get("score") is not None and row["score"] >= 0:
+                line += f" [중요도 {row['score']}/5]"
+            raw_news_list.append(line)
+        print(f"🧩 [Daily] 뉴스 {len(rows)}건 -> 스토리 {len(raw_news_list)}건으로 압축")
         
-        news_ctx = f"### [ 금일 주요 뉴스 {len(raw_news_list)}선 ]\n" + "\n".join([f"- {t}" for t in raw_news_list])
-        return (f"{market_summary}\n{global_data}\n{fed_data}\n{top_purchases}\n\n{news_ctx}", "일간(Daily)")
+        # 🧮 시장 지표는 전부 유지, 뉴스는 남은 예산만큼 중요도/최신순으로 채움
+        market_ctx = f"{market_summary}\n{global_data}\n{fed_data}\n{top_purchases}"
+        market_tokens = estimate_tokens(market_ctx)
+        news_budget = max(0, budget - market_tokens - 50)
+        news_lines = trim_lines([f"- {t}" for t in raw_news_list], news_budget)
+        if raw_news_list and not news_lines:
+            print(f"⚠️ [Daily] 시장 지표({market_tokens:,} 토큰)가 예산({budget:,})을 다 써서 뉴스가 모두 제외되었습니다.")
+        news_ctx = f"### [ 금일 주요 뉴스 {len(news_lines)}선 ]\n" + "\n".join(news_lines)
+        log_context_breakdown("일간 입력", {
+            "시장 지표": market_tokens, f"뉴스({len(news_lines)}/{len(raw_news_list)}건)": estimate_tokens(news_ctx)
+        }, budget)
+        return (f"{market_ctx}\n\n{news_ctx}", "일간(Daily)")
     else:
-        # Weekly: 이번 주 일간 보고서 전부 (최대 7일)
-        # Monthly: 이번 달 주간 보고서 전부 (최대 5개)
+        # Weekly: 이번 주 일간 보고서 (최대 7일)
+        # Monthly: 이번 달 주간 보고서 (최대 5개)
+        # 🧮 시장 지표를 뺀 나머지 예산 안에서 최신 리포트 우선, 섹션 단위로 압축
+        market_ctx = f"{market_summary}\n{global_data}\n{fed_data}"
+        market_tokens = estimate_tokens(market_ctx)
+        docs_budget = max(0, budget - market_tokens - 50)
         if r_type == "weekly":
-            source_docs = get_past_reports('daily', 7)
+            source_docs = get_past_reports('daily', 7, max_tokens=docs_budget, prefer_digest=True)
             label = "주간(Weekly)"
         else:
-            source_docs = get_past_reports('weekly', 5)
+            source_docs = get_past_reports('weekly', 5, max_tokens=docs_budget, prefer_digest=True)
             label = "월간(Monthly)"
             
-        if not source_docs:
+        if not source_docs and docs_budget == 0:
+            print(f"⚠️ [{label}] 시장 지표({market_tokens:,} 토큰)가 예산({budget:,})을 다 써서 하위 리포트가 모두 제외되었습니다.")
+            source_docs = "⚠️ 입력 예산 부족으로 하위 주기 리포트를 싣지 못했습니다."
+        elif not source_docs:
             source_docs = "⚠️ 분석할 하위 주기 리포트 데이터가 없습니다."
+        log_context_breakdown(f"{label} 입력", {
+            "하위 리포트": estimate_tokens(source_docs), "시장 지표": market_tokens
+        }, budget)
             
-        return f"{source_docs}\n\n{market_summary}\n{global_data}\n{fed_data}", label
+        return f"{source_docs}\n\n{market_ctx}", label
 
-def generate_invest_report(r_type, input_content, config_data):
-    """AI를 호출하여 투자 전략 보고서를 생성합니다."""
+def generate_invest_report(r_type, input_content, config_data, stream=False):
+    """AI를 호출하여 투자 전략 보고서를 생성합니다. (stream=True면 텍스트 조각 generator 반환)"""
     now_kst = get_now_kst()
     
+    # 참고할 과거 리포트: (제목, 섹션, 개수, 예산 비중)
     if r_type == "daily":
         # 일간: 미래 전략 예상 (최근 3일치 일간 + 상위 주기 참조)
-        past_daily = get_past_reports('daily', 3)
-        past_weekly = get_past_reports('weekly', 1)
-        past_monthly = get_past_reports('monthly', 1)
-        
-        historical_context = (
-            f"### [ 최근 3일간의 일간 리포트 ]\n{past_daily}\n\n"
-            f"### [ 상위 주기(주간/월간) 흐름 참조 ]\n{past_weekly}\n{past_monthly}"
-        )
-        
-        base_prompt = REPORT_PROMPTS["daily"]["base_prompt"]
-        specific_guideline = REPORT_PROMPTS["daily"]["specific_guideline"]
-        structure_instruction = REPORT_PROMPTS["daily"]["structure_instruction"]
-        
+        history_spec = [
+            ("### [ 최근 3일간의 일간 리포트 ]", "daily", 3, 2),
+            ("### [ 상위 주기(주간/월간) 흐름 참조 ]", "weekly", 1, 1),
+            (None, "monthly", 1, 1),
+        ]
     elif r_type == "weekly":
         # 주간: 현상 원인 기록 (지난 주간 리포트 참조)
-        past_weekly = get_past_reports('weekly', 1)
-        historical_context = f"### [ 지난 주간 리포트 (비교용) ]\n{past_weekly}"
-        
-        base_prompt = REPORT_PROMPTS["weekly"]["base_prompt"]
-        specific_guideline = REPORT_PROMPTS["weekly"]["specific_guideline"]
-        structure_instruction = REPORT_PROMPTS["weekly"]["structure_instruction"]
-        
+        history_spec = [("### [ 지난 주간 리포트 (비교용) ]", "weekly", 1, 1)]
     else: # monthly
         # 월간: 구조적 변화 기록 (지난 월간 리포트 참조)
-        past_monthly = get_past_reports('monthly', 1)
-        historical_context = f"### [ 지난 월간 리포트 (비교용) ]\n{past_monthly}"
-        
-        base_prompt = REPORT_PROMPTS["monthly"]["base_prompt"]
-        specific_guideline = REPORT_PROMPTS["monthly"]["specific_guideline"]
-        structure_instruction = REPORT_PROMPTS["monthly"]["structure_instruction"]
+        history_spec = [("### [ 지난 월간 리포트 (비교용) ]", "monthly", 1, 1)]
+
+    prompt_set = REPORT_PROMPTS.get(r_type, REPORT_PROMPTS["monthly"])
+    base_prompt = prompt_set["base_prompt"]
+    specific_guideline = prompt_set["specific_guideline"]
+    structure_instruction = prompt_set["structure_instruction"]
 
     analysis_guideline = f"### [ {r_type} 분석 지침 ]\n{specific_guideline}"
 
-    system_prompt = (
-        f"현재 임무: {r_type} 투자 보고서 작성\n"
-        f"기준 시각: {now_kst.strftime('%Y-%m-%d %H:%M')}\n\n"
-        f"당신은 {base_prompt}이며, 아래 지침을 준수해야 합니다.\n\n"
-        f"{analysis_guideline}\n\n"
-        f"--- [ 중요 사항 ] ---\n"
-        f"* 입력된 시장 데이터(KOSPI, 글로벌 지수 등)에는 '시계열(과거->현재)' 변화 흐름이 화살표(->)로 나열되어 있습니다.\n"
-        f"* 이 시계열 추이(Time-series)를 분석하여 해당 기간(7일, 14일, 60일) 동안의 추세(하락 후 반등, 지속 상승 등)를 반드시 파악하고 보고서에 반영하십시오.\n\n"
-        f"--- [ 참고 자료 (Context) ] ---\n{historical_context}\n\n"
-        f"--- [ 최종 지시 ] ---\n"
-        f"제공된 시계열 입력 데이터(Input Data)를 바탕으로 보고서를 작성하세요.\n"
-        f"{structure_instruction}"
-    )
+    def build_system_prompt(historical_context):
+        # 💡 고정 지침(REPORT_PROMPTS)을 앞에 두고, 매번 바뀌는 참고 자료와 기준 시각은 맨 뒤에 배치
+        #    -> 같은 유형의 보고서끼리 접두부가 바이트 단위로 같아 프롬프트 캐시를 재사용합니다.
+        return (
+            f"현재 임무: {r_type} 투자 보고서 작성\n\n"
+            f"당신은 {base_prompt}이며, 아래 지침을 준수해야 합니다.\n\n"
+            f"{analysis_guideline}\n\n"
+            f"--- [ 중요 사항 ] ---\n"
+            f"* 입력된 시장 데이터(KOSPI, 글로벌 지수 등)에는 '시계열(과거->현재)' 변화 흐름이 화살표(->)로 나열되어 있습니다.\n"
+            f"* 이 시계열 추이(Time-series)를 분석하여 해당 기간(7일, 14일, 60일) 동안의 추세(하락 후 반등, 지속 상승 등)를 반드시 파악하고 보고서에 반영하십시오.\n\n"
+            f"--- [ 최종 지시 ] ---\n"
+            f"제공된 시계열 입력 데이터(Input Data)와 아래 참고 자료를 바탕으로 보고서를 작성하세요.\n"
+            f"{structure_instruction}\n\n"
+            f"--- [ 참고 자료 (Context) ] ---\n{historical_context}\n\n"
+            f"기준 시각: {now_kst.strftime('%Y-%m-%d %H:%M')}"
+        )
+
+    # 🧮 지침 + 입력 데이터를 뺀 나머지 예산을 과거 리포트에 비중대로 배분
+    budget = get_report_budget(config_data)
+    fixed_tokens = estimate_tokens(build_system_prompt("")) + estimate_tokens(input_content)
+    history_budget = max(MIN_DOC_TOKENS, budget - fixed_tokens)
+    total_weight = sum(spec[3] for spec in history_spec)
+    history_parts = []
+    for header, section, count, weight in history_spec:
+        if header: history_parts.append(header)
+        history_parts.append(get_past_reports(section, count, max_tokens=history_budget * weight // total_weight))
+    historical_context = "\n".join(history_parts)
+    system_prompt = build_system_prompt(historical_context)
+
+    log_context_breakdown(f"{r_type} 보고서", {
+        "지침": estimate_tokens(build_system_prompt("")),
+        "입력 데이터": estimate_tokens(input_content),
+        "과거 리포트": estimate_tokens(historical_context),
+    }, budget)
     
-    return get_ai_summary(title=f"{date.today()} {r_type.upper()} 보고서", content=input_content, system_instruction=system_prompt, role="analyst", custom_config=config_data)
\ No newline at end of file
+    ai_func = stream_ai_summary if stream else get_ai_summary
+    return ai_func(title=f"{date.today()} {r_type.upper()} 보고서", content=input_content, system_instruction=system_prompt, role="analyst", custom_config=config_data)
+
+# --- [보고서 생성 작업 큐] ---
+REPORT_JOB_PROGRESS_SEC = 2      # 생성 중 본문(partial)을 저장소에 반영하는 간격
+
+def enqueue_report_job(r_type, origin="manual"):
+    """
+    보고서 생성 작업을 등록합니다. 같은 주기의 작업이 이미 대기/실행 중이면 그 작업에 합류합니다.
+    (작업 id, 새로 등록됐는지) 반환
+    """
+    now_ts = time.time()
+    conn = get_db()
+    with conn:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO report_jobs (r_type, status, origin, stage, requested_at, updated_at) "
+            "VALUES (?, 'queued', ?, '대기 중', ?, ?)", (r_type, origin, now_ts, now_ts)
+        )
+        if cur.rowcount:
+            return cur.lastrowid, True
+        row = conn.execute("SELECT id FROM report_jobs WHERE r_type = ? AND status IN ('queued', 'running')", (r_type,)).fetchone()
+    return (row["id"], False) if row else (None, False)
+
+def get_report_job(job_id):
+    row = get_db().execute("SELECT * FROM report_jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def get_latest_report_job(r_type):
+    """해당 주기의 가장 최근 작업 (없으면 None)"""
+    row = get_db().execute("SELECT * FROM report_jobs WHERE r_type = ? ORDER BY id DESC LIMIT 1", (r_type,)).fetchone()
+    return dict(row) if row else None
+
+def update_report_job(job_id, **fields):
+    fields["updated_at"] = time.time()
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    conn = get_db()
+    with conn:
+        conn.execute(f"UPDATE report_jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+def claim_next_report_job():
+    """가장 오래된 대기 작업 1건을 실행 상태로 가져옵니다. (없으면 None)"""
+    conn = get_db()
+    row = conn.execute("SELECT id FROM report_jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+    if not row: return None
+    now_ts = time.time()
+    with conn:
+        claimed = conn.execute(
+            "UPDATE report_jobs SET status = 'running', stage = '시작', started_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'queued'", (now_ts, now_ts, row["id"])
+        ).rowcount
+    return get_report_job(row["id"]) if claimed else None
+
+def requeue_interrupted_report_jobs():
+    """수집기 재시작 시, 실행 중에 중단된 작업을 다시 대기열로 돌립니다."""
+    conn = get_db()
+    with conn:
+        return conn.execute(
+            "UPDATE report_jobs SET status = 'queued', stage = '재시작 대기', partial = NULL, updated_at = ? "
+            "WHERE status = 'running'", (time.time(),)
+        ).rowcount
+
+def purge_report_jobs(keep_days=30):
+    """오래된 완료/실패 작업 기록을 정리합니다."""
+    conn = get_db()
+    with conn:
+        return conn.execute(
+            "DELETE FROM report_jobs WHERE status IN ('done', 'failed') AND requested_at < ?",
+            (time.time() - keep_days * 86400,)
+        ).rowcount
+
+def run_report_job(job, config_data):
+    """작업 1건을 실행합니다: 데이터 준비 -> 스트리밍 생성(진행 본문 주기적 저장) -> 파일 저장"""
+    job_id, r_type = job["id"], job["r_type"]
+    try:
+        update_report_job(job_id, stage="데이터 수집")
+        input_content, label = prepare_report_data(r_type, config_data)
+        if not input_content:
+            update_report_job(job_id, status="failed", stage="실패", error="분석할 데이터가 부족합니다.", finished_at=time.time())
+            return False
+
+        update_report_job(job_id, stage=f"{label} 보고서 생성")
+        chunks, last_flush = [], 0
+        for chunk in generate_invest_report(r_type, input_content, config_data, stream=True):
+            chunks.append(chunk)
+            if time.time() - last_flush >= REPORT_JOB_PROGRESS_SEC:
+                update_report_job(job_id, partial="".join(chunks))
+                last_flush = time.time()
+        report = "".join(chunks)
+
+        if not report or "❌ [ERROR]" in report:
+            update_report_job(job_id, status="failed", stage="실패", partial=report, error=report or "빈 응답", finished_at=time.time())
+            return False
+        path = save_report_to_file(report, r_type, config_data)
+        update_report_job(job_id, status="done", stage="완료", partial=None, result_path=path, finished_at=time.time())
+        return True
+    except Exception as e:
+        update_report_job(job_id, status="failed", stage="실패", error=str(e), finished_at=time.time())
+        print(f"🚨 [작업 큐] #{job_id} {r_type} 보고서 생성 오류: {e}")
+        return False
@@ -40,3 +40,17 @@ REPORT_PROMPTS = {
 (각 리포트 성격에 맞는 목차를 구성하여 작성할 것)"""
     }
 }
+
+# 저장된 보고서를 상위 주기(주간/월간) 입력용으로 압축하는 요약(digest) 지침입니다.
+# 응답은 반드시 JSON 하나여야 하며, 키 이름을 바꾸면 common.py의 렌더링도 함께 수정해야 합니다.
+REPORT_DIGEST_PROMPT = """당신은 투자 보고서를 상위 주기 분석용으로 압축하는 편집자입니다.
+주어진 보고서를 읽고 아래 키를 가진 JSON 객체 하나만 출력하세요. (설명, 코드블록 표시 금지)
+{
+  "themes": ["핵심 테마/이슈 (최대 5개, 각 한 문장)"],
+  "market_view": "시장 국면과 유동성 흐름에 대한 판단 (2~3문장)",
+  "key_figures": ["판단의 근거가 된 주요 수치 (지수, 금리, 환율 등, 최대 8개)"],
+  "scores": {"자산 또는 산업명": "보고서에 기록된 점수(0~5)와 변화 (예: 3 -> 4)"},
+  "strategy": ["포트폴리오 전략 및 행동 지침 (확대/유지/축소 포함, 최대 5개)"],
+  "risks": ["주요 리스크 (최대 3개)"]
+}
+보고서에 없는 내용은 추측하지 말고 빈 값으로 두세요."""
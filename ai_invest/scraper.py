@@ -1,137 +1,124 @@
-import hashlib
 from common import *
 
-processed_titles = {}  # {clean_key: timestamp} - 3일 TTL 기반 중복 캐시
+processed_titles = {}  # {clean_key: timestamp} - 이번 실행 중 확인된 키의 메모리 캐시 (원본은 저장소 중복 인덱스)
 CACHE_TTL = 3 * 86400  # 3일 (초)
 
 
 def init_processed_cache():
-    """기존 파일에서 중복 캐시를 복원합니다 (재시작 시 중복 수집 방지)"""
-    global processed_titles
-    if not os.path.exists(PENDING_PATH):
-        return
-    
-    current_time = time.time()
-    count = 0
-    
-    for f in os.listdir(PENDING_PATH):
-        fp = os.path.join(PENDING_PATH, f)
-        if not (os.path.isfile(fp) and f.endswith(".json")):
-            continue
-        
-        # 3일보다 오래된 파일은 캐시에 넣지 않음
-        mtime = os.path.getmtime(fp)
-        if current_time - mtime > CACHE_TTL:
-            continue
-            
-        try:
-            with open(fp, "r", encoding="utf-8") as file:
-                news_data = json.load(file)
-                title = news_data.get("title", "").strip()
-                pub_dt_str = news_data.get("pub_dt", "")
-                if not title:
-                    continue
-                
-                try:
-                    dt_obj = datetime.strptime(pub_dt_str, '%Y-%m-%d %H:%M:%S')
-                    date_key = dt_obj.strftime('%Y%m%d')
-                except:
-                    date_key = "unknown"
-                
-                clean_key = f"{date_key}_{hashlib.md5(title.encode()).hexdigest()[:12]}"
-                processed_titles[clean_key] = mtime
-                count += 1
-        except:
-            continue
-    
-    print(f"🔄 중복 캐시 복원 완료: {count}개 항목 로드됨 (3일 이내)")
+    """저장소 중복 인덱스를 준비합니다 (재시작 시 중복 수집 방지 - 기사 전체를 다시 읽지 않음)"""
+    # 💡 구버전(기사별 JSON 파일) 데이터가 남아 있으면 1회 이전
+    migrate_pending_files()
+
+    expired = expire_news_seen(CACHE_TTL)
+    total = init_news_seen_index()
+    print(f"🔄 중복 인덱스 준비 완료: {total}개 키 (3일 TTL, 만료 {expired}개 제거)")
+
+    backfilled = backfill_story_clusters()
+    if backfilled:
+        print(f"🧩 기존 기사 {backfilled}개에 스토리 클러스터 부여 완료")
 
 
 
 def save_file(entry, feed_name):
-    """개선된 타임라인 보존 저장 방식 (JSON)"""
+    """개선된 타임라인 보존 저장 방식 (SQLite 저장소)"""
     global processed_titles
     
-    title = entry.title.strip()
-# 🎯 1. 발행 시간을 KST(한국 표준시)로 엄격하게 변환 [cite: 1, 4]
-    if hasattr(entry, 'published_parsed') and entry.published_parsed:
-        # UTC 기반 구조체 시간을 KST datetime 객체로 변환 [cite: 3, 4]
-        dt_obj = datetime.fromtimestamp(time.mktime(entry.published_parsed), tz=timezone.utc).astimezone(KST)
-    else:
-        # 시간 정보가 없는 경우 현재 KST 시각 사용 
-        dt_obj = get_now_kst()
-        
-    dt_str = dt_obj.strftime('%Y%m%d_%H%M%S')# 파일명 정렬용
-    date_key = dt_obj.strftime('%Y%m%d')     # 일별 중복 분리용
-    pub_dt_str = dt_obj.strftime('%Y-%m-%d %H:%M:%S') # 데이터 저장용
-    
-    # 🎯 2. 중복 체크 키 (날짜 + 제목 MD5 해시 - 충돌 방지)
-    clean_key = f"{date_key}_{hashlib.md5(title.encode()).hexdigest()[:12]}"
-    
-    if clean_key in processed_titles:
+    # 🎯 1. 발행 시간 KST 변환 + 중복 체크 키 (날짜 + 제목 MD5 해시 - 충돌 방지)
+    record = news_entry_to_record(entry, feed_name)
+    if not record["title"]:
         return False
     
-    # 🎯 3. 파일명에 시간 정보 주입 (정렬 최적화)
-    file_hash = hashlib.md5(title.encode()).hexdigest()[:6]
-    filename = f"{dt_str}_{file_hash}.json" # JSON 확장자 사용
-    filepath = os.path.join(PENDING_PATH, filename)
-    
-    # 🎯 4. 데이터 구조화 (AI 분석용 정보 확장)
-    news_data = {
-        "title": title,
-        "pub_dt": pub_dt_str, # [수정 완료]
-        "source": feed_name,
-        "summary": entry.get('summary', '내용 없음'),
-        "link": entry.get('link', '')
-    }
+    if record["key"] in processed_titles:
+        return False
     
+    # 🎯 2. 저장소에 기록 (중복 인덱스에 이미 있는 키면 쓰기 트랜잭션 없이 건너뜀)
     try:
-        os.makedirs(PENDING_PATH, exist_ok=True)
-        with open(filepath, "w", encoding='utf-8') as f:
-            json.dump(news_data, f, ensure_ascii=False, indent=2)
-        processed_titles[clean_key] = time.time()
-        return True
+        if is_news_seen(record["key"]):
+            processed_titles[record["key"]] = time.time()
+            return False
+        saved = store_news(record)
+        processed_titles[record["key"]] = time.time()
+        return saved
     except Exception as e:
-        print(f"❌ 파일 쓰기 실패: {e}") # 에러 로그를 남겨야 경로 문제를 알 수 있습니다.
+        print(f"❌ 저장소 쓰기 실패: {e}") # 에러 로그를 남겨야 경로 문제를 알 수 있습니다.
         return False
         
 def cleanup_old_files(retention_days):
-    """설정된 기간보다 오래된 파일 및 메모리 캐시 삭제"""
+    """설정된 기간보다 오래된 기사, 만료된 중복 키 및 메모리 캐시 삭제"""
     global processed_titles
-    if not os.path.exists(PENDING_PATH): return
-    
     current_time = time.time()
-    seconds_threshold = retention_days * 86400
-    deleted_count = 0
-    max_files = 600 # 최대 파일 개수 제한
-    
-    # 1. 파일 목록 확보 및 정렬 (오래된 순)
-    files = []
-    for f in os.listdir(PENDING_PATH):
-        fp = os.path.join(PENDING_PATH, f)
-        if os.path.isfile(fp) and (f.endswith(".json") or f.endswith(".txt")):
-            files.append((os.path.getmtime(fp), fp))
-            
-    files.sort(key=lambda x: x[0]) # 오름차순: 오래된 파일 -> 최신 파일
     
-    # 2. 삭제 수행
-    total_cnt = len(files)
-    for i, (mtime, fp) in enumerate(files):
-        # 삭제 조건: 기간 만료 OR 개수 초과 (남은 파일이 1500개보다 많으면 삭제)
-        if (current_time - mtime > seconds_threshold) or ((total_cnt - i) > max_files):
-            try:
-                os.remove(fp)
-                deleted_count += 1
-            except: pass
-        else:
-            break # 정렬되어 있으므로 이후 파일은 안전
+    # 기간 만료 OR 개수 초과 (최대 600개) 기사 삭제 + 중복 인덱스 TTL 만료
+    try:
+        deleted_count = purge_news(retention_days, max_rows=600)
+        expired_seen = expire_news_seen(CACHE_TTL)
+        purge_report_jobs()
+        purge_search_index()
+    except Exception as e:
+        print(f"⚠️ 저장소 정리 실패: {e}")
+        deleted_count = expired_seen = 0
     
     # 만료된 캐시 항목만 선택적 제거 (3일 TTL)
     expired_keys = [k for k, t in processed_titles.items() if current_time - t > CACHE_TTL]
     for k in expired_keys:
         del processed_titles[k]
-    if deleted_count > 0 or expired_keys:
-        print(f"🧹 파일 {deleted_count}개 정리, 만료 캐시 {len(expired_keys)}개 제거 (캐시 잔여: {len(processed_titles)}개)")
+    if deleted_count > 0 or expired_seen > 0 or expired_keys:
+        print(f"🧹 기사 {deleted_count}개 정리, 만료 키 {expired_seen}개 제거 (메모리 캐시 잔여: {len(processed_titles)}개)")
+
+
+def score_worker_loop(get_config, idle_sec=30):
+    """
+    신규 기사 중요도 채점 백그라운드 스테이지.
+    미채점 기사를 SCORE_BATCH_SIZE건씩 묶어 score_workers개까지 동시에 판독 모델에 보내고,
+    결과 저장은 이 스레드에서만 수행합니다. 처리량 통계는 SCORE_STATS_PATH에 기록됩니다.
+    """
+    stats = {"scored": 0, "batches": 0, "failed_batches": 0, "busy_sec": 0.0}
+    while True:
+        try:
+            cfg = get_config() or data
+            if not cfg.get("news_scoring", False):
+                time.sleep(idle_sec)
+                continue
+
+            workers = max(1, int(cfg.get("score_workers", 2)))
+            rows = fetch_unscored_news(SCORE_BATCH_SIZE * workers)
+            if not rows:
+                time.sleep(idle_sec)
+                continue
+
+            started = time.time()
+            batches = [rows[i:i + SCORE_BATCH_SIZE] for i in range(0, len(rows), SCORE_BATCH_SIZE)]
+            tasks = {f"batch{i}": (lambda b=b: score_news_batch(b, cfg)) for i, b in enumerate(batches)}
+            results, _ = run_parallel(tasks, max_workers=workers, timeout=300, label="중요도 채점")
+
+            scored = 0
+            for name in tasks:
+                scores = results.get(name)
+                if scores is None:
+                    stats["failed_batches"] += 1
+                    continue
+                save_news_scores(scores)
+                scored += sum(1 for v in scores.values() if v is not None)
+            elapsed = time.time() - started
+            stats["scored"] += scored
+            stats["batches"] += len(batches)
+            stats["busy_sec"] += elapsed
+            stats["per_min"] = round(stats["scored"] / stats["busy_sec"] * 60, 1) if stats["busy_sec"] else 0.0
+            stats["updated_at"] = get_now_kst().strftime('%Y-%m-%d %H:%M:%S')
+            print(f"⭐ [채점] {scored}/{len(rows)}건 완료 ({elapsed:.1f}초) | 누적 {stats['scored']}건, 평균 {stats['per_min']}건/분")
+            try:
+                tmp_path = make_tmp_path(SCORE_STATS_PATH)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(stats, f, ensure_ascii=False)
+                os.replace(tmp_path, SCORE_STATS_PATH)
+            except: pass
+
+            # 모든 배치가 실패했다면 모델 서버 문제일 가능성이 높으므로 잠시 대기
+            if scored == 0:
+                time.sleep(idle_sec)
+        except Exception as e:
+            print(f"⚠️ [채점] 스테이지 오류: {e}")
+            time.sleep(idle_sec)
 
 
 def generate_auto_report(config_data, r_type):
@@ -139,58 +126,225 @@ def generate_auto_report(config_data, r_type):
     # 0. 데이터 최신화: 보고서 생성을 위한 시장 데이터 갱신 (마켓 오픈/클로즈 판별)
     print(f"🔄 [Auto] 보고서 생성을 위한 시장 데이터 갱신 점검...")
     try:
-        if is_kr_market_open():
-            get_krx_summary_raw(ignore_cache=True)
-        
-        if is_us_market_open():
-            get_global_financials_raw(ignore_cache=True, fetch_type="all")
-        else:
-            get_global_financials_raw(ignore_cache=True, fetch_type="non_equities")
-            
-        get_fed_liquidity_raw()
+        # 주기 갱신(market 작업)이나 다른 보고서가 이미 갱신 중이면 새로 받지 않고 그 결과를 기다려 사용
+        run_market_refresh()
     except Exception as e:
         print(f"⚠️ 데이터 갱신 중 오류 발생 (기존 데이터 사용): {e}")
 
-    # 1. 데이터 준비 (common.py 활용)
-    input_content, label = prepare_report_data(r_type, config_data)
-    
-    if not input_content:
-        print(f"⚠️ [Auto] 분석할 데이터가 부족하여 보고서 생성을 건너뜁니다.")
+    # 1. 작업 큐에 등록 (같은 주기의 수동 작업이 이미 진행 중이면 그 작업에 합류) 후 완료 대기
+    job_id, created = enqueue_report_job(r_type, origin="auto")
+    if job_id is None:
+        print(f"🚨 [Auto] {r_type} 보고서 작업 등록 실패")
         return False
+    print(f"🤖 [Auto] {r_type} 보고서 작업 #{job_id} {'등록' if created else '(진행 중인 작업에 합류)'}")
 
-    print(f"🤖 [Auto] {label} 보고서 생성 시작...")
-    
-    # 2. AI 생성 (common.py 활용)
-    report_content = generate_invest_report(r_type, input_content, config_data)
-    
-    if report_content and "❌" not in report_content:
-        # 3. 저장
-        save_path = save_report_to_file(report_content, r_type)
-        print(f"✨ [Auto] {label} 생성 완료! 저장됨: {save_path}")
+    while True:
+        job = get_report_job(job_id)
+        if not job or job["status"] in ("done", "failed"): break
+        time.sleep(5)
+
+    if job and job["status"] == "done":
+        print(f"✨ [Auto] {r_type} 생성 완료! 저장됨: {job['result_path']}")
         return True
+    print(f"🚨 [Auto] 보고서 생성 실패: {job.get('error') if job else '작업 기록 없음'}")
+    return False
+
+def report_job_worker_loop(get_config, poll_sec=3):
+    """
+    보고서 생성 작업 큐 소비자 (단일 스레드 - 보고서 생성은 한 번에 하나만 실행).
+    앱 세션과 분리되어 있으므로 브라우저를 닫거나 새로고침해도 생성이 계속됩니다.
+    """
+    requeued = requeue_interrupted_report_jobs()
+    if requeued:
+        print(f"🔁 [작업 큐] 중단됐던 보고서 작업 {requeued}건 재등록")
+    while True:
+        try:
+            job = claim_next_report_job()
+            if not job:
+                time.sleep(poll_sec)
+                continue
+            started = time.time()
+            print(f"🏗️ [작업 큐] #{job['id']} {job['r_type']} 보고서 생성 시작 ({job['origin']})")
+            ok = run_report_job(job, get_config() or data)
+            print(f"{'✅' if ok else '🚨'} [작업 큐] #{job['id']} {job['r_type']} {'완료' if ok else '실패'} ({time.time() - started:.0f}초)")
+        except Exception as e:
+            print(f"⚠️ [작업 큐] 처리 오류: {e}")
+            time.sleep(poll_sec)
+
+# --- [ 3. 스케줄러 (다음 실행 시각 계산 + 작업별 독립 스레드) ] ---
+SCHEDULER_STATE_PATH = os.path.join(BASE_PATH, "cache", "scheduler_state.json")
+# 자동 보고서: (기준 시각으로부터의 지연(분), 완료 표시 키 형식)
+REPORT_SCHEDULE = {
+    "daily": (0, "%Y-%m-%d"),     # 매일 기준 시각
+    "weekly": (10, "%Y-%U"),      # 일요일 기준 시각 + 10분
+    "monthly": (20, "%Y-%m"),     # 매월 1일 기준 시각 + 20분
+}
+REPORT_RETRY_SEC = 1800        # 자동 보고서 실패 시 같은 예약분 재시도 간격
+REPORT_MAX_ATTEMPTS = 3        # 예약분당 최대 시도 횟수 (초과 시 다음 예약까지 건너뜀)
+TASK_BUSY_RETRY_SEC = 30       # 이전 주기 작업이 아직 실행 중일 때 다시 확인할 간격
+_state_lock = threading.RLock()
+_market_refresh_lock = threading.Lock()
+_task_threads = {}
+
+def load_scheduler_state():
+    """자동 보고서 완료 표시를 로드합니다. 파일이 없으면 None"""
+    try:
+        with open(SCHEDULER_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except:
+        return None
+
+def save_scheduler_state(state):
+    """상태 변경과 저장은 _state_lock 안에서 (보고서 스레드 여러 개가 같은 dict를 갱신)"""
+    with _state_lock:
+        try:
+            os.makedirs(os.path.dirname(SCHEDULER_STATE_PATH), exist_ok=True)
+            tmp_path = f"{SCHEDULER_STATE_PATH}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, SCHEDULER_STATE_PATH)
+        except Exception as e:
+            print(f"⚠️ 스케줄러 상태 저장 실패: {e}")
+
+def _report_time_of_day(kind, base_time_str):
+    """예약 시각(기준 시각 + 지연)의 하루 중 시각. 자정을 넘기면 같은 날의 이른 시각으로 접습니다."""
+    base_dt = datetime.strptime(base_time_str, "%H:%M")
+    minutes = (base_dt.hour * 60 + base_dt.minute + REPORT_SCHEDULE[kind][0]) % 1440
+    return timedelta(minutes=minutes)
+
+def last_report_slot(kind, base_time_str, now):
+    """now 시점까지 도래한 가장 최근 예약 시각을 계산합니다. (예약일을 먼저 정한 뒤 시각만 더함)"""
+    tod = _report_time_of_day(kind, base_time_str)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind == "daily":
+        day, prev_day = midnight, midnight - timedelta(days=1)
+    elif kind == "weekly":
+        day = midnight - timedelta(days=(now.weekday() - 6) % 7)   # 이번 주(가장 최근) 일요일
+        prev_day = day - timedelta(days=7)
     else:
-        print(f"🚨 [Auto] 보고서 생성 실패: {report_content}")
+        day = midnight.replace(day=1)
+        prev_day = (day - timedelta(days=1)).replace(day=1)
+    return day + tod if day + tod <= now else prev_day + tod
+
+def next_report_slot(kind, base_time_str, now):
+    """now 이후 첫 예약 시각"""
+    last = last_report_slot(kind, base_time_str, now)
+    if kind == "daily": return last + timedelta(days=1)
+    if kind == "weekly": return last + timedelta(days=7)
+    # 다음 달 1일: 32일 뒤의 달 1일로 맞춘 뒤 시각 재적용
+    first = (last.replace(hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+    return first + _report_time_of_day(kind, base_time_str)
+
+def run_task_async(name, func, *args):
+    """작업별 독립 스레드로 실행합니다. 같은 작업이 아직 실행 중이면 False (작업별 동시 실행 1개)"""
+    th = _task_threads.get(name)
+    if th and th.is_alive():
         return False
 
-# --- [ 3. 메인 루프 (수동 작업에 방해받지 않는 스케줄러) ] ---
+    def _run():
+        started = time.time()
+        try:
+            func(*args)
+        except Exception as e:
+            print(f"🚨 [{name}] 작업 오류: {e}")
+        finally:
+            print(f"⏱️ [{name}] 작업 종료 ({time.time() - started:.0f}초)")
 
-if __name__ == "__main__":
-    # 💡 자동화(Auto) 전용 상태 관리 변수 (수동 실행 시 이 변수들을 건드리지 않으면 자동 실행됨)
-    auto_daily_done_date = ""
-    auto_weekly_done_week = ""
-    auto_monthly_done_month = ""
+    _task_threads[name] = threading.Thread(target=_run, name=f"task-{name}", daemon=True)
+    _task_threads[name].start()
+    return True
+
+def run_market_refresh(force_all=False):
+    """
+    시장 데이터(KRX, Global, Fed) 기동 시간 / 휴일 판별 자동 수집.
+    한 번에 하나만 실행합니다 - 다른 스레드가 갱신 중이면 끝날 때까지 기다린 뒤 그 결과를 사용 (중복 갱신 없음)
+    """
+    if not _market_refresh_lock.acquire(blocking=False):
+        print(f"⏳ [{get_now_kst().strftime('%H:%M:%S')}] 시장 데이터 갱신이 이미 진행 중 - 완료 후 그 결과 사용")
+        with _market_refresh_lock:
+            return
+    try:
+        _refresh_market_data(force_all)
+    finally:
+        _market_refresh_lock.release()
+
+def _refresh_market_data(force_all):
+    verify_krx_calendar()  # 📅 비정기 휴장일 보정 (하루 1회)
+    need_krx = force_all or is_kr_market_open()
+    need_us = force_all or is_us_market_open()
+    print(f"📊 [{get_now_kst().strftime('%H:%M:%S')}] 시장 데이터 갱신 점검 (KRX수집: {need_krx}, US수집: {need_us})...")
+    if need_krx:
+        get_krx_summary_raw(ignore_cache=True)
+    
+    if need_us:
+        get_global_financials_raw(ignore_cache=True, fetch_type="all") # 주식 포함 전체
+    else:
+        get_global_financials_raw(ignore_cache=True, fetch_type="non_equities") # 환율/원자재만
     
-    last_news_time = 0
-    first_run = True
+    get_fed_liquidity_raw()     # Fed (FRED)
+
+def run_news_cycle(config_data):
+    """뉴스 수집 1회 + 저장소 정리"""
+    now_kst = get_now_kst()
+    print(f"📡 [{now_kst.strftime('%H:%M:%S')}] 뉴스 수집 엔진 가동 (주기: {config_data.get('update_interval', 10)}분)")
+    feeds = config_data.get("feeds", [])
+    g_exc_str = config_data.get('global_exclude', "")
+    
+    new_saved = collect_feeds(
+        feeds, save_file, g_exc_str,
+        max_workers=config_data.get("feed_workers", 8),
+        timeout=config_data.get("feed_timeout", 15)
+    )
+    
+    print(f"✅ [{get_now_kst().strftime('%H:%M:%S')}] 수집 완료 (총 {new_saved}개 신규 확보)")
+    # 🔌 호스트별 누적 HTTP 요청 수 (커넥션 재사용/재시도 모니터링)
+    http_stats = get_http_stats()
+    if http_stats:
+        top = sorted(http_stats.items(), key=lambda x: -x[1]["requests"])[:8]
+        print("🔌 [HTTP] " + ", ".join(f"{h.split('//')[-1]} {v['requests']}회(재시도 {v['retries']}, 오류 {v['errors']})" for h, v in top))
+    
+    # 파일 정리 (기간 만료 및 개수 초과 삭제)
+    cleanup_old_files(min(config_data.get("retention_days", 3), 3))
+
+def report_retry_wait(state, kind, slot_key, now_ts):
+    """
+    예약분(slot_key)을 지금 실행해도 되는지 판단합니다.
+    0: 바로 실행, 양수: 재시도까지 남은 초 (직전 실패 후 대기), None: 최대 시도 횟수 초과로 포기
+    """
+    attempt = state.get("attempts", {}).get(kind)
+    if not attempt or attempt.get("slot") != slot_key:
+        return 0
+    if attempt.get("count", 0) >= REPORT_MAX_ATTEMPTS:
+        return None
+    return max(0, attempt.get("last", 0) + REPORT_RETRY_SEC - now_ts)
+
+def run_scheduled_report(config_data, kind, slot_key, state):
+    """자동 보고서 1회 실행. 시도 기록을 먼저 저장하고, 성공 시에만 완료 표시를 저장합니다."""
+    with _state_lock:
+        attempt = state.setdefault("attempts", {}).get(kind)
+        count = attempt["count"] + 1 if attempt and attempt.get("slot") == slot_key else 1
+        state["attempts"][kind] = {"slot": slot_key, "count": count, "last": time.time()}
+        save_scheduler_state(state)
+
+    if generate_auto_report(config_data, kind):
+        with _state_lock:
+            state[kind] = slot_key
+            state["attempts"].pop(kind, None)
+            save_scheduler_state(state)
+    elif count >= REPORT_MAX_ATTEMPTS:
+        print(f"🚨 [Auto] {kind} 보고서 {count}회 실패 - 이번 예약분({slot_key})은 건너뛰고 다음 예약을 기다립니다.")
+    else:
+        print(f"⚠️ [Auto] {kind} 보고서 실패 ({count}/{REPORT_MAX_ATTEMPTS}) - {REPORT_RETRY_SEC // 60}분 후 재시도")
+
+# --- [ 4. 메인 루프 (수동 작업에 방해받지 않는 스케줄러) ] ---
+
+if __name__ == "__main__":
     _config_mtime = 0  # 설정 파일 변경 감지용
     _cached_config = None
-    _cached_base_time = None  # 예약 시각 캐시
-    _cached_weekly_time = None
-    _cached_monthly_time = None
 
     def _load_config_if_changed():
         """설정 파일이 변경된 경우에만 다시 로드합니다 (디스크 I/O 최소화)"""
-        global _config_mtime, _cached_config, _cached_base_time, _cached_weekly_time, _cached_monthly_time
+        global _config_mtime, _cached_config
         try:
             mt = os.path.getmtime(CONFIG_PATH) if os.path.exists(CONFIG_PATH) else 0
         except:
@@ -198,12 +352,6 @@ if __name__ == "__main__":
         if mt != _config_mtime or _cached_config is None:
             _config_mtime = mt
             _cached_config = load_data()
-            # 예약 시각도 설정 변경 시에만 재계산
-            base_time_str = str(_cached_config.get("report_gen_time", "08:00")).strip()
-            base_dt = datetime.strptime(base_time_str, "%H:%M")
-            _cached_base_time = base_time_str
-            _cached_weekly_time = (base_dt + timedelta(minutes=10)).strftime("%H:%M")
-            _cached_monthly_time = (base_dt + timedelta(minutes=20)).strftime("%H:%M")
         return _cached_config
 
     try:
@@ -213,110 +361,84 @@ if __name__ == "__main__":
         print(f"❌ 초기 설정 로드 실패: {e}")
 
     init_processed_cache()
+    ensure_search_index()  # 🔎 기존 기사/보고서 1회 색인 (이미 색인돼 있으면 건너뜀)
+
+    # ⭐ 신규 기사 중요도 채점은 수집 루프와 독립된 데몬 스레드에서 진행
+    threading.Thread(target=score_worker_loop, args=(lambda: _cached_config,), name="news-scorer", daemon=True).start()
+    # 🏗️ 보고서 생성 작업 큐 소비 (앱의 생성 버튼 + 자동 생성 모두 이 스레드에서 순차 처리)
+    threading.Thread(target=report_job_worker_loop, args=(lambda: _cached_config,), name="report-jobs", daemon=True).start()
+
+    # 💡 자동 보고서 완료 표시 (재시작해도 유지). 처음 설치 시에는 지난 예약분을 완료로 간주해 몰아서 생성하지 않음
+    schedule_state = load_scheduler_state()
+    if schedule_state is None:
+        now_kst = get_now_kst()
+        base_time_str = str(_load_config_if_changed().get("report_gen_time", "08:00")).strip()
+        schedule_state = {kind: last_report_slot(kind, base_time_str, now_kst).strftime(fmt)
+                          for kind, (_, fmt) in REPORT_SCHEDULE.items()}
+        save_scheduler_state(schedule_state)
+
+    next_news_ts = 0
+    next_market_ts = 0
+    first_market = True
+    last_idle_log = 0
+    busy_warned = set()  # 주기가 돌아왔는데 이전 실행이 끝나지 않은 작업 (경고는 한 번만)
 
     while True:
         try:
             now_kst = get_now_kst()
             current_ts = time.time()
             current_config = _load_config_if_changed()
-            
-            auto_gen_enabled = current_config.get("report_auto_gen", False)
-            current_time_str = now_kst.strftime("%H:%M")
-            
-            # 예약 시각 (설정 변경 시에만 재계산됨)
-            base_time_str = _cached_base_time
-            weekly_time_str = _cached_weekly_time
-            monthly_time_str = _cached_monthly_time
-
-            # --- [ 🤖 자동 보고서 생성 섹션 ] ---
-            if auto_gen_enabled:
-                
-                # ① 일간 자동 보고서
-                if current_time_str == base_time_str:
-                    today_str = now_kst.strftime("%Y-%m-%d")
-                    # 💡 수동 보고서 파일이 있어도, '자동 스케줄러'가 오늘 처음이라면 실행합니다.
-                    if auto_daily_done_date != today_str:
-                        print(f"🤖 [{now_kst.strftime('%H:%M:%S')}] >>> 스케줄러: 자동 일간 보고서 생성 시도")
-                        if generate_auto_report(current_config, "daily"):
-                            auto_daily_done_date = today_str # 자동 실행 성공 시에만 마킹
-
-                # ② 주간 자동 보고서 (일요일)
-                elif current_time_str == weekly_time_str and now_kst.weekday() == 6:
-                    week_str = now_kst.strftime("%Y-%U")
-                    if auto_weekly_done_week != week_str:
-                        print(f"📅 [{now_kst.strftime('%H:%M:%S')}] >>> 스케줄러: 자동 주간 보고서 생성 시도")
-                        if generate_auto_report(current_config, "weekly"):
-                            auto_weekly_done_week = week_str
-
-                # ③ 월간 자동 보고서 (1일)
-                elif current_time_str == monthly_time_str and now_kst.day == 1:
-                    month_str = now_kst.strftime("%Y-%m")
-                    if auto_monthly_done_month != month_str:
-                        print(f"🏛️ [{now_kst.strftime('%H:%M:%S')}] >>> 스케줄러: 자동 월간 보고서 생성 시도")
-                        if generate_auto_report(current_config, "monthly"):
-                            auto_monthly_done_month = month_str
-            # --- [ 뉴스 수집 섹션 ] ---
-            update_interval_min = current_config.get("update_interval", 10)
-            update_interval_sec = update_interval_min * 60
-            
-            # 다음 수집까지 남은 시간 계산 (로그용)
-            time_since_last = current_ts - last_news_time
-            next_in = max(0, update_interval_sec - time_since_last)
-
-            if time_since_last >= update_interval_sec or first_run:
-                print(f"📡 [{now_kst.strftime('%H:%M:%S')}] 뉴스/별도지표 수집 엔진 가동 (주기: {update_interval_min}분)")
-                
-                # 🎯 [NEW] 시장 데이터(KRX, Global, Fed) 기동 시간 / 휴일 판별 자동 수집
-                need_krx = first_run or is_kr_market_open()
-                need_us = first_run or is_us_market_open()
-
-                print(f"📊 [{now_kst.strftime('%H:%M:%S')}] 시장 데이터 갱신 점검 (첫실행: {first_run}, KRX수집: {need_krx}, US수집: {need_us})...")
-                try:
-                    if need_krx:
-                        get_krx_summary_raw(ignore_cache=True)
-                    
-                    if need_us:
-                        get_global_financials_raw(ignore_cache=True, fetch_type="all") # 주식 포함 전체
-                    else:
-                        get_global_financials_raw(ignore_cache=True, fetch_type="non_equities") # 환율/원자재만
-                    
-                    get_fed_liquidity_raw()     # Fed (FRED)
-                except Exception as e:
-                    print(f"⚠️ 시장 데이터 자동 수집 중 오류: {e}")
-
-                feeds = current_config.get("feeds", [])
-                g_exc_str = current_config.get('global_exclude', "")  # 루프 밖에서 한 번만 가져옴
-                
-                new_saved = 0
-                for feed in feeds:
-                    try:
-                        parsed = feedparser.parse(feed['url'])
-                        
-                        feed_new = 0
-                        for entry in parsed.entries[:50]:
-                            if not check_news_filter(entry.title, g_exc_str):
-                                continue
-                            if save_file(entry, feed['name']):
-                                feed_new += 1
-                                new_saved += 1
-                        if feed_new > 0:
-                            print(f"   └─ {feed['name']}: {feed_new}개 신규 저장")
-                    except Exception as e:
-                        print(f"   └─ ❌ {feed.get('name')} 오류: {e}")
-                
-                print(f"✅ [{now_kst.strftime('%H:%M:%S')}] 수집 완료 (총 {new_saved}개 신규 확보)")
-                
-                # 파일 정리 (기간 만료 및 개수 초과 삭제)
-                cleanup_old_files(min(current_config.get("retention_days", 3), 3))
-                
-                last_news_time = current_ts
-                first_run = False
-            else:
-                # 매 분마다 정기 생존 신고 로그 (선택 사항)
-                if now_kst.minute % 5 == 0: # 5분마다 출력
-                    print(f"💤 [{now_kst.strftime('%H:%M:%S')}] 대기 중... (다음 뉴스 수집까지 {int(next_in/60)}분 남음)")
+            update_interval_sec = current_config.get("update_interval", 10) * 60
+
+            # --- [ 📡 뉴스 수집 / 📊 시장 데이터: 각자 주기로, 서로 기다리지 않음 ] ---
+            if current_ts >= next_news_ts:
+                if run_task_async("news", run_news_cycle, current_config):
+                    next_news_ts = current_ts + update_interval_sec
+                    busy_warned.discard("news")
+                else:
+                    if "news" not in busy_warned:
+                        print(f"⚠️ [{now_kst.strftime('%H:%M:%S')}] 이전 뉴스 수집이 아직 진행 중 - 끝나는 대로 다시 시도")
+                        busy_warned.add("news")
+                    next_news_ts = current_ts + TASK_BUSY_RETRY_SEC
+
+            if current_ts >= next_market_ts:
+                if run_task_async("market", run_market_refresh, first_market):
+                    next_market_ts = current_ts + update_interval_sec
+                    first_market = False
+                    busy_warned.discard("market")
+                else:
+                    if "market" not in busy_warned:
+                        print(f"⚠️ [{now_kst.strftime('%H:%M:%S')}] 이전 시장 데이터 갱신이 아직 진행 중 - 끝나는 대로 다시 시도")
+                        busy_warned.add("market")
+                    next_market_ts = current_ts + TASK_BUSY_RETRY_SEC
+
+            # --- [ 🤖 자동 보고서: 가장 최근 예약분이 완료되지 않았다면 실행 (놓친 예약 따라잡기 포함) ] ---
+            # 실패한 예약분은 REPORT_RETRY_SEC 간격으로 최대 REPORT_MAX_ATTEMPTS회까지만 재시도
+            next_report_ts = None
+            if current_config.get("report_auto_gen", False):
+                base_time_str = str(current_config.get("report_gen_time", "08:00")).strip()
+                for kind, (_, fmt) in REPORT_SCHEDULE.items():
+                    slot = last_report_slot(kind, base_time_str, now_kst)
+                    slot_key = slot.strftime(fmt)
+                    fire_ts = next_report_slot(kind, base_time_str, now_kst).timestamp()
+                    if schedule_state.get(kind) != slot_key:
+                        wait = report_retry_wait(schedule_state, kind, slot_key, current_ts)
+                        if wait == 0:
+                            if run_task_async(f"report-{kind}", run_scheduled_report, current_config, kind, slot_key, schedule_state):
+                                late_min = int((now_kst - slot).total_seconds() // 60)
+                                print(f"🤖 [{now_kst.strftime('%H:%M:%S')}] >>> 스케줄러: 자동 {kind} 보고서 생성 시도 (예약 {slot.strftime('%m-%d %H:%M')}, {late_min}분 지연)")
+                        elif wait:
+                            fire_ts = min(fire_ts, current_ts + wait)
+                    next_report_ts = fire_ts if next_report_ts is None else min(next_report_ts, fire_ts)
 
+            # 다음 실행 시각까지 대기 (설정 변경 반영을 위해 최대 30초)
+            wake_ts = min(t for t in (next_news_ts, next_market_ts, next_report_ts) if t is not None)
+            if current_ts - last_idle_log >= 300:
+                print(f"💤 [{now_kst.strftime('%H:%M:%S')}] 대기 중... (다음 뉴스 수집까지 {int(max(0, next_news_ts - current_ts) / 60)}분 남음"
+                      + (f", 다음 자동 보고서 {datetime.fromtimestamp(next_report_ts, KST).strftime('%m-%d %H:%M')}" if next_report_ts else "") + ")")
+                last_idle_log = current_ts
         except Exception as e: 
             print(f"🚨 [{datetime.now().strftime('%H:%M:%S')}] 루프 치명적 에러: {e}")
+            wake_ts = time.time() + 30
             
-        time.sleep(60)
+        time.sleep(min(30, max(1, wake_ts - time.time())))